@@ -0,0 +1,105 @@
+"""
+Cost of evaluating a user profile against 10, 100 and 1000 adaptation rules.
+
+"linear" checks every rule's keywords against the profile in turn, the way
+contextual_adaptation used to (re-lowercasing each field per rule). "compiled"
+is AdaptationEngine's uncached path: one automaton pass per profile field.
+"cached" is a repeat evaluation of the same profile, as within a session.
+The synthetic rules spread over the three summary fields; every profile
+matches a few of them. A field with both case-sensitive and case-insensitive
+rules takes two passes (--case-sensitive-share).
+
+    python -m benchmarks.bench_adaptation --rules 10 100 1000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from src.adaptation import AdaptationEngine, AdaptationRule
+
+FIELDS = ("emotional_state_summary", "learning_style_summary", "mastery_level_summary")
+PARAMETERS = ("include_examples", "include_analogies", "note_taking_style", "difficulty", "desired_depth")
+
+
+def _keyword(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+
+
+def synthetic_rules(count: int, case_sensitive_share: float = 0.0, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        AdaptationRule(
+            name=f"rule_{i}",
+            field=FIELDS[i % len(FIELDS)],
+            keywords=tuple(_keyword(rng) for _ in range(rng.randint(1, 4))),
+            overrides={rng.choice(PARAMETERS): i},
+            case_sensitive=rng.random() < case_sensitive_share,
+        )
+        for i in range(count)
+    ]
+
+
+def synthetic_profiles(rules, count: int, seed: int = 1):
+    """Profiles of ~120 characters per field that contain a keyword of a few random rules."""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        profile = {field: " ".join(_keyword(rng) for _ in range(15)) for field in FIELDS}
+        for rule in rng.sample(rules, min(3, len(rules))):
+            profile[rule.field] += f" {rule.keywords[0]}"
+        profiles.append(profile)
+    return profiles
+
+
+def linear(rules, profile: dict) -> dict:
+    adaptations = {}
+    for rule in rules:
+        value = profile.get(rule.field, "")
+        value = value if rule.case_sensitive else value.lower()
+        keywords = rule.keywords if rule.case_sensitive else [k.lower() for k in rule.keywords]
+        if any(keyword in value for keyword in keywords):
+            adaptations.update(rule.overrides)
+    return adaptations
+
+
+def _us_per_profile(fn, profiles, repeats: int = 5) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for profile in profiles:
+            fn(profile)
+        samples.append((time.perf_counter() - start) / len(profiles) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--case-sensitive-share", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'compile ms':>11} {'linear us':>10} {'compiled us':>12} {'cached us':>10}")
+    for count in args.rules:
+        rules = synthetic_rules(count, args.case_sensitive_share)
+        profiles = synthetic_profiles(rules, args.profiles)
+
+        start = time.perf_counter()
+        engine = AdaptationEngine(rules)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        for profile in profiles:
+            assert engine.evaluate(profile) == linear(rules, profile)
+        uncached = _us_per_profile(
+            lambda profile: engine._evaluate(tuple(profile.get(field, "") for field in engine.fields)), profiles
+        )
+        cached = _us_per_profile(engine.evaluate, profiles)
+        print(
+            f"{count:>6} {compile_ms:>11.2f} {_us_per_profile(lambda p: linear(rules, p), profiles):>10.1f} "
+            f"{uncached:>12.1f} {cached:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
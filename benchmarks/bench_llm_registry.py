@@ -0,0 +1,84 @@
+"""
+Per-request setup cost of the LLM nodes, before and after the chain registry.
+
+"before" rebuilds the chat model, the tool/schema binding and the prompt on
+every call, the way the nodes used to. "after" looks the chain up in
+src.llm.registry. No request is sent to Gemini in either case.
+
+    python -m benchmarks.bench_llm_registry --iterations 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+
+from langchain.prompts import ChatPromptTemplate  # noqa: E402
+
+from src import nodes  # noqa: E402
+from src.config import get_settings  # noqa: E402
+from src.llm import registry  # noqa: E402
+from src.schemas import ConceptExplainerInput, FlashcardGeneratorInput, NoteMakerInput  # noqa: E402
+
+
+def _per_call_chain(messages, temperature, schema=None, bind=None):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    llm = ChatGoogleGenerativeAI(model=get_settings().gemini_model, temperature=temperature)
+    if bind == "structured":
+        llm = llm.with_structured_output(schema)
+    elif bind == "tools":
+        llm = llm.bind_tools([schema])
+    return ChatPromptTemplate.from_messages(list(messages)) | llm
+
+
+CHAINS = {
+    "route_query": (nodes.ROUTER_PROMPT, 0, nodes.RouterSchema, "structured"),
+    "extract_note_maker_parameters": (
+        nodes._extractor_prompt(nodes.NOTE_MAKER_SYSTEM_PROMPT), 0, NoteMakerInput, "tools"),
+    "extract_flashcard_parameters": (
+        nodes._extractor_prompt(nodes.FLASHCARD_SYSTEM_PROMPT), 0, FlashcardGeneratorInput, "tools"),
+    "extract_concept_explainer_parameters": (
+        nodes._extractor_prompt(nodes.CONCEPT_EXPLAINER_SYSTEM_PROMPT), 0, ConceptExplainerInput, "tools"),
+    "generate_clarification_response": (
+        (("system", nodes.CLARIFICATION_SYSTEM_PROMPT), ("human", "{query}")), 0.5, None, None),
+    "request_missing_info": (
+        (("system", nodes.MISSING_INFO_SYSTEM_PROMPT), ("human", "{query}")), 0, None, None),
+    "format_final_response": (
+        (("system", nodes.FORMATTER_SYSTEM_PROMPT), ("human", "{api_response}")), 0.5, None, None),
+}
+
+
+def _time_ms(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    # Pay the one-off import of langchain_google_genai outside the measurement.
+    _per_call_chain(*CHAINS["route_query"])
+
+    print(f"{'node':40} {'before mean/p50 (ms)':>22} {'after mean/p50 (ms)':>22}")
+    for node, (messages, temperature, schema, bind) in CHAINS.items():
+        before = _time_ms(lambda: _per_call_chain(messages, temperature, schema, bind), args.iterations)
+        after = _time_ms(
+            lambda: registry.get_chain(messages, temperature=temperature, schema=schema, bind=bind),
+            args.iterations,
+        )
+        print(
+            f"{node:40} {before[0]:>10.3f} / {before[1]:<9.3f} {after[0]:>10.4f} / {after[1]:<9.4f}"
+        )
+    print(f"registry: {registry.stats()}")
+
+
+if __name__ == "__main__":
+    main()
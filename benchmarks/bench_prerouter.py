@@ -0,0 +1,43 @@
+"""
+Offline estimate of how much router LLM traffic the pre-router removes.
+
+Runs leave-one-out over a labeled query file: each query is routed by a
+pre-router trained on the other queries. For each threshold it reports the
+fraction of queries that take the fast path and how often those fast-path
+decisions match the label.
+
+    python -m benchmarks.bench_prerouter --thresholds 0.7 0.8 0.9 0.95
+"""
+import argparse
+import time
+
+from src.prerouter import DEFAULT_EXAMPLES_PATH, NaiveBayesRouter, PreRouter, load_examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leave-one-out evaluation of the pre-router.")
+    parser.add_argument("--examples", default=str(DEFAULT_EXAMPLES_PATH))
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95])
+    args = parser.parse_args()
+
+    examples = load_examples(args.examples)
+    results = []
+    elapsed = 0.0
+    for i, (query, label) in enumerate(examples):
+        prerouter = PreRouter(NaiveBayesRouter().fit(examples[:i] + examples[i + 1:]))
+        start = time.perf_counter()
+        guess = prerouter.route(query)
+        elapsed += time.perf_counter() - start
+        results.append((guess, label))
+
+    print(f"{len(examples)} labeled queries, {elapsed / len(examples) * 1e6:.1f} us per routing decision")
+    print(f"{'threshold':>9} {'fast path':>10} {'accuracy on fast path':>22}")
+    for threshold in args.thresholds:
+        fast = [(guess, label) for guess, label in results if guess.confidence >= threshold]
+        correct = sum(guess.tool_name == label for guess, label in fast)
+        accuracy = correct / len(fast) if fast else 0.0
+        print(f"{threshold:>9.2f} {len(fast) / len(results):>10.1%} {accuracy:>22.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Per-request CPU time and allocations of the request/state/response handling
+around the graph, before and after lean state, for 10/100/1000-message
+histories. No graph run, LLM or tool call is involved.
+
+"before" is the old path: chat history validated into ChatMessage models,
+dumped back for the graph (model_dump rather than .dict(), to leave the
+deprecation warning out of the numbers), ChatMessage models rebuilt for
+the updated history, the response validated again against its
+response_model (as FastAPI does for a returned model) and every JSON body
+written with json.
+"after" is src.main's path: history validated straight into plain dicts,
+FastJSONResponse bodies and orjson for the tool payload.
+
+    python -m benchmarks.bench_state --iterations 200
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from typing import List, Optional
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+
+from pydantic import BaseModel  # noqa: E402
+
+from src.history import history_for  # noqa: E402
+from src.main import OrchestratorRequest, _graph_inputs, _response_body  # noqa: E402
+from src.schemas import ChatMessage, UserInfo  # noqa: E402
+from src.serialization import FastJSONResponse, dumps  # noqa: E402
+
+PROFILE = {
+    "user_id": "bench", "name": "Bench", "grade_level": "10",
+    "learning_style_summary": "visual", "emotional_state_summary": "anxious",
+    "mastery_level_summary": "Level 2",
+}
+REPLY = "Here are your notes on the water cycle. " * 20
+
+
+class _OldRequest(BaseModel):
+    current_query: str
+    user_profile: Optional[UserInfo] = None
+    chat_history: List[ChatMessage] = []
+
+
+class _OldResponse(BaseModel):
+    agent_response: str
+    updated_chat_history: List[ChatMessage]
+
+
+def _history(messages: int) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about the water cycle and evaporation."}
+        for i in range(messages)
+    ]
+
+
+def _tool_payload(inputs: dict) -> dict:
+    return {
+        "topic": "Water Cycle", "subject": "Science", "note_taking_style": "structured",
+        "user_info": inputs["user_profile"],
+        "chat_history": history_for("NoteMaker", inputs["chat_history"]),
+    }
+
+
+def before(body: dict) -> bytes:
+    request = _OldRequest.model_validate(body)
+    inputs = {
+        "current_query": request.current_query,
+        "user_profile": request.user_profile.model_dump(),
+        "chat_history": [msg.model_dump() for msg in request.chat_history],
+    }
+    json.dumps(_tool_payload(inputs)).encode()
+    turn = [ChatMessage(role="user", content=request.current_query), ChatMessage(role="assistant", content=REPLY)]
+    response = _OldResponse(agent_response=REPLY, updated_chat_history=request.chat_history + turn)
+    validated = _OldResponse.model_validate(response.model_dump())
+    return json.dumps(validated.model_dump(mode="json")).encode()
+
+
+def after(body: dict) -> bytes:
+    request = OrchestratorRequest.model_validate(body)
+    inputs = _graph_inputs(request)
+    dumps(_tool_payload(inputs))
+    return FastJSONResponse(_response_body(request, REPLY)).body
+
+
+def _cpu_us(fn, body, iterations) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def _peak_kib(fn, body, iterations=10) -> float:
+    """Mean peak of memory allocated while handling one request, under tracemalloc."""
+    fn(body)
+    total = 0
+    tracemalloc.start()
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(body)
+        total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total / iterations / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'before CPU us':>14} {'after CPU us':>13} {'speed-up':>9} "
+          f"{'before peak KiB':>16} {'after peak KiB':>15}")
+    for messages in args.messages:
+        body = {"current_query": "Make me notes on the water cycle", "user_profile": PROFILE,
+                "chat_history": _history(messages)}
+        assert json.loads(before(body)) == json.loads(after(body))
+        cpu_before = _cpu_us(before, body, args.iterations)
+        cpu_after = _cpu_us(after, body, args.iterations)
+        peak_before = _peak_kib(before, body)
+        peak_after = _peak_kib(after, body)
+        print(f"{messages:>8} {cpu_before:>14.1f} {cpu_after:>13.1f} {cpu_before / cpu_after:>8.1f}x "
+              f"{peak_before:>16.1f} {peak_after:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Formatter prompt size and parse time per tool, before and after typed,
+compacted tool responses. No LLM or tool call is involved.
+
+"before" is the old path: the body parsed with response.json() and the
+whole payload stringified into the formatter prompt. "after" is
+src.nodes' path: the body validated straight from bytes into the tool's
+response model, then compacted (empty fields dropped, lists and strings
+capped) and written as JSON. Each tool runs with its mock_tools payload
+and with an oversized variant (every list and string inflated --scale
+times), like a tool returning a long document.
+
+    python -m benchmarks.bench_tool_responses --iterations 2000 --scale 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+
+from mock_tools.mock_concept_explainer import explain_concept  # noqa: E402
+from mock_tools.mock_flashcard_generator import create_flashcards  # noqa: E402
+from mock_tools.mock_note_maker import create_notes  # noqa: E402
+from src.config import get_settings  # noqa: E402
+from src.history import estimate_tokens  # noqa: E402
+from src.nodes import FORMATTER_SYSTEM_PROMPT  # noqa: E402
+from src.serialization import dumps  # noqa: E402
+from src.tool_responses import compact, parse_tool_response  # noqa: E402
+
+TOOLS = {
+    "NoteMaker": create_notes,
+    "FlashcardGenerator": create_flashcards,
+    "ConceptExplainer": explain_concept,
+}
+
+
+def _inflate(value, scale: int):
+    if isinstance(value, dict):
+        return {key: _inflate(item, scale) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_inflate(item, scale) for item in value] * scale
+    if isinstance(value, str):
+        return " ".join([value] * scale)
+    return value
+
+
+def before(body: bytes) -> str:
+    return str(json.loads(body))
+
+
+def after(tool: str, body: bytes) -> str:
+    settings = get_settings()
+    api_response = parse_tool_response(tool, body)
+    return dumps(compact(api_response, settings.tool_response_max_items, settings.tool_response_max_chars)).decode()
+
+
+def _us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--scale", type=int, default=40)
+    args = parser.parse_args()
+
+    system_tokens = estimate_tokens(FORMATTER_SYSTEM_PROMPT)
+    print(f"Prompt tokens include the {system_tokens}-token formatter system prompt.")
+    print(f"{'tool':<19} {'payload':<9} {'before tok':>10} {'after tok':>10} {'reduction':>10} "
+          f"{'before us':>10} {'after us':>9}")
+    for tool, endpoint in TOOLS.items():
+        payload = asyncio.run(endpoint(None))
+        for variant, data in (("mock", payload), ("oversized", _inflate(payload, args.scale))):
+            body = dumps(data)
+            tokens_before = system_tokens + estimate_tokens(before(body))
+            tokens_after = system_tokens + estimate_tokens(after(tool, body))
+            us_before = _us(lambda: before(body), args.iterations)
+            us_after = _us(lambda: after(tool, body), args.iterations)
+            print(f"{tool:<19} {variant:<9} {tokens_before:>10} {tokens_after:>10} "
+                  f"{1 - tokens_after / tokens_before:>9.1%} {us_before:>10.1f} {us_after:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
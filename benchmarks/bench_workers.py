@@ -0,0 +1,153 @@
+"""
+Throughput of `python -m src.serve` with 1, 2, 4... worker processes.
+
+Each level starts the real server (WEB_CONCURRENCY workers, the offline
+fake LLM sleeping --llm-latency-ms per call, the caches and request
+coalescing off so every request runs the whole graph; --coalescing turns
+coalescing back on) and drives /orchestrate over HTTP with
+--concurrency requests in flight. The mock tools run as their own uvicorn
+processes. With the LLM latency simulated, a worker's throughput is bound
+by its own CPU (routing, prompts, parsing, JSON), so req/s should grow with
+the worker count until the workers outnumber the free cores; the load
+generator itself needs part of a core.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_test import PROFILE, QUERIES, _percentile
+
+TOOL_APPS = {
+    8001: "mock_tools.mock_note_maker:app",
+    8002: "mock_tools.mock_flashcard_generator:app",
+    8003: "mock_tools.mock_concept_explainer:app",
+}
+
+
+def start_mock_tools():
+    return [
+        subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"])
+        for port, app in TOOL_APPS.items()
+    ]
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "benchmark-placeholder-key"),
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        WEB_CONCURRENCY=str(workers),
+        APP_HOST="127.0.0.1",
+        APP_PORT=str(port),
+        LOG_LEVEL="WARNING",
+        RESPONSE_CACHE_ENABLED="false",
+        NODE_CACHE_BACKEND="none",
+        COALESCING_ENABLED="true" if args.coalescing else "false",
+        SESSION_BACKEND="none",
+        # The benchmark drives far more than the default per-upstream limit allows.
+        LIMITER_ENABLED="false",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.serve"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, workers: int, timeout: float = 60.0) -> None:
+    """/ready is per worker; several ready answers in a row make it likely every worker is up."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 4:
+        if time.monotonic() > deadline:
+            raise RuntimeError("The server did not become ready in time.")
+        try:
+            streak = streak + 1 if (await client.get("/ready")).status_code == 200 else 0
+        except httpx.TransportError:
+            streak = 0
+        if not streak:
+            await asyncio.sleep(0.2)
+
+
+async def drive(client: httpx.AsyncClient, concurrency: int, total: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def user():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.post("/orchestrate", json={
+                "current_query": QUERIES[i % len(QUERIES)], "user_profile": PROFILE, "chat_history": [],
+            })
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p95_ms": _percentile(latencies, 0.95) * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+async def run_level(workers: int, args) -> dict:
+    server = start_server(workers, args.port, args)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits
+        ) as client:
+            await wait_until_ready(client, workers)
+            await drive(client, args.concurrency, args.concurrency * 2)
+            return await drive(client, args.concurrency, args.requests)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument(
+        "--coalescing", action="store_true", help="Let identical concurrent requests share a graph run."
+    )
+    args = parser.parse_args()
+
+    tools = start_mock_tools()
+    try:
+        time.sleep(2)
+        print(f"{os.cpu_count()} CPUs, {args.concurrency} requests in flight")
+        print(f"{'workers':>7} {'req/s':>8} {'speed-up':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        baseline = None
+        for workers in args.workers:
+            result = asyncio.run(run_level(workers, args))
+            baseline = baseline or result["rps"]
+            print(f"{workers:>7} {result['rps']:>8.1f} {result['rps'] / baseline:>8.2f}x "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['errors']:>7}")
+    finally:
+        for tool in tools:
+            tool.terminate()
+            tool.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Load test for /orchestrate against the offline fake LLM and the mock tools.
+
+The app runs with LLM_BACKEND=fake, so every model call goes through the
+real prompts, chains and callbacks but sleeps for a latency drawn from
+--llm-latency-distribution around --llm-latency-ms instead of calling
+Gemini. The mock tools are served by uvicorn on their usual ports. Reports
+requests/sec, latency percentiles, mean time per graph node and per LLM call
+site, and process memory at each concurrency level. --output saves the
+results as JSON (with the git commit) to compare runs across commits.
+
+    python -m benchmarks.load_test --concurrency 1 10 100
+    python -m benchmarks.load_test --llm-latency-distribution lognormal --output results.json
+    GRAPH_MODE=combined python -m benchmarks.load_test
+    python -m benchmarks.load_test --coalescing
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import threading
+import time
+
+QUERIES = [
+    "Make me notes on the water cycle",
+    "Create 5 flashcards on photosynthesis",
+    "Explain photosynthesis to me",
+    "hi",
+]
+
+PROFILE = {
+    "user_id": "load_test", "name": "Load", "grade_level": "10",
+    "learning_style_summary": "visual", "emotional_state_summary": "anxious",
+    "mastery_level_summary": "Level 2",
+}
+
+GRAPH_NODES = (
+    "router", "route_and_extract", "NoteMaker", "FlashcardGenerator", "ConceptExplainer",
+    "clarify", "request_missing_info_node", "adaptation_node", "tool_executor", "formatter_node",
+)
+
+
+def configure_environment(args) -> None:
+    """Must run before anything from src is imported: settings are read once."""
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["FAKE_LLM_LATENCY_DISTRIBUTION"] = args.llm_latency_distribution
+    os.environ["FAKE_LLM_LATENCY_JITTER"] = str(args.llm_latency_jitter)
+    # The query mix repeats, so with the caches on this would only measure cache
+    # hits. Set RESPONSE_CACHE_ENABLED=true / NODE_CACHE_BACKEND=memory to measure those.
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    os.environ.setdefault("NODE_CACHE_BACKEND", "none")
+    # Identical concurrent requests would otherwise share one graph run, so only
+    # --coalescing measures the coalesced case.
+    os.environ["COALESCING_ENABLED"] = "true" if args.coalescing else "false"
+    # Warm-up is done explicitly below; the load test drives the API in-process.
+    os.environ.setdefault("WARMUP_ENABLED", "false")
+
+
+def start_mock_tools():
+    import uvicorn
+
+    from mock_tools.mock_concept_explainer import app as concept_explainer_app
+    from mock_tools.mock_flashcard_generator import app as flashcard_generator_app
+    from mock_tools.mock_note_maker import app as note_maker_app
+
+    tool_apps = {8001: note_maker_app, 8002: flashcard_generator_app, 8003: concept_explainer_app}
+    servers = []
+    for port, tool_app in tool_apps.items():
+        server = uvicorn.Server(uvicorn.Config(tool_app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        servers.append(server)
+    while not all(server.started for server in servers):
+        time.sleep(0.05)
+    return servers
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if platform.system() == "Darwin" else 1)
+
+
+def _histogram_totals(metric: str) -> dict:
+    """(sum, count) of a per-node histogram, for every node that has samples."""
+    from prometheus_client import REGISTRY
+
+    totals = {}
+    for node in GRAPH_NODES:
+        count = REGISTRY.get_sample_value(f"{metric}_count", {"node": node})
+        if count:
+            totals[node] = (REGISTRY.get_sample_value(f"{metric}_sum", {"node": node}), count)
+    return totals
+
+
+def _breakdown(before: dict, after: dict) -> dict:
+    """Mean milliseconds and call count per node between two histogram snapshots."""
+    breakdown = {}
+    for node, (total, count) in after.items():
+        prev_total, prev_count = before.get(node, (0.0, 0.0))
+        calls = count - prev_count
+        if calls:
+            breakdown[node] = {"calls": int(calls), "mean_ms": round((total - prev_total) / calls * 1000, 3)}
+    return breakdown
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_level(client, concurrency, total, formatter_mode=None):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(QUERIES[i % len(QUERIES)])
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.post(
+                "/orchestrate",
+                json={
+                    "current_query": query,
+                    "user_profile": PROFILE,
+                    "chat_history": [],
+                    "formatter_mode": formatter_mode,
+                },
+            )
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    nodes_before = _histogram_totals("graph_node_duration_seconds")
+    llm_before = _histogram_totals("llm_call_duration_seconds")
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "nodes": _breakdown(nodes_before, _histogram_totals("graph_node_duration_seconds")),
+        "llm_calls": _breakdown(llm_before, _histogram_totals("llm_call_duration_seconds")),
+        "rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    import httpx
+
+    from src.config import get_settings
+    from src.main import api
+    from src.warmup import warm_up
+
+    settings = get_settings()
+    transport = httpx.ASGITransport(app=api)
+    results = []
+    async with api.router.lifespan_context(api):
+        await warm_up()
+        async with httpx.AsyncClient(transport=transport, base_url="http://orchestrator", timeout=120) as client:
+            # Warm-up requests so the first level does not pay first-call costs.
+            await run_level(client, 1, 4)
+            print(f"{'concurrency':>11} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency * 4)
+                result = await run_level(client, concurrency, total, args.formatter_mode)
+                results.append(result)
+                print(
+                    f"{result['concurrency']:>11} {result['requests']:>9} {result['rps']:>9.1f} "
+                    f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['rss_mb']:>8.1f}"
+                )
+            if args.breakdown and results:
+                print("\nMean ms per graph node at the last level:")
+                for node, stats in results[-1]["nodes"].items():
+                    print(f"  {node:<26} {stats['mean_ms']:>9.1f}  ({stats['calls']} calls)")
+
+    if args.output:
+        report = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "config": {
+                "graph_mode": settings.graph_mode,
+                "formatter_mode": args.formatter_mode or settings.formatter_mode,
+                "llm_latency_ms": args.llm_latency_ms,
+                "llm_latency_distribution": args.llm_latency_distribution,
+                "llm_latency_jitter": args.llm_latency_jitter,
+                "prerouter_enabled": settings.prerouter_enabled,
+                "response_cache_enabled": settings.response_cache_enabled,
+                "node_cache_backend": settings.node_cache_backend,
+                "speculation_enabled": settings.speculation_enabled,
+                "coalescing_enabled": settings.coalescing_enabled,
+            },
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "levels": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test /orchestrate with the fake LLM backend.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=40, help="Minimum requests per level.")
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument(
+        "--llm-latency-distribution", choices=["fixed", "uniform", "exponential", "lognormal"], default="fixed"
+    )
+    parser.add_argument("--llm-latency-jitter", type=float, default=0.5)
+    parser.add_argument("--formatter-mode", choices=["llm", "template"], default=None)
+    parser.add_argument(
+        "--coalescing", action="store_true", help="Let identical concurrent requests share a graph run."
+    )
+    parser.add_argument("--breakdown", action="store_true", help="Print the per-node breakdown.")
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    start_mock_tools()
+    asyncio.run(main(args))
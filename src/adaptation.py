@@ -0,0 +1,209 @@
+import json
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from src.cache import LRUCache
+from src.config import get_settings
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "data" / "adaptation_rules.yml"
+
+RULE_FILE_SUFFIXES = (".yml", ".yaml", ".json")
+
+
+@dataclass(frozen=True)
+class AdaptationRule:
+    """Sets `overrides` on the tool parameters when `field` contains any of `keywords`."""
+
+    name: str
+    field: str
+    keywords: Tuple[str, ...]
+    overrides: Dict[str, Any]
+    case_sensitive: bool = False
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords: one pass over the text
+    finds every keyword occurrence, overlapping ones included. Transitions
+    are precomputed (a DFA), so each character costs one or two dict
+    lookups however many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        self._out: List[FrozenSet[str]] = [frozenset()]
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    self._out.append(frozenset())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            self._out[state] = self._out[state] | {keyword}
+        self._delta = self._compile(goto)
+
+    def _compile(self, goto: List[Dict[str, int]]) -> List[Dict[str, int]]:
+        """
+        Failure links, then each state's full transition table minus the
+        root's (the scan falls back to those). Breadth-first, so a state's
+        failure target is always complete before the state itself.
+        """
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [{} for _ in goto]
+        delta[0] = goto[0]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            inherited = delta[fail[state]] if fail[state] else {}
+            delta[state] = {**inherited, **goto[state]}
+            for char, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0)
+                self._out[child] = self._out[child] | self._out[fail[child]]
+        return delta
+
+    def find(self, text: str) -> set:
+        """The keywords that occur in `text`."""
+        delta, out = self._delta, self._out
+        root = delta[0]
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char) or root.get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class _FieldMatcher:
+    """
+    The compiled rules for one profile field: one automaton for the
+    case-insensitive keywords (run on the lowercased value) and one for the
+    case-sensitive ones, mapping each keyword back to its rules.
+    """
+
+    def __init__(self, rules: List[Tuple[int, AdaptationRule]]):
+        self._rules_by_keyword: Dict[Tuple[bool, str], List[int]] = {}
+        for index, rule in rules:
+            for keyword in rule.keywords:
+                key = (rule.case_sensitive, keyword if rule.case_sensitive else keyword.lower())
+                self._rules_by_keyword.setdefault(key, []).append(index)
+        insensitive = [keyword for sensitive, keyword in self._rules_by_keyword if not sensitive]
+        sensitive = [keyword for is_sensitive, keyword in self._rules_by_keyword if is_sensitive]
+        self._insensitive = KeywordAutomaton(insensitive) if insensitive else None
+        self._sensitive = KeywordAutomaton(sensitive) if sensitive else None
+
+    def matching_rules(self, value: str) -> set:
+        matched = set()
+        if self._insensitive is not None:
+            for keyword in self._insensitive.find(value.lower()):
+                matched.update(self._rules_by_keyword[(False, keyword)])
+        if self._sensitive is not None:
+            for keyword in self._sensitive.find(value):
+                matched.update(self._rules_by_keyword[(True, keyword)])
+        return matched
+
+
+class AdaptationEngine:
+    """
+    Evaluates the profile-adaptation rules. Rules are compiled once into a
+    matcher per profile field, so a profile costs one automaton pass per
+    field however many rules there are; results are cached per distinct
+    profile (the values of the fields the rules read), so a session's
+    profile is evaluated once. When several matching rules set the same
+    parameter, the rule that comes last wins.
+    """
+
+    def __init__(self, rules: List[AdaptationRule], cache_entries: int = 10000):
+        self.rules = list(rules)
+        by_field: Dict[str, List[Tuple[int, AdaptationRule]]] = {}
+        for index, rule in enumerate(self.rules):
+            by_field.setdefault(rule.field, []).append((index, rule))
+        self.fields = tuple(by_field)
+        self._matchers = {field: _FieldMatcher(field_rules) for field, field_rules in by_field.items()}
+        self.cache = LRUCache(max_entries=cache_entries, sizeof=lambda value: 0)
+
+    def _evaluate(self, values: Tuple[str, ...]) -> Dict[str, Any]:
+        matched = set()
+        for field, value in zip(self.fields, values):
+            if value:
+                matched |= self._matchers[field].matching_rules(value)
+        adaptations: Dict[str, Any] = {}
+        for index in sorted(matched):
+            adaptations.update(self.rules[index].overrides)
+        return adaptations
+
+    def evaluate(self, user_profile: Optional[dict]) -> Dict[str, Any]:
+        """The parameter overrides for `user_profile` (a new dict the caller may modify)."""
+        user_profile = user_profile or {}
+        values = tuple(str(user_profile.get(field) or "") for field in self.fields)
+        adaptations = self.cache.get(values)
+        if adaptations is None:
+            adaptations = self._evaluate(values)
+            self.cache.set(values, adaptations)
+        return dict(adaptations)
+
+    def stats(self) -> dict:
+        return {"rules": len(self.rules), "fields": list(self.fields), "cache": self.cache.stats()}
+
+
+def parse_rules(document: Any, source: str = "<rules>") -> List[AdaptationRule]:
+    """Validates a rule document: {"rules": [{name, field, contains_any, set, case_sensitive?}, ...]}."""
+    entries = document.get("rules") if isinstance(document, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError(f"{source}: expected a mapping with a 'rules' list.")
+    rules = []
+    for position, entry in enumerate(entries):
+        name = entry.get("name", f"rule {position}") if isinstance(entry, dict) else f"rule {position}"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{source}: {name} is not a mapping.")
+        keywords = entry.get("contains_any")
+        overrides = entry.get("set")
+        if not isinstance(entry.get("field"), str):
+            raise ValueError(f"{source}: {name} needs a 'field'.")
+        if not isinstance(keywords, list) or not keywords or not all(isinstance(k, str) and k for k in keywords):
+            raise ValueError(f"{source}: {name} needs a non-empty 'contains_any' list of strings.")
+        if not isinstance(overrides, dict) or not overrides:
+            raise ValueError(f"{source}: {name} needs a non-empty 'set' mapping.")
+        rules.append(AdaptationRule(
+            name=name,
+            field=entry["field"],
+            keywords=tuple(keywords),
+            overrides=dict(overrides),
+            case_sensitive=bool(entry.get("case_sensitive", False)),
+        ))
+    return rules
+
+
+def _read_rule_file(path: Path) -> Any:
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".json":
+            return json.load(f)
+        import yaml
+
+        return yaml.safe_load(f)
+
+
+def load_rules(path: Path) -> List[AdaptationRule]:
+    """Reads a rule file, or every rule file in a directory in name order (e.g. one per school)."""
+    path = Path(path)
+    files = sorted(p for p in path.iterdir() if p.suffix in RULE_FILE_SUFFIXES) if path.is_dir() else [path]
+    rules = []
+    for file in files:
+        rules.extend(parse_rules(_read_rule_file(file), str(file)))
+    return rules
+
+
+@lru_cache(maxsize=None)
+def get_adaptation_engine() -> AdaptationEngine:
+    """Returns the process-wide engine, compiled once from ADAPTATION_RULES_PATH."""
+    settings = get_settings()
+    path = settings.adaptation_rules_path or DEFAULT_RULES_PATH
+    return AdaptationEngine(load_rules(Path(path)), cache_entries=settings.adaptation_cache_entries)
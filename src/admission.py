@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Deque, Dict, Optional
+
+from src.config import get_settings
+from src.limits import UpstreamOverloaded
+from src.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_SHED
+
+# Scheduling classes, highest priority first, with their share of the slots
+# that free up while several classes are waiting. "short" is for requests
+# the pre-router is sure are a one-call clarify reply.
+PRIORITY_WEIGHTS = {"short": 8, "interactive": 4, "batch": 1}
+PRIORITIES = ("interactive", "batch")
+
+
+class AdmissionRejected(UpstreamOverloaded):
+    """The admission queue shed the request: it was full, or the request waited too long."""
+
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__("admission", retry_after)
+        self.reason = reason
+        self.args = (f"The server is busy ({reason}); retry in {retry_after}s.",)
+
+
+@dataclass(eq=False)
+class _Waiter:
+    user: str
+    priority: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionScheduler:
+    """
+    Admits at most `concurrency` graph runs at a time; the rest wait in a
+    queue of at most `max_queue` requests. When a slot frees up, the classes
+    with waiting requests take turns in proportion to PRIORITY_WEIGHTS
+    (stride scheduling), so interactive requests go first without starving
+    batch ones. Within a class, users take turns, and a user holding
+    `per_user_limit` slots gets another only when nobody else is waiting.
+
+    A full queue sheds the newest request of the lowest class below the
+    newcomer's, or else the newcomer. A request that is still waiting after
+    `max_wait` seconds is shed too. Both raise AdmissionRejected (a 503
+    with Retry-After).
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_queue: int = 256,
+        max_wait: Optional[float] = 30.0,
+        per_user_limit: int = 4,
+        weights: Dict[str, int] = PRIORITY_WEIGHTS,
+    ):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_user_limit = per_user_limit
+        self.weights = dict(weights)
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in self.weights}
+        self._pass = {p: 0.0 for p in self.weights}
+        self._virtual_time = 0.0
+        self._running_by_user: Counter = Counter()
+        self.running = 0
+        self.queued = 0
+        self.admitted: Counter = Counter()
+        self.shed: Dict[str, Counter] = defaultdict(Counter)
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: str):
+        """Holds a graph execution slot for the duration of the block."""
+        await self.acquire(user, priority)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+    async def acquire(self, user: str, priority: str) -> None:
+        if self.running >= self.concurrency and self.queued >= self.max_queue:
+            self._make_room(priority)
+        waiter = _Waiter(user, priority, asyncio.get_running_loop().create_future())
+        self._enqueue(waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait or None)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Admitted just as the caller gave up: hand the slot on.
+                self.release(user)
+            else:
+                self._dequeue(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed(priority, "timeout")
+                raise AdmissionRejected("queue timeout") from None
+            raise
+
+    def release(self, user: str) -> None:
+        self.running -= 1
+        self._running_by_user[user] -= 1
+        if not self._running_by_user[user]:
+            del self._running_by_user[user]
+        self._dispatch()
+
+    def _make_room(self, priority: str) -> None:
+        """Displaces the newest waiter of the lowest class below `priority`, or sheds the newcomer."""
+        ranks = list(self.weights)
+        for lower in reversed(ranks[ranks.index(priority) + 1:]):
+            users = self._queues[lower]
+            if users:
+                victim = max((queue[-1] for queue in users.values()), key=lambda waiter: waiter.enqueued_at)
+                self._dequeue(victim)
+                self._shed(lower, "displaced")
+                victim.future.set_exception(AdmissionRejected("displaced by a higher-priority request"))
+                return
+        self._shed(priority, "queue_full")
+        raise AdmissionRejected("queue full")
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        users = self._queues[waiter.priority]
+        if not users:
+            # A class that was idle rejoins at the current virtual time rather
+            # than cashing in the turns it did not use.
+            self._pass[waiter.priority] = max(self._pass[waiter.priority], self._virtual_time)
+        users.setdefault(waiter.user, deque()).append(waiter)
+        self.queued += 1
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.priority].get(waiter.user)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[waiter.priority][waiter.user]
+        self.queued -= 1
+
+    def _dispatch(self) -> None:
+        while self.running < self.concurrency and self.queued:
+            waiter = self._next_waiter()
+            self.queued -= 1
+            if waiter.future.done():
+                continue  # timed out or cancelled, and leaving the queue
+            self.running += 1
+            self._running_by_user[waiter.user] += 1
+            self.admitted[waiter.priority] += 1
+            ADMISSION_QUEUE_SECONDS.labels(priority=waiter.priority).observe(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """
+        The next waiter by class turn, then user turn. Users at their limit
+        are skipped while anyone else waits, so a spare slot still goes to
+        them rather than sitting idle.
+        """
+        return self._next_waiter_within(self.per_user_limit) or self._next_waiter_within(None)
+
+    def _next_waiter_within(self, per_user_limit: Optional[int]) -> Optional[_Waiter]:
+        for priority in sorted(self.weights, key=lambda p: self._pass[p]):
+            users = self._queues[priority]
+            for user in users:
+                if per_user_limit is None or self._running_by_user[user] < per_user_limit:
+                    queue = users[user]
+                    waiter = queue.popleft()
+                    if queue:
+                        users.move_to_end(user)
+                    else:
+                        del users[user]
+                    self._virtual_time = self._pass[priority]
+                    self._pass[priority] += 1 / self.weights[priority]
+                    return waiter
+        return None
+
+    def _shed(self, priority: str, reason: str) -> None:
+        self.shed[priority][reason] += 1
+        ADMISSION_SHED.labels(priority=priority, reason=reason).inc()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queued": {priority: sum(map(len, users.values())) for priority, users in self._queues.items()},
+            "admitted": dict(self.admitted),
+            "shed": {priority: dict(reasons) for priority, reasons in self.shed.items()},
+        }
+
+
+@lru_cache(maxsize=None)
+def get_admission_scheduler() -> Optional[AdmissionScheduler]:
+    """Returns the process-wide scheduler, or None when ADMISSION_CONCURRENCY is 0."""
+    settings = get_settings()
+    if not settings.admission_concurrency:
+        return None
+    return AdmissionScheduler(
+        settings.admission_concurrency,
+        max_queue=settings.admission_max_queue,
+        max_wait=settings.admission_max_wait,
+        per_user_limit=settings.admission_per_user_limit,
+    )
+
+
+@asynccontextmanager
+async def admitted(user: str, priority: str):
+    """A graph execution slot, when admission control is on."""
+    scheduler = get_admission_scheduler()
+    if scheduler is None:
+        yield
+        return
+    async with scheduler.slot(user, priority):
+        yield
@@ -0,0 +1,378 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple, Union
+
+from src.config import get_settings
+
+_MISSING = object()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: Optional[float]
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional per-entry TTL and an approximate
+    memory cap. `sizeof` estimates the footprint of a value in bytes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = lambda value: len(str(value)),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.on_evict: Optional[Callable[[Hashable], None]] = None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry.expires_at is not None and entry.expires_at <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, evicted=False)
+            self._entries[key] = _Entry(value, size, expires_at)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: Hashable, evicted: bool = True) -> None:
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry.size
+        if evicted and self.on_evict is not None:
+            self.on_evict(key)
+
+
+class SQLiteStore:
+    """
+    LRUCache's interface over a SQLite file, so the worker processes on a
+    host share one cache (`python -m src.serve` with several workers). Keys
+    are tuples of strings and values strings; entries expire after `ttl`
+    seconds and the least recently used ones are evicted beyond
+    `max_entries` or `max_bytes`. The counters in stats() are this
+    process's; `entries` and `size_bytes` are the shared cache's.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.on_evict: Optional[Callable[[Hashable], None]] = None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        encoded = json.dumps(key)
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (encoded,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            now = self._clock()
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (encoded,))
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, encoded))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: Hashable, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (json.dumps(key), value, size, now + self.ttl if self.ttl else None, now),
+            )
+            evicted = self._evict()
+            self._conn.execute("COMMIT")
+        if self.on_evict is not None:
+            for evicted_key in evicted:
+                self.on_evict(evicted_key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self) -> list:
+        """Drops the entries beyond max_entries or max_bytes, least recently used first."""
+        rows = self._conn.execute(
+            "SELECT key FROM ("
+            "SELECT key, ROW_NUMBER() OVER recent AS position, SUM(size) OVER recent AS running_size "
+            "FROM cache WINDOW recent AS (ORDER BY accessed_at DESC, rowid DESC)"
+            ") WHERE position > ? OR running_size > ?",
+            (self.max_entries, self.max_bytes if self.max_bytes is not None else float("inf")),
+        ).fetchall()
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", rows)
+        self.evictions += len(rows)
+        return [_decode_key(row[0]) for row in rows]
+
+
+def _decode_key(encoded: str) -> Hashable:
+    key = json.loads(encoded)
+    return tuple(key) if isinstance(key, list) else key
+
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace."""
+    return _SPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", query.lower())).strip()
+
+
+def _shingles(text: str, n: int = 3) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def _simhash_bands(shingles: Set[str], bands: int = 4) -> Tuple[int, ...]:
+    """64-bit SimHash over hashed n-grams, split into `bands` locality-sensitive buckets."""
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    width = 64 // bands
+    return tuple(fingerprint >> (i * width) & ((1 << width) - 1) for i in range(bands))
+
+
+class ResponseCache:
+    """
+    Caches the final agent response of the whole graph, keyed on the
+    normalized query and a context dict of everything else that shapes the
+    reply (in src.main: profile adaptations, formatter mode, and digests of
+    the chat history and of the profile the tools receive).
+
+    With `near_duplicates` enabled, a miss falls back to the cached query
+    for the same context whose character trigrams are most similar, if the
+    Jaccard similarity reaches `similarity`. Candidates are found through
+    SimHash bands, so a lookup never scans the whole cache. With a shared
+    SQLiteStore the index only covers the queries this process cached.
+    """
+
+    def __init__(
+        self,
+        store: Union[LRUCache, SQLiteStore],
+        near_duplicates: bool = False,
+        similarity: float = 0.9,
+    ):
+        self.store = store
+        self.near_duplicates = near_duplicates
+        self.similarity = similarity
+        self.near_hits = 0
+        self._lock = threading.Lock()
+        self._shingles: Dict[Hashable, Tuple[Set[str], Tuple[int, ...]]] = {}
+        self._bands: Dict[Tuple[Hashable, int, int], Set[Hashable]] = {}
+        store.on_evict = self._forget
+
+    @staticmethod
+    def key(query: str, adaptations: dict) -> Tuple[str, str]:
+        return normalize_query(query), json.dumps(adaptations, sort_keys=True)
+
+    def get(self, query: str, adaptations: dict) -> Optional[str]:
+        key = self.key(query, adaptations)
+        value = self.store.get(key)
+        if value is not None or not self.near_duplicates:
+            return value
+
+        similar = self._most_similar(key)
+        if similar is None:
+            return None
+        value = self.store.get(similar)
+        if value is not None:
+            self.near_hits += 1
+        return value
+
+    def set(self, query: str, adaptations: dict, response: str) -> None:
+        key = self.key(query, adaptations)
+        self.store.set(key, response)
+        if self.near_duplicates:
+            self._index(key)
+
+    def stats(self) -> dict:
+        stats = self.store.stats()
+        stats["near_duplicate_hits"] = self.near_hits
+        return stats
+
+    def _index(self, key: Tuple[str, str]) -> None:
+        shingles = _shingles(key[0])
+        bands = _simhash_bands(shingles)
+        with self._lock:
+            self._shingles[key] = (shingles, bands)
+            for band, value in enumerate(bands):
+                self._bands.setdefault((key[1], band, value), set()).add(key)
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            indexed = self._shingles.pop(key, None)
+            if indexed is None:
+                return
+            for band, value in enumerate(indexed[1]):
+                bucket = self._bands.get((key[1], band, value))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._bands[(key[1], band, value)]
+
+    def _most_similar(self, key: Tuple[str, str]) -> Optional[Hashable]:
+        shingles = _shingles(key[0])
+        best, best_score = None, self.similarity
+        with self._lock:
+            candidates = set()
+            for band, value in enumerate(_simhash_bands(shingles)):
+                candidates |= self._bands.get((key[1], band, value), set())
+            for candidate in candidates:
+                other = self._shingles[candidate][0]
+                score = len(shingles & other) / len(shingles | other)
+                if score >= best_score:
+                    best, best_score = candidate, score
+        return best
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the process-wide response cache, or None when it is disabled."""
+    settings = get_settings()
+    if not settings.response_cache_enabled:
+        return None
+    if settings.response_cache_backend == "sqlite":
+        store = SQLiteStore(
+            settings.response_cache_path,
+            max_entries=settings.response_cache_max_entries,
+            ttl=settings.response_cache_ttl,
+            max_bytes=settings.response_cache_max_bytes,
+        )
+    elif settings.response_cache_backend == "memory":
+        store = LRUCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl=settings.response_cache_ttl,
+            max_bytes=settings.response_cache_max_bytes,
+            sizeof=lambda response: len(response.encode("utf-8")),
+        )
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND '{settings.response_cache_backend}'.")
+    return ResponseCache(
+        store,
+        near_duplicates=settings.response_cache_near_duplicates,
+        similarity=settings.response_cache_similarity,
+    )
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from src.config import get_settings
+from src.tracing import span
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation: the
+    first caller starts it as a task, later callers wait on that task, and
+    all of them get its result or its exception. A caller that is cancelled
+    stops waiting without cancelling the computation for the others; once
+    no caller is left the computation is cancelled. Nothing is kept after
+    the computation finishes (that is the caches' job).
+
+    The computation runs in the first caller's context, so it counts
+    against that request's deadline and shows up in its trace. Every caller
+    gets the same result object; pass `copy` to hand the ones that joined a
+    running computation their own copy of a mutable result.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        copy: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        if not get_settings().coalescing_enabled:
+            return await compute()
+
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if not joined:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(compute()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            with span("coalesced", **{"coalescing.call": self.name}) if joined else nullcontext():
+                result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller went away (client disconnects, deadlines):
+                # stop the computation, and let the next caller start afresh.
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+        return copy(result) if joined and copy is not None else result
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._flights),
+        }
+
+
+class SingleFlightRegistry:
+    """One SingleFlight per call site ("graph", "llm:<node>", "tool:<name>"), created on first use."""
+
+    def __init__(self):
+        self._flights: Dict[str, SingleFlight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> SingleFlight:
+        with self._lock:
+            flight = self._flights.get(name)
+            if flight is None:
+                flight = self._flights[name] = SingleFlight(name)
+            return flight
+
+    def stats(self) -> dict:
+        with self._lock:
+            flights = dict(self._flights)
+        return {name: flight.stats() for name, flight in flights.items()}
+
+
+flights = SingleFlightRegistry()
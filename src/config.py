@@ -0,0 +1,340 @@
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class ToolEndpoint:
+    """Where a tool lives and how long to wait for it."""
+
+    url: str
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+
+# Tool name -> (environment prefix, local default used by the mock_tools apps)
+TOOL_DEFAULTS = {
+    "NoteMaker": ("NOTE_MAKER", "http://127.0.0.1:8001/create-notes"),
+    "FlashcardGenerator": ("FLASHCARD_GENERATOR", "http://127.0.0.1:8002/create-flashcards"),
+    "ConceptExplainer": ("CONCEPT_EXPLAINER", "http://127.0.0.1:8003/explain-concept"),
+}
+
+
+# Graph nodes that put chat history into their prompt -> environment suffix.
+HISTORY_NODES = {
+    "NoteMaker": "NOTE_MAKER",
+    "FlashcardGenerator": "FLASHCARD_GENERATOR",
+    "ConceptExplainer": "CONCEPT_EXPLAINER",
+    "route_and_extract": "ROUTE_AND_EXTRACT",
+}
+
+
+def _tool_endpoints_from_env() -> Dict[str, ToolEndpoint]:
+    connect_timeout = float(os.getenv("TOOL_CONNECT_TIMEOUT", ToolEndpoint.connect_timeout))
+    read_timeout = float(os.getenv("TOOL_READ_TIMEOUT", ToolEndpoint.read_timeout))
+    return {
+        tool: ToolEndpoint(
+            url=os.getenv(f"{prefix}_URL", default_url),
+            connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", connect_timeout)),
+            read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", read_timeout)),
+        )
+        for tool, (prefix, default_url) in TOOL_DEFAULTS.items()
+    }
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Runtime settings, read from the environment (.env locally, the ConfigMap in k8s)."""
+
+    gemini_model: str = "models/gemini-pro-latest"
+    # "gemini", or "fake" for the offline model in src/fake_llm.py
+    # (benchmarks, integration tests), with its latency distribution.
+    llm_backend: str = "gemini"
+    fake_llm_latency_ms: float = 100.0
+    fake_llm_latency_distribution: str = "fixed"
+    fake_llm_latency_jitter: float = 0.5
+    # Bounded pool for the remaining synchronous graph nodes, so they cannot
+    # pile up unbounded threads under load.
+    thread_pool_size: int = 32
+
+    # Shared HTTP client used for every tool call.
+    tool_endpoints: Dict[str, ToolEndpoint] = field(
+        default_factory=lambda: {
+            tool: ToolEndpoint(url=url) for tool, (_, url) in TOOL_DEFAULTS.items()
+        }
+    )
+    tool_max_connections: int = 100
+    tool_max_keepalive_connections: int = 20
+    tool_keepalive_expiry: float = 30.0
+    tool_http2: bool = False
+
+    # Rule/classifier router in front of the Gemini router. Queries it is at
+    # least `prerouter_threshold` sure about never reach the LLM router;
+    # `prerouter_shadow_rate` of those are still sent to it in the background,
+    # so the fast path's agreement with the LLM router is measured too.
+    prerouter_enabled: bool = True
+    prerouter_threshold: float = 0.9
+    prerouter_shadow_rate: float = 0.05
+    prerouter_examples_path: Optional[str] = None
+
+    # Whole-graph response cache in front of app.ainvoke: "memory"
+    # (per-process LRU) or "sqlite" (file at response_cache_path, shared by
+    # the worker processes on the host).
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "memory"
+    response_cache_path: str = "response_cache.sqlite3"
+    response_cache_max_entries: int = 2048
+    response_cache_ttl: float = 3600.0
+    response_cache_max_bytes: int = 32 * 1024 * 1024
+    response_cache_near_duplicates: bool = False
+    response_cache_similarity: float = 0.9
+
+    # Per-node memoization of the extractor and formatter LLM calls:
+    # "memory" (in-process LRU), "sqlite" (on-disk at node_cache_path) or "none".
+    node_cache_backend: str = "memory"
+    node_cache_max_entries: int = 4096
+    node_cache_path: str = "node_cache.sqlite3"
+
+    # "llm" sends tool JSON to Gemini for formatting; "template" renders the
+    # known tool schemas locally. Requests may override it per call.
+    formatter_mode: str = "llm"
+    formatter_template_tools: Tuple[str, ...] = tuple(TOOL_DEFAULTS)
+    # Before tool JSON reaches the LLM formatter, empty fields are dropped,
+    # lists keep their first tool_response_max_items entries and strings are
+    # cut to tool_response_max_chars characters.
+    tool_response_max_items: int = 20
+    tool_response_max_chars: int = 2000
+
+    # "sequential" runs route_query then an extractor (two LLM calls);
+    # "combined" routes and extracts in one structured-output call.
+    graph_mode: str = "sequential"
+
+    # Chat-history windowing before prompts are built. Each node gets
+    # history_token_budget tokens unless HISTORY_TOKEN_BUDGET_<NODE> says
+    # otherwise; turns beyond the window are summarized or dropped.
+    history_token_budget: int = 1500
+    history_node_budgets: Dict[str, int] = field(default_factory=dict)
+    history_keep_last_turns: int = 6
+    history_older_turns: str = "summarize"
+    history_summary_tokens: int = 200
+
+    # Server-side sessions for requests that carry a session_id: "memory"
+    # (per-process LRU), "sqlite" (file at session_path, shared by processes
+    # on the host) or "none". Sessions idle for session_ttl seconds expire.
+    session_backend: str = "memory"
+    session_max_entries: int = 10000
+    session_ttl: float = 3600.0
+    session_path: str = "sessions.sqlite3"
+
+    # /orchestrate/batch: at most batch_concurrency graph runs at a time per
+    # batch, and at most batch_max_items items per call.
+    batch_concurrency: int = 8
+    batch_max_items: int = 200
+
+    # Adaptive (AIMD) concurrency limit per upstream - each LLM model and
+    # each tool. Calls over the limit fail fast with a 503 and Retry-After.
+    limiter_enabled: bool = True
+    limiter_initial_limit: int = 20
+    limiter_min_limit: int = 1
+    limiter_max_limit: int = 200
+    limiter_backoff: float = 0.9
+    limiter_latency_tolerance: float = 3.0
+
+    # End-to-end budget for one request (0 disables it). Every node and
+    # upstream call gets what is left; running out yields a fallback answer.
+    request_deadline: float = 25.0
+    # Tool calls: bounded retries with jittered backoff, an optional hedged
+    # duplicate once a call is slower than the tool's p95, and a circuit
+    # breaker that opens after breaker_failure_threshold failures in a row.
+    tool_retries: int = 2
+    tool_retry_base_delay: float = 0.1
+    tool_retry_max_delay: float = 1.0
+    tool_hedging: bool = False
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+    # Opt-in: when the pre-router's guess is at least this confident (but
+    # below prerouter_threshold, so the LLM router still runs), start that
+    # tool's extractor call in parallel with routing.
+    speculation_enabled: bool = False
+    speculation_threshold: float = 0.5
+
+    # Admission control in front of graph execution: at most
+    # admission_concurrency graph runs at a time per worker (0 disables it),
+    # the rest queued by priority class and user, up to admission_max_queue
+    # requests and admission_max_wait seconds; beyond that requests get a 503.
+    # A user holds at most admission_per_user_limit slots while others wait.
+    admission_concurrency: int = 32
+    admission_max_queue: int = 256
+    admission_max_wait: float = 30.0
+    admission_per_user_limit: int = 4
+
+    # Single-flight: concurrent identical graph runs (same query, history
+    # and profile), LLM calls and tool calls wait on one in-flight call and
+    # share its result or error.
+    coalescing_enabled: bool = True
+
+    # Startup warm-up before /ready turns green; the synthetic request goes
+    # through the whole graph (one real Gemini call) and is opt-in.
+    warmup_enabled: bool = True
+    warmup_synthetic_request: bool = False
+
+    # Profile-adaptation rules (YAML/JSON file, or a directory of them),
+    # compiled at startup; defaults to src/data/adaptation_rules.yml.
+    # Results are cached for up to adaptation_cache_entries distinct profiles.
+    adaptation_rules_path: Optional[str] = None
+    adaptation_cache_entries: int = 10000
+
+    # Leveled logging for the src.* modules, each line tagged with the
+    # request ID. Tracing gives every request an ID (X-Request-ID, echoed
+    # back) and a span per graph node, LLM call and tool call; traces are
+    # appended as OTLP/JSON lines to trace_file (a trace_sample_rate share of
+    # them), and the span tree of requests slower than slow_request_threshold
+    # seconds is logged (a slow_request_sample_rate share of them).
+    log_level: str = "INFO"
+    tracing_enabled: bool = True
+    trace_file: Optional[str] = None
+    trace_sample_rate: float = 1.0
+    slow_request_threshold: float = 5.0
+    slow_request_sample_rate: float = 1.0
+
+    # `python -m src.serve`: server_workers uvicorn worker processes share the
+    # listening socket. A worker is replaced, finishing its in-flight requests
+    # first, after server_max_requests requests (plus up to
+    # server_max_requests_jitter, so workers do not all recycle at once; 0
+    # never recycles) or when it stops answering the supervisor's health
+    # check. Shutdown waits up to server_graceful_timeout seconds.
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1
+    server_max_requests: int = 0
+    server_max_requests_jitter: int = 0
+    server_graceful_timeout: int = 30
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            gemini_model=os.getenv("GEMINI_MODEL", cls.gemini_model),
+            llm_backend=os.getenv("LLM_BACKEND", cls.llm_backend).lower(),
+            fake_llm_latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", cls.fake_llm_latency_ms)),
+            fake_llm_latency_distribution=os.getenv(
+                "FAKE_LLM_LATENCY_DISTRIBUTION", cls.fake_llm_latency_distribution
+            ).lower(),
+            fake_llm_latency_jitter=float(os.getenv("FAKE_LLM_LATENCY_JITTER", cls.fake_llm_latency_jitter)),
+            thread_pool_size=int(os.getenv("THREAD_POOL_SIZE", cls.thread_pool_size)),
+            tool_endpoints=_tool_endpoints_from_env(),
+            tool_max_connections=int(os.getenv("TOOL_MAX_CONNECTIONS", cls.tool_max_connections)),
+            tool_max_keepalive_connections=int(
+                os.getenv("TOOL_MAX_KEEPALIVE_CONNECTIONS", cls.tool_max_keepalive_connections)
+            ),
+            tool_keepalive_expiry=float(os.getenv("TOOL_KEEPALIVE_EXPIRY", cls.tool_keepalive_expiry)),
+            tool_http2=_env_bool("TOOL_HTTP2", cls.tool_http2),
+            prerouter_enabled=_env_bool("PREROUTER_ENABLED", cls.prerouter_enabled),
+            prerouter_threshold=float(os.getenv("PREROUTER_THRESHOLD", cls.prerouter_threshold)),
+            prerouter_shadow_rate=float(os.getenv("PREROUTER_SHADOW_RATE", cls.prerouter_shadow_rate)),
+            prerouter_examples_path=os.getenv("PREROUTER_EXAMPLES_PATH"),
+            response_cache_enabled=_env_bool("RESPONSE_CACHE_ENABLED", cls.response_cache_enabled),
+            response_cache_backend=os.getenv("RESPONSE_CACHE_BACKEND", cls.response_cache_backend).lower(),
+            response_cache_path=os.getenv("RESPONSE_CACHE_PATH", cls.response_cache_path),
+            response_cache_max_entries=int(
+                os.getenv("RESPONSE_CACHE_MAX_ENTRIES", cls.response_cache_max_entries)
+            ),
+            response_cache_ttl=float(os.getenv("RESPONSE_CACHE_TTL", cls.response_cache_ttl)),
+            response_cache_max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", cls.response_cache_max_bytes)),
+            response_cache_near_duplicates=_env_bool(
+                "RESPONSE_CACHE_NEAR_DUPLICATES", cls.response_cache_near_duplicates
+            ),
+            response_cache_similarity=float(
+                os.getenv("RESPONSE_CACHE_SIMILARITY", cls.response_cache_similarity)
+            ),
+            node_cache_backend=os.getenv("NODE_CACHE_BACKEND", cls.node_cache_backend).lower(),
+            node_cache_max_entries=int(os.getenv("NODE_CACHE_MAX_ENTRIES", cls.node_cache_max_entries)),
+            node_cache_path=os.getenv("NODE_CACHE_PATH", cls.node_cache_path),
+            formatter_mode=os.getenv("FORMATTER_MODE", cls.formatter_mode).lower(),
+            formatter_template_tools=_env_list("FORMATTER_TEMPLATE_TOOLS", cls.formatter_template_tools),
+            tool_response_max_items=int(os.getenv("TOOL_RESPONSE_MAX_ITEMS", cls.tool_response_max_items)),
+            tool_response_max_chars=int(os.getenv("TOOL_RESPONSE_MAX_CHARS", cls.tool_response_max_chars)),
+            graph_mode=os.getenv("GRAPH_MODE", cls.graph_mode).lower(),
+            history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", cls.history_token_budget)),
+            history_node_budgets={
+                node: int(os.environ[f"HISTORY_TOKEN_BUDGET_{prefix}"])
+                for node, prefix in HISTORY_NODES.items()
+                if f"HISTORY_TOKEN_BUDGET_{prefix}" in os.environ
+            },
+            history_keep_last_turns=int(os.getenv("HISTORY_KEEP_LAST_TURNS", cls.history_keep_last_turns)),
+            history_older_turns=os.getenv("HISTORY_OLDER_TURNS", cls.history_older_turns).lower(),
+            history_summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", cls.history_summary_tokens)),
+            session_backend=os.getenv("SESSION_BACKEND", cls.session_backend).lower(),
+            session_max_entries=int(os.getenv("SESSION_MAX_ENTRIES", cls.session_max_entries)),
+            session_ttl=float(os.getenv("SESSION_TTL", cls.session_ttl)),
+            session_path=os.getenv("SESSION_PATH", cls.session_path),
+            batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", cls.batch_concurrency)),
+            batch_max_items=int(os.getenv("BATCH_MAX_ITEMS", cls.batch_max_items)),
+            limiter_enabled=_env_bool("LIMITER_ENABLED", cls.limiter_enabled),
+            limiter_initial_limit=int(os.getenv("LIMITER_INITIAL_LIMIT", cls.limiter_initial_limit)),
+            limiter_min_limit=int(os.getenv("LIMITER_MIN_LIMIT", cls.limiter_min_limit)),
+            limiter_max_limit=int(os.getenv("LIMITER_MAX_LIMIT", cls.limiter_max_limit)),
+            limiter_backoff=float(os.getenv("LIMITER_BACKOFF", cls.limiter_backoff)),
+            limiter_latency_tolerance=float(
+                os.getenv("LIMITER_LATENCY_TOLERANCE", cls.limiter_latency_tolerance)
+            ),
+            request_deadline=float(os.getenv("REQUEST_DEADLINE", cls.request_deadline)),
+            tool_retries=int(os.getenv("TOOL_RETRIES", cls.tool_retries)),
+            tool_retry_base_delay=float(os.getenv("TOOL_RETRY_BASE_DELAY", cls.tool_retry_base_delay)),
+            tool_retry_max_delay=float(os.getenv("TOOL_RETRY_MAX_DELAY", cls.tool_retry_max_delay)),
+            tool_hedging=_env_bool("TOOL_HEDGING", cls.tool_hedging),
+            breaker_failure_threshold=int(
+                os.getenv("BREAKER_FAILURE_THRESHOLD", cls.breaker_failure_threshold)
+            ),
+            breaker_reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", cls.breaker_reset_timeout)),
+            speculation_enabled=_env_bool("SPECULATION_ENABLED", cls.speculation_enabled),
+            speculation_threshold=float(os.getenv("SPECULATION_THRESHOLD", cls.speculation_threshold)),
+            admission_concurrency=int(os.getenv("ADMISSION_CONCURRENCY", cls.admission_concurrency)),
+            admission_max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", cls.admission_max_queue)),
+            admission_max_wait=float(os.getenv("ADMISSION_MAX_WAIT", cls.admission_max_wait)),
+            admission_per_user_limit=int(os.getenv("ADMISSION_PER_USER_LIMIT", cls.admission_per_user_limit)),
+            coalescing_enabled=_env_bool("COALESCING_ENABLED", cls.coalescing_enabled),
+            warmup_enabled=_env_bool("WARMUP_ENABLED", cls.warmup_enabled),
+            warmup_synthetic_request=_env_bool("WARMUP_SYNTHETIC_REQUEST", cls.warmup_synthetic_request),
+            adaptation_rules_path=os.getenv("ADAPTATION_RULES_PATH"),
+            adaptation_cache_entries=int(os.getenv("ADAPTATION_CACHE_ENTRIES", cls.adaptation_cache_entries)),
+            log_level=os.getenv("LOG_LEVEL", cls.log_level).upper(),
+            tracing_enabled=_env_bool("TRACING_ENABLED", cls.tracing_enabled),
+            trace_file=os.getenv("TRACE_FILE") or None,
+            trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", cls.trace_sample_rate)),
+            slow_request_threshold=float(os.getenv("SLOW_REQUEST_THRESHOLD", cls.slow_request_threshold)),
+            slow_request_sample_rate=float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", cls.slow_request_sample_rate)),
+            server_host=os.getenv("APP_HOST", cls.server_host),
+            server_port=int(os.getenv("APP_PORT", cls.server_port)),
+            server_workers=int(os.getenv("WEB_CONCURRENCY", cls.server_workers)),
+            server_max_requests=int(os.getenv("SERVER_MAX_REQUESTS", cls.server_max_requests)),
+            server_max_requests_jitter=int(
+                os.getenv("SERVER_MAX_REQUESTS_JITTER", cls.server_max_requests_jitter)
+            ),
+            server_graceful_timeout=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", cls.server_graceful_timeout)),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Returns the process-wide settings, read once from the environment."""
+    return Settings.from_env()
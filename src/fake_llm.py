@@ -0,0 +1,163 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+from src.history import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# First keyword found in the query decides the route, like a well-behaved router.
+ROUTE_KEYWORDS = (
+    ("note", "NoteMaker"),
+    ("flashcard", "FlashcardGenerator"),
+    ("quiz", "FlashcardGenerator"),
+    ("explain", "ConceptExplainer"),
+    ("what is", "ConceptExplainer"),
+)
+
+_TOPIC_RE = re.compile(r"\b(?:on|about|of|explain|for)\s+(?:the\s+)?([\w\s'-]+?)(?:\s+(?:to|for)\s+me)?[\s?.!]*$", re.IGNORECASE)
+
+
+def fake_route(query: str) -> str:
+    query = query.lower()
+    for keyword, tool in ROUTE_KEYWORDS:
+        if keyword in query:
+            return tool
+    return "clarify"
+
+
+def fake_topic(query: str) -> str:
+    match = _TOPIC_RE.search(query)
+    return match.group(1).strip().title() if match else "Photosynthesis"
+
+
+def fake_tool_args(tool_name: str, query: str) -> dict:
+    """Arguments that validate against the tool's *Params model."""
+    topic = fake_topic(query)
+    if tool_name == "NoteMaker":
+        return {"topic": topic, "subject": "Science", "note_taking_style": "outline"}
+    if tool_name == "FlashcardGenerator":
+        return {"topic": topic, "count": 5, "difficulty": "medium", "subject": "Science"}
+    if tool_name == "ConceptExplainer":
+        return {"concept_to_explain": topic, "current_topic": "Science", "desired_depth": "basic"}
+    raise ValueError(f"Unknown tool '{tool_name}'.")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatGoogleGenerativeAI (LLM_BACKEND=fake), for
+    benchmarks and integration tests. Routes by keyword, fills tool-call
+    arguments from the query and answers text prompts with a short canned
+    reply, after a latency drawn from `latency_distribution` around
+    `latency_ms`. Supports with_structured_output, bind_tools and streaming.
+    """
+
+    model: str = "fake"
+    temperature: float = 0.0
+    latency_ms: float = 100.0
+    latency_distribution: str = "fixed"
+    # Spread of the uniform (+/- jitter * mean) and lognormal (sigma) distributions.
+    latency_jitter: float = 0.5
+    seed: Optional[int] = None
+
+    _random: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.latency_distribution}'.")
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def sample_latency(self) -> float:
+        mean = self.latency_ms / 1000
+        if self.latency_distribution == "uniform":
+            return max(0.0, self._random.uniform(mean * (1 - self.latency_jitter), mean * (1 + self.latency_jitter)))
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1 / mean) if mean else 0.0
+        if self.latency_distribution == "lognormal":
+            # Median at `mean`, long right tail like real LLM latencies.
+            return mean * self._random.lognormvariate(0, self.latency_jitter)
+        return mean
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=list(tools), **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(structured_schema=schema) | RunnableLambda(
+            lambda message: schema.model_validate(message.tool_calls[0]["args"])
+        )
+
+    def _reply(self, messages: List[BaseMessage], tools=None, structured_schema=None) -> AIMessage:
+        query = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if structured_schema is not None:
+            tool_name = fake_route(query)
+            if "decision" in structured_schema.model_fields:
+                decision: Dict[str, Any] = {"tool_name": tool_name}
+                if tool_name != "clarify":
+                    decision["arguments"] = fake_tool_args(tool_name, query)
+                args = {"decision": decision}
+            else:
+                args = {"tool_name": tool_name}
+            return AIMessage(content="", tool_calls=[{"name": structured_schema.__name__, "args": args, "id": "fake"}])
+        if tools:
+            name = tools[0].__name__
+            args = fake_tool_args(name.removesuffix("Input"), query)
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "fake"}])
+        return AIMessage(content=f"Here is what I found for you about {fake_topic(query)}. Let me know if you want more!")
+
+    def _result(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"), kwargs.get("structured_schema"))
+        input_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        output_tokens = estimate_tokens(str(message.content) or str(message.tool_calls))
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.sample_latency())
+        return self._result(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.sample_latency())
+        return self._result(messages, **kwargs)
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.sample_latency())
+        message = self._result(messages, **kwargs).generations[0].message
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+                    for call in message.tool_calls
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            chunk = AIMessageChunk(
+                content=word if i == 0 else f" {word}",
+                usage_metadata=message.usage_metadata if last else None,
+            )
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
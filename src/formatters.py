@@ -0,0 +1,119 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.latency import LatencyWindow
+
+FORMATTER_MODES = ("llm", "template")
+
+
+def _bullets(items: Iterable, prefix: str = "- ") -> List[str]:
+    return [f"{prefix}{item}" for item in items if item]
+
+
+def _section(heading: str, items: Iterable) -> List[str]:
+    lines = _bullets(items or [])
+    return [f"**{heading}**", *lines, ""] if lines else []
+
+
+def render_note_maker(response: dict) -> Optional[str]:
+    if "note_sections" not in response:
+        return None
+    lines = [f"# {response.get('title') or response.get('topic') or 'Your notes'}", ""]
+    if response.get("summary"):
+        lines += [response["summary"], ""]
+    for section in response["note_sections"] or []:
+        lines += [f"## {section.get('title', '')}", ""]
+        if section.get("content"):
+            lines += [section["content"], ""]
+        lines += _section("Key points", section.get("key_points"))
+        lines += _section("Examples", section.get("examples"))
+        lines += _section("Analogies", section.get("analogies"))
+    lines += _section("Key concepts", response.get("key_concepts"))
+    lines += _section("Connections to what you already know", response.get("connections_to_prior_learning"))
+    lines += _section("Visual elements", response.get("visual_elements"))
+    lines += _section("Practice suggestions", response.get("practice_suggestions"))
+    lines += _section("Sources", response.get("source_references"))
+    return "\n".join(lines).strip()
+
+
+def render_flashcards(response: dict) -> Optional[str]:
+    if "flashcards" not in response:
+        return None
+    heading = f"# Flashcards: {response['topic']}" if response.get("topic") else "# Flashcards"
+    lines = [heading, ""]
+    if response.get("difficulty"):
+        lines += [f"*Difficulty: {response['difficulty']}*", ""]
+    for number, card in enumerate(response["flashcards"] or [], start=1):
+        title = f" {card['title']}" if card.get("title") else ""
+        lines += [
+            f"### {number}.{title}",
+            f"**Q:** {card.get('question', '')}",
+            f"**A:** {card.get('answer', '')}",
+        ]
+        if card.get("example"):
+            lines.append(f"*Example:* {card['example']}")
+        lines.append("")
+    if response.get("adaptation_details"):
+        lines.append(f"_{response['adaptation_details']}_")
+    return "\n".join(lines).strip()
+
+
+def render_concept_explanation(response: dict) -> Optional[str]:
+    if "explanation" not in response:
+        return None
+    lines = [response["explanation"], ""]
+    lines += _section("Examples", response.get("examples"))
+    lines += _section("Related concepts", response.get("related_concepts"))
+    lines += _section("Visual aids", response.get("visual_aids"))
+    lines += _section("Check your understanding", response.get("practice_questions"))
+    lines += _section("Sources", response.get("source_references"))
+    return "\n".join(lines).strip()
+
+
+# Tool name -> deterministic markdown renderer for its response schema.
+TEMPLATE_RENDERERS: Dict[str, Callable[[dict], Optional[str]]] = {
+    "NoteMaker": render_note_maker,
+    "FlashcardGenerator": render_flashcards,
+    "ConceptExplainer": render_concept_explanation,
+}
+
+
+def render_template(tool_name: str, api_response) -> Optional[str]:
+    """
+    Renders a tool response as markdown without an LLM call. Returns None for
+    unknown tools or payloads that do not match the expected schema, so the
+    caller can fall back to the LLM formatter.
+    """
+    renderer = TEMPLATE_RENDERERS.get(tool_name)
+    if renderer is None or not isinstance(api_response, dict):
+        return None
+    return renderer(api_response)
+
+
+class FormatterStats:
+    """Formatter latency per (tool, mode), and the latency the template path saves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Dict[str, LatencyWindow]] = defaultdict(dict)
+
+    def record(self, tool_name: str, mode: str, seconds: float) -> None:
+        with self._lock:
+            window = self._windows[tool_name].setdefault(mode, LatencyWindow())
+        window.add(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            windows = {tool: dict(modes) for tool, modes in self._windows.items()}
+        snapshot = {}
+        for tool, modes in windows.items():
+            entry = {mode: window.summary() for mode, window in modes.items()}
+            llm, template = modes.get("llm"), modes.get("template")
+            if llm and template and llm.mean() is not None and template.mean() is not None:
+                entry["saved_ms_per_request"] = round((llm.mean() - template.mean()) * 1000, 3)
+            snapshot[tool] = entry
+        return snapshot
+
+
+formatter_stats = FormatterStats()
@@ -1,9 +1,14 @@
 import asyncio
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
+from src.config import get_settings
 from src.graph_state import GraphState
+from src.metrics import instrument_node
+from src.resilience import guard_node
+from src.tracing import trace_node
 from src.nodes import (
     route_query,
+    route_and_extract,
     extract_note_maker_parameters,
     extract_flashcard_parameters,
     extract_concept_explainer_parameters,
@@ -29,64 +34,120 @@ def decide_on_extraction(state: GraphState) -> str:
     else:
         return "request_missing_info_node"
 
-# --- ASSEMBLE THE GRAPH ---
-workflow = StateGraph(GraphState)
-
-# Add nodes
-workflow.add_node("router", route_query)
-workflow.add_node("NoteMaker", extract_note_maker_parameters)
-workflow.add_node("FlashcardGenerator", extract_flashcard_parameters) # This node now has conditional outputs
-workflow.add_node("ConceptExplainer", extract_concept_explainer_parameters)
-workflow.add_node("clarify", generate_clarification_response)
-workflow.add_node("request_missing_info_node", request_missing_info)
-workflow.add_node("adaptation_node", contextual_adaptation)
-workflow.add_node("tool_executor", execute_tool)
-workflow.add_node("formatter_node", format_final_response)
-
-# Set the Entry Point
-workflow.set_entry_point("router")
-
-# --- DEFINE THE EDGES ---
-
-# From Router to specific tool extractors or clarification
-workflow.add_conditional_edges(
-    "router",
-    decide_next_node,
-    {
-        "NoteMaker": "NoteMaker",
-        "FlashcardGenerator": "FlashcardGenerator",
-        "ConceptExplainer": "ConceptExplainer",
-        "clarify": "clarify",
-    },
-)
-
-# For successful paths that don't need a loop yet
-workflow.add_edge("NoteMaker", "adaptation_node")
-workflow.add_edge("ConceptExplainer", "adaptation_node")
-
-# For the Flashcard path, add the new conditional loop
-workflow.add_conditional_edges(
-    "FlashcardGenerator",
-    decide_on_extraction,
-    {
-        "adaptation_node": "adaptation_node",
-        "request_missing_info_node": "request_missing_info_node",
-    },
-)
-
-# From adaptation to execution
-workflow.add_edge("adaptation_node", "tool_executor")
+def decide_after_route_and_extract(state: GraphState) -> str:
+    """Decides the next node after the combined router + extractor."""
+    tool = state.get("selected_tool", "clarify")
+    if tool == "clarify":
+        return "clarify"
+    if tool == "FlashcardGenerator":
+        return decide_on_extraction(state)
+    return "adaptation_node"
 
-# From execution to formatting
-workflow.add_edge("tool_executor", "formatter_node")
+# --- ASSEMBLE THE GRAPH ---
 
-# Endpoints for the graph
-workflow.add_edge("formatter_node", END)
-workflow.add_edge("clarify", END)
-workflow.add_edge("request_missing_info_node", END)
+def _add_node(workflow: StateGraph, name: str, node) -> None:
+    """
+    Adds a node wrapped so its duration lands in graph_node_duration_seconds
+    and in a span of the request's trace, and so it is skipped once the
+    request deadline has passed.
+    """
+    workflow.add_node(name, instrument_node(name, trace_node(name, guard_node(name, node))))
+
+def _add_shared_nodes(workflow: StateGraph) -> None:
+    """Nodes and edges common to both graph modes, from clarification/adaptation onwards."""
+    _add_node(workflow, "clarify", generate_clarification_response)
+    _add_node(workflow, "request_missing_info_node", request_missing_info)
+    _add_node(workflow, "adaptation_node", contextual_adaptation)
+    _add_node(workflow, "tool_executor", execute_tool)
+    _add_node(workflow, "formatter_node", format_final_response)
+
+    # From adaptation to execution
+    workflow.add_edge("adaptation_node", "tool_executor")
+
+    # From execution to formatting
+    workflow.add_edge("tool_executor", "formatter_node")
+
+    # Endpoints for the graph
+    workflow.add_edge("formatter_node", END)
+    workflow.add_edge("clarify", END)
+    workflow.add_edge("request_missing_info_node", END)
+
+def build_sequential_graph() -> StateGraph:
+    """router -> extract_*_parameters -> adaptation -> tool -> formatter."""
+    workflow = StateGraph(GraphState)
+
+    # Add nodes
+    _add_node(workflow, "router", route_query)
+    _add_node(workflow, "NoteMaker", extract_note_maker_parameters)
+    _add_node(workflow, "FlashcardGenerator", extract_flashcard_parameters) # This node now has conditional outputs
+    _add_node(workflow, "ConceptExplainer", extract_concept_explainer_parameters)
+    _add_shared_nodes(workflow)
+
+    # Set the Entry Point
+    workflow.set_entry_point("router")
+
+    # --- DEFINE THE EDGES ---
+
+    # From Router to specific tool extractors or clarification
+    workflow.add_conditional_edges(
+        "router",
+        decide_next_node,
+        {
+            "NoteMaker": "NoteMaker",
+            "FlashcardGenerator": "FlashcardGenerator",
+            "ConceptExplainer": "ConceptExplainer",
+            "clarify": "clarify",
+        },
+    )
+
+    # For successful paths that don't need a loop yet
+    workflow.add_edge("NoteMaker", "adaptation_node")
+    workflow.add_edge("ConceptExplainer", "adaptation_node")
+
+    # For the Flashcard path, add the new conditional loop
+    workflow.add_conditional_edges(
+        "FlashcardGenerator",
+        decide_on_extraction,
+        {
+            "adaptation_node": "adaptation_node",
+            "request_missing_info_node": "request_missing_info_node",
+        },
+    )
+    return workflow
+
+def build_combined_graph() -> StateGraph:
+    """route_and_extract (one LLM call) -> adaptation -> tool -> formatter."""
+    workflow = StateGraph(GraphState)
+
+    _add_node(workflow, "route_and_extract", route_and_extract)
+    _add_shared_nodes(workflow)
+
+    workflow.set_entry_point("route_and_extract")
+
+    workflow.add_conditional_edges(
+        "route_and_extract",
+        decide_after_route_and_extract,
+        {
+            "adaptation_node": "adaptation_node",
+            "request_missing_info_node": "request_missing_info_node",
+            "clarify": "clarify",
+        },
+    )
+    return workflow
+
+GRAPH_BUILDERS = {
+    "sequential": build_sequential_graph,
+    "combined": build_combined_graph,
+}
+
+def build_graph(mode: str = "sequential"):
+    """Compiles the graph variant selected by GRAPH_MODE."""
+    if mode not in GRAPH_BUILDERS:
+        raise ValueError(f"Unknown GRAPH_MODE '{mode}'; expected one of {sorted(GRAPH_BUILDERS)}.")
+    return GRAPH_BUILDERS[mode]().compile()
 
 # Compile the Graph
-app = workflow.compile()
+app = build_graph(get_settings().graph_mode)
 
 
 # --- TEST BLOCK ---
@@ -1,14 +1,21 @@
 from typing import List, TypedDict
 
-from src.schemas import ChatMessage, UserInfo
+from src.schemas import ChatTurn
 
 
 class GraphState(TypedDict):
-    user_profile: UserInfo
-    chat_history: List[ChatMessage]
+    # Plain dicts: the request's validated UserInfo, dumped once, and its chat history.
+    user_profile: dict
+    chat_history: List[ChatTurn]
     current_query: str
     selected_tool: str
     extracted_parameters: dict
+    extraction_status: str
     contextual_notes: str
     api_response: dict
+    # Estimated tokens of the tool's raw response body, before validation.
+    api_response_tokens: int
     final_output: str
+    formatter_mode: str
+    # Set by route_query when a speculative extractor run was committed.
+    speculation_id: str
@@ -0,0 +1,114 @@
+import math
+import re
+from typing import List, Optional
+
+from src.config import get_settings
+
+# Rough per-message overhead of the chat template (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate (~4 characters per token for English), cheap enough
+    to run on every message of every request. No tokenizer download needed.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _content(message) -> str:
+    return message["content"] if isinstance(message, dict) else message.content
+
+
+def _role(message) -> str:
+    return message["role"] if isinstance(message, dict) else message.role
+
+
+def history_tokens(history: List) -> int:
+    return sum(estimate_tokens(_content(m)) + MESSAGE_OVERHEAD_TOKENS for m in history)
+
+
+def summarize(messages: List, max_tokens: int) -> Optional[dict]:
+    """
+    Extractive summary of older turns: the start of each user message, newest
+    first, until `max_tokens` is reached. Deterministic and LLM-free.
+    """
+    points = []
+    budget = max_tokens - estimate_tokens(SUMMARY_PREFIX) - MESSAGE_OVERHEAD_TOKENS
+    for message in reversed(messages):
+        if _role(message) != "user":
+            continue
+        point = " ".join(_WORD_RE.findall(_content(message))[:20])
+        cost = estimate_tokens(point) + 1
+        if cost > budget:
+            break
+        points.append(point)
+        budget -= cost
+    if not points:
+        return None
+    return {"role": "assistant", "content": SUMMARY_PREFIX + "; ".join(reversed(points))}
+
+
+class HistoryManager:
+    """
+    Fits chat history into a token budget before it goes into a prompt.
+
+    The last `keep_last_turns` turns (user + assistant messages) are kept
+    verbatim, newest first, as long as they fit in `budget_tokens`. Older
+    messages are replaced by a short extractive summary when
+    `older_turns="summarize"`, or dropped when it is "drop".
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 1500,
+        keep_last_turns: int = 6,
+        older_turns: str = "summarize",
+        summary_tokens: int = 200,
+    ):
+        if older_turns not in ("summarize", "drop"):
+            raise ValueError(f"Unknown older_turns mode '{older_turns}'.")
+        self.budget_tokens = budget_tokens
+        self.keep_last_turns = keep_last_turns
+        self.older_turns = older_turns
+        self.summary_tokens = summary_tokens
+
+    def window(self, history: List) -> List:
+        if not history:
+            return []
+        if history_tokens(history) <= self.budget_tokens and len(history) <= self.keep_last_turns * 2:
+            return list(history)
+
+        summary_budget = self.summary_tokens if self.older_turns == "summarize" else 0
+        budget = self.budget_tokens - summary_budget
+        kept = []
+        for message in reversed(history[-self.keep_last_turns * 2:] if self.keep_last_turns else []):
+            cost = estimate_tokens(_content(message)) + MESSAGE_OVERHEAD_TOKENS
+            if cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+        kept.reverse()
+
+        older = history[:len(history) - len(kept)]
+        if self.older_turns == "summarize" and older:
+            summary = summarize(older, self.summary_tokens)
+            if summary is not None:
+                return [summary] + kept
+        return kept
+
+
+def history_for(node: str, history: List) -> List:
+    """The windowed history for `node`, using its configured token budget."""
+    settings = get_settings()
+    manager = HistoryManager(
+        budget_tokens=settings.history_node_budgets.get(node, settings.history_token_budget),
+        keep_last_turns=settings.history_keep_last_turns,
+        older_turns=settings.history_older_turns,
+        summary_tokens=settings.history_summary_tokens,
+    )
+    return manager.window(history)
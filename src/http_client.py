@@ -0,0 +1,69 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from src.config import Settings, ToolEndpoint, get_settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_tool_client(settings: Settings) -> httpx.AsyncClient:
+    """Builds the pooled, keep-alive client shared by every tool call."""
+    http2 = settings.tool_http2
+    if http2 and not _http2_available():
+        logger.warning("TOOL_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1.")
+        http2 = False
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.tool_max_connections,
+            max_keepalive_connections=settings.tool_max_keepalive_connections,
+            keepalive_expiry=settings.tool_keepalive_expiry,
+        ),
+        http2=http2,
+    )
+
+
+async def start_tool_client() -> httpx.AsyncClient:
+    """Opens the shared client; called from the FastAPI lifespan."""
+    global _client
+    if _client is None:
+        _client = create_tool_client(get_settings())
+    return _client
+
+
+async def close_tool_client() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+def get_tool_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client. Outside the FastAPI app (scripts, tests) it is
+    created on first use.
+    """
+    global _client
+    if _client is None:
+        _client = create_tool_client(get_settings())
+    return _client
+
+
+def tool_timeout(endpoint: ToolEndpoint, remaining: Optional[float] = None) -> httpx.Timeout:
+    """The endpoint's timeouts, capped by the time left before the request deadline."""
+    connect, read = endpoint.connect_timeout, endpoint.read_timeout
+    if remaining is not None:
+        connect, read = min(connect, remaining), min(read, remaining)
+    return httpx.Timeout(read, connect=connect, read=read)
@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+
+from src.config import get_settings
+from src.latency import LatencyWindow
+
+# Upstream status codes that mean "send less traffic", not "bad request".
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamOverloaded(Exception):
+    """Raised instead of queuing when an upstream is at its concurrency limit."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"Upstream '{upstream}' is at its concurrency limit; retry in {retry_after}s.")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_overload(error: BaseException) -> bool:
+    """Timeouts, 429 and 5xx from an upstream, however the client library reports them."""
+    if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in OVERLOAD_STATUSES
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and status in OVERLOAD_STATUSES
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit for one upstream (additive increase,
+    multiplicative decrease).
+
+    Each successful call raises the limit by 1/limit, i.e. by one per limit's
+    worth of successes. An overload signal - a timeout, 429 or 5xx, or a call
+    slower than `latency_tolerance` times the recent median - multiplies it
+    by `backoff`. Calls beyond the limit are rejected immediately with
+    UpstreamOverloaded rather than queued.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff: float = 0.9,
+        latency_tolerance: float = 3.0,
+        min_samples: int = 20,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self.overloads = 0
+        self.latency = LatencyWindow(size=200)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                raise UpstreamOverloaded(self.name, self.retry_after())
+            self.in_flight += 1
+
+    def release(self, seconds: float, overloaded: bool = False) -> None:
+        median = self.latency.percentile(0.5) if self.latency.count >= self.min_samples else None
+        slow = median is not None and seconds > median * self.latency_tolerance
+        if not overloaded:
+            self.latency.add(seconds)
+        with self._lock:
+            self.in_flight -= 1
+            if overloaded or slow:
+                self.overloads += 1
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        """Whole seconds until a slot is likely to free up: the median call latency."""
+        median = self.latency.percentile(0.5)
+        return max(1, math.ceil(median)) if median is not None else 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds one unit of concurrency for the duration of the block. The
+        block may call `overloaded()` on the yielded slot to report a 429/5xx
+        it handled itself; exceptions are classified with is_overload.
+        """
+        self.acquire()
+        slot = _Slot()
+        start = time.perf_counter()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.overloaded(is_overload(e))
+            raise
+        finally:
+            self.release(time.perf_counter() - start, slot.is_overloaded)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "overloads": self.overloads,
+            }
+
+
+class _Slot:
+    def __init__(self):
+        self.is_overloaded = False
+
+    def overloaded(self, value: bool = True) -> None:
+        self.is_overloaded = value
+
+
+class LimiterRegistry:
+    """One AIMDLimiter per upstream name ("llm:<model>", "tool:<name>"), created on first use."""
+
+    def __init__(self):
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str) -> Optional[AIMDLimiter]:
+        settings = get_settings()
+        if not settings.limiter_enabled:
+            return None
+        with self._lock:
+            limiter = self._limiters.get(upstream)
+            if limiter is None:
+                limiter = self._limiters[upstream] = AIMDLimiter(
+                    upstream,
+                    initial_limit=settings.limiter_initial_limit,
+                    min_limit=settings.limiter_min_limit,
+                    max_limit=settings.limiter_max_limit,
+                    backoff=settings.limiter_backoff,
+                    latency_tolerance=settings.limiter_latency_tolerance,
+                )
+            return limiter
+
+    def clear(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+limiters = LimiterRegistry()
+
+
+@asynccontextmanager
+async def upstream_slot(upstream: str):
+    """limiters.get(upstream).slot(), or a no-op slot when limiting is disabled."""
+    limiter = limiters.get(upstream)
+    if limiter is None:
+        yield _Slot()
+        return
+    async with limiter.slot() as slot:
+        yield slot
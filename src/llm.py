@@ -0,0 +1,123 @@
+import threading
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple, Type
+
+from langchain.prompts import ChatPromptTemplate
+from pydantic import BaseModel
+
+from src.config import get_settings
+
+PromptMessages = Sequence[Tuple[str, str]]
+
+
+class LLMRegistry:
+    """
+    Builds each chat model and each prompt | llm chain once per process.
+
+    Models are keyed by (model name, temperature); chains additionally by the
+    prompt messages, the bound schema and how it is bound ("structured" for
+    with_structured_output, "tools" for bind_tools, None for plain text).
+    """
+
+    def __init__(self):
+        self._models: Dict[Hashable, Any] = {}
+        self._chains: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+        self.builds = 0
+        self.hits = 0
+
+    def get_model(self, model: Optional[str] = None, temperature: float = 0.0):
+        key = (model or get_settings().gemini_model, float(temperature))
+        llm = self._models.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._models.get(key)
+                if llm is None:
+                    llm = self._build_model(*key)
+                    self._models[key] = llm
+        return llm
+
+    def get_chain(
+        self,
+        messages: PromptMessages,
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.0,
+        schema: Optional[Type[BaseModel]] = None,
+        bind: Optional[str] = None,
+    ):
+        key = (
+            tuple(messages),
+            model or get_settings().gemini_model,
+            float(temperature),
+            schema,
+            bind,
+        )
+        chain = self._chains.get(key)
+        if chain is not None:
+            self.hits += 1
+            return chain
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is None:
+                chain = self._build_chain(*key)
+                self._chains[key] = chain
+                self.builds += 1
+            else:
+                self.hits += 1
+        return chain
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._chains.clear()
+            self.builds = 0
+            self.hits = 0
+
+    def stats(self) -> dict:
+        return {
+            "models": len(self._models),
+            "chains": len(self._chains),
+            "builds": self.builds,
+            "hits": self.hits,
+        }
+
+    def _build_model(self, model: str, temperature: float):
+        settings = get_settings()
+        if settings.llm_backend == "fake":
+            from src.fake_llm import FakeChatModel
+
+            return FakeChatModel(
+                model=model,
+                temperature=temperature,
+                latency_ms=settings.fake_llm_latency_ms,
+                latency_distribution=settings.fake_llm_latency_distribution,
+                latency_jitter=settings.fake_llm_latency_jitter,
+            )
+        if settings.llm_backend == "gemini":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(model=model, temperature=temperature)
+        raise ValueError(f"Unknown LLM_BACKEND '{settings.llm_backend}'.")
+
+    def _build_chain(self, messages, model, temperature, schema, bind):
+        llm = self.get_model(model, temperature)
+        if bind == "structured":
+            llm = llm.with_structured_output(schema)
+        elif bind == "tools":
+            llm = llm.bind_tools([schema])
+        elif bind is not None:
+            raise ValueError(f"Unknown bind mode '{bind}'.")
+        return ChatPromptTemplate.from_messages(list(messages)) | llm
+
+
+registry = LLMRegistry()
+
+
+def get_chat_model(model: Optional[str] = None, temperature: float = 0.0):
+    """Returns the shared chat model for (model, temperature)."""
+    return registry.get_model(model, temperature)
+
+
+def get_chain(messages: PromptMessages, **kwargs):
+    """Returns the shared prompt | llm chain for the given prompt and binding."""
+    return registry.get_chain(messages, **kwargs)
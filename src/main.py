@@ -1,57 +1,569 @@
-from fastapi import FastAPI
+import asyncio
+import hashlib
+import logging
+import time
+
+# Start of the module imports (LangChain, LangGraph, ...), for the startup report.
+IMPORTS_STARTED = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Literal, Optional
 
 # Import the compiled LangGraph app
+from src.adaptation import get_adaptation_engine
+from src.admission import PRIORITIES, admitted, get_admission_scheduler
+from src.cache import ResponseCache, get_response_cache
+from src.coalescing import flights
+from src.config import get_settings
+from src.formatters import formatter_stats
 from src.graph import app
-from src.schemas import UserInfo, ChatMessage
+from src.http_client import close_tool_client, start_tool_client
+from src.latency import LatencyWindow
+from src.limits import UpstreamOverloaded, limiters
+from src.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    REQUEST_FALLBACKS,
+    active_users,
+    latest_metrics,
+    llm_metrics_callback,
+    register_stats_collector,
+    worker_exited,
+)
+from src.llm import registry
+from src.node_cache import get_node_cache
+from src.nodes import profile_adaptations
+from src.prerouter import get_prerouter
+from src.resilience import FALLBACK_MESSAGE, CircuitOpen, DeadlineExceeded, breakers, deadline_scope
+from src.schemas import ChatTurn, UserInfo
+from src.serialization import FastJSONResponse, dumps
+from src.sessions import Session, get_session_store
+from src.speculation import speculator
+from src.streaming import graph_events, sse
+from src.tool_responses import tool_response_stats
+from src.tracing import configure_logging, slow_requests, start_trace, tracing_callback
+from src.warmup import readiness, warm_up
+
+readiness.record("module_imports", time.perf_counter() - IMPORTS_STARTED)
+
+logger = logging.getLogger(__name__)
 
 class OrchestratorRequest(BaseModel):
     """Defines the request body for the orchestrator endpoint."""
     current_query: str
-    user_profile: UserInfo
-    chat_history: List[ChatMessage] = Field(default_factory=list)
+    # With a session_id the server keeps profile and history between calls:
+    # send user_profile (and optionally chat_history) on the first call, then
+    # just the query. updated_chat_history then only holds the new turn.
+    session_id: Optional[str] = None
+    user_profile: Optional[UserInfo] = None
+    chat_history: List[ChatTurn] = Field(default_factory=list)
+    # Overrides FORMATTER_MODE for this request.
+    formatter_mode: Optional[Literal["llm", "template"]] = None
+    # "delta" returns only this turn's two messages in updated_chat_history,
+    # so clients that keep the transcript do not download it on every turn.
+    history_mode: Literal["full", "delta"] = "full"
+    # Admission class; defaults to the X-Priority header, then to
+    # "interactive" (or "batch" for /orchestrate/batch items).
+    priority: Optional[Literal["interactive", "batch"]] = None
 
 class OrchestratorResponse(BaseModel):
     """Defines the response body."""
     agent_response: str
-    updated_chat_history: List[ChatMessage]
+    updated_chat_history: List[ChatTurn]
+
+class BatchRequest(BaseModel):
+    """A burst of independent requests, e.g. one per student in a class."""
+    items: List[OrchestratorRequest]
+    # Stream each result as a server-sent event as soon as it finishes,
+    # instead of returning them all in order at the end.
+    stream: bool = False
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: Optional[OrchestratorResponse] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    # Graph runs actually made; identical (query, adapted profile) items share one.
+    unique_runs: int
+
+# Time from request to the first streamed token on /orchestrate/stream.
+time_to_first_token = LatencyWindow()
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    """
+    The LLM nodes are native async; the default executor only serves the few
+    synchronous nodes and library calls, so it is bounded by configuration.
+    The pooled tool client lives exactly as long as the app. Warm-up runs in
+    the background so /health answers at once while /ready waits for it.
+    """
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    executor = ThreadPoolExecutor(
+        max_workers=settings.thread_pool_size,
+        thread_name_prefix="orchestrator",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    await start_tool_client()
+    warmup_task = None
+    if settings.warmup_enabled:
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        readiness.ready = True
+    try:
+        yield
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+        await close_tool_client()
+        executor.shutdown(wait=False)
+        worker_exited()
 
 # Create the FastAPI app
 api = FastAPI(
     title="Autonomous AI Tutor Orchestrator",
     description="An intelligent middleware to connect an AI tutor to educational tools.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
-@api.post("/orchestrate", response_model=OrchestratorResponse)
-async def orchestrate(request: OrchestratorRequest):
+# Run config for every graph execution: per-node LLM call and token metrics,
+# and a span per LLM call in the request's trace.
+GRAPH_CONFIG = {"callbacks": [llm_metrics_callback, tracing_callback]}
+
+# Scrapes and probes are left out of the HTTP metrics.
+UNMETERED_PATHS = {"/metrics", "/health", "/ready"}
+
+@api.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Feeds http_request_duration_seconds / http_requests_total, labelled by route template."""
+    if request.url.path in UNMETERED_PATHS:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = "500"
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        handler = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_DURATION.labels(method=request.method, handler=handler).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(method=request.method, handler=handler, status=status).inc()
+
+@api.middleware("http")
+async def trace_request(request: Request, call_next):
     """
-    Receives a user query and conversation history, runs it through the agent,
-    and returns the agent's response.
+    Gives each request an ID (the client's X-Request-ID, or the trace ID),
+    echoed back in X-Request-ID, and a trace whose root span lasts until the
+    response body has been sent, so streamed responses are fully covered.
     """
-    inputs = {
+    if request.url.path in UNMETERED_PATHS or not get_settings().tracing_enabled:
+        return await call_next(request)
+    trace = start_trace(
+        f"{request.method} {request.url.path}",
+        request.headers.get("x-request-id"),
+        request.headers.get("traceparent"),
+    )
+    trace.root.set("http.method", request.method)
+    trace.root.set("http.target", request.url.path)
+    try:
+        response = await call_next(request)
+    except BaseException as e:
+        trace.root.fail(e)
+        trace.finish()
+        raise
+    trace.root.set("http.status_code", response.status_code)
+    response.headers["X-Request-ID"] = trace.request_id
+    body = response.body_iterator
+
+    async def body_then_finish():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            trace.finish()
+
+    response.body_iterator = body_then_finish()
+    return response
+
+def _load_session(request: OrchestratorRequest) -> Optional[Session]:
+    """
+    Resolves the request's session, starting it when the request brings a
+    profile. Stateless requests (no session_id) must carry the profile.
+    """
+    if request.session_id is None:
+        if request.user_profile is None:
+            raise HTTPException(status_code=422, detail="user_profile is required without a session_id.")
+        return None
+
+    store = get_session_store()
+    if store is None:
+        raise HTTPException(status_code=400, detail="Sessions are disabled on this server.")
+    session = store.get(request.session_id)
+    if session is None:
+        if request.user_profile is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Unknown or expired session_id; send user_profile to start a new session.",
+            )
+        session = Session(request.session_id, request.user_profile.model_dump(), list(request.chat_history))
+        store.save(session.session_id, session.user_profile, session.chat_history)
+    elif request.user_profile is not None:
+        session.user_profile = request.user_profile.model_dump()
+        store.save(session.session_id, session.user_profile)
+    return session
+
+async def _resolve_session(request: OrchestratorRequest) -> Optional[Session]:
+    """_load_session, off the event loop when it touches the store (a SQLite file may be busy)."""
+    if request.session_id is None:
+        return _load_session(request)
+    return await asyncio.to_thread(_load_session, request)
+
+@api.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded(request: Request, exc: UpstreamOverloaded):
+    """Shed load fast instead of letting the request queue into a timeout."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "upstream": exc.upstream},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def _graph_inputs(request: OrchestratorRequest, session: Optional[Session] = None) -> dict:
+    if session is not None:
+        user_profile, chat_history = session.user_profile, session.chat_history
+    else:
+        user_profile = request.user_profile.model_dump()
+        chat_history = request.chat_history
+    active_users.seen(user_profile["user_id"])
+    return {
         "current_query": request.current_query,
-        "user_profile": request.user_profile.dict(),
-        "chat_history": [msg.dict() for msg in request.chat_history],
+        "user_profile": user_profile,
+        "chat_history": chat_history,
+        "formatter_mode": request.formatter_mode or get_settings().formatter_mode,
     }
-    
-    # Run the graph
-    final_state = await app.ainvoke(inputs)
-    
-    agent_response = final_state.get("final_output", "Sorry, I encountered an issue.")
-    
-    # Update the chat history
-    updated_history = request.chat_history + [
-        ChatMessage(role="user", content=request.current_query),
-        ChatMessage(role="assistant", content=agent_response),
+
+def _digest(value) -> str:
+    return hashlib.sha256(dumps(value)).hexdigest()
+
+def _cache_context(inputs: dict) -> dict:
+    """
+    Everything besides the query that changes the reply: profile adaptations,
+    formatter mode, the chat history the nodes window from and the profile
+    the tools receive as user_info. A follow-up ("make it shorter") or
+    another student's request never gets a reply cached for a different
+    conversation or student.
+    """
+    return dict(
+        profile_adaptations(inputs["user_profile"]),
+        formatter_mode=inputs["formatter_mode"],
+        history_digest=_digest(inputs["chat_history"]),
+        user_info_digest=_digest(inputs["user_profile"]),
+    )
+
+def _graph_key(inputs: dict) -> str:
+    """
+    Identifies a graph run by its whole input: the exact query, chat history,
+    profile and formatter mode, plus the adaptations the rules derive from
+    the profile. Runs with equal keys produce the same reply.
+    """
+    return _digest([inputs, profile_adaptations(inputs["user_profile"])])
+
+def _turn(request: OrchestratorRequest, agent_response: str) -> List[ChatTurn]:
+    return [
+        {"role": "user", "content": request.current_query},
+        {"role": "assistant", "content": agent_response},
     ]
-    
-    return OrchestratorResponse(
-        agent_response=agent_response,
-        updated_chat_history=updated_history
+
+async def _record_turn(request: OrchestratorRequest, agent_response: str) -> None:
+    """Appends the turn to the request's session, if any, in a worker thread."""
+    if request.session_id is not None:
+        await asyncio.to_thread(get_session_store().append, request.session_id, _turn(request, agent_response))
+
+def _updated_history(request: OrchestratorRequest, agent_response: str) -> List[ChatTurn]:
+    turn = _turn(request, agent_response)
+    if request.session_id is not None or request.history_mode == "delta":
+        return turn
+    return request.chat_history + turn
+
+def _response_body(request: OrchestratorRequest, agent_response: str) -> dict:
+    """
+    An OrchestratorResponse as plain data, so it is serialized without being
+    validated again. Session requests get the new turn only, which
+    _record_turn stores.
+    """
+    return {
+        "agent_response": agent_response,
+        "updated_chat_history": _updated_history(request, agent_response),
+    }
+
+def _fallback_reason(error: Exception) -> str:
+    return "deadline" if isinstance(error, DeadlineExceeded) else "circuit_open"
+
+def _priority(request: OrchestratorRequest, header: Optional[str], default: str = "interactive") -> str:
+    if request.priority is not None:
+        return request.priority
+    if header is None:
+        return default
+    if header.lower() not in PRIORITIES:
+        raise HTTPException(status_code=422, detail=f"X-Priority must be one of {', '.join(PRIORITIES)}.")
+    return header.lower()
+
+def _admission_class(inputs: dict, priority: str) -> str:
+    """
+    Greetings and other queries the pre-router is sure need only a clarify
+    reply take the "short" class, so they do not queue behind tool chains.
+    """
+    settings = get_settings()
+    if settings.prerouter_enabled:
+        guess = get_prerouter().route(inputs["current_query"])
+        if guess.tool_name == "clarify" and guess.confidence >= settings.prerouter_threshold:
+            return "short"
+    return priority
+
+async def _run_graph(inputs: dict, priority: str = "interactive") -> str:
+    """
+    The agent's reply for `inputs`, from the response cache or a graph run.
+    Cache hits and requests that join an identical run in flight skip the
+    admission queue; only graph runs take a slot.
+    """
+    # A repeated question in the same conversation state (retries, reloads,
+    # a student asking again) is served from the response cache without
+    # touching Gemini or the tools.
+    cache = get_response_cache()
+    cache_context = _cache_context(inputs)
+    agent_response = cache.get(inputs["current_query"], cache_context) if cache else None
+
+    if agent_response is None:
+        # Identical requests in flight at the same moment (retries, double
+        # submits, reconnecting clients) share one graph run. The key covers
+        # the whole graph input, so different conversations or students never
+        # share a reply.
+        agent_response = await flights.get("graph").do(
+            _graph_key(inputs),
+            lambda: _admitted_graph_run(inputs, _admission_class(inputs, priority), cache, cache_context),
+        )
+    return agent_response
+
+async def _admitted_graph_run(
+    inputs: dict, admission_class: str, cache: Optional[ResponseCache], cache_context: dict
+) -> str:
+    async with admitted(inputs["user_profile"]["user_id"], admission_class):
+        return await _invoke_graph(inputs, cache, cache_context)
+
+async def _invoke_graph(inputs: dict, cache: Optional[ResponseCache], cache_context: dict) -> str:
+    # Run the graph within the request deadline. A tool that is down or
+    # too slow yields the fallback message (never cached) rather than a
+    # worker stuck until the timeout.
+    try:
+        with deadline_scope(get_settings().request_deadline):
+            final_state = await app.ainvoke(inputs, config=GRAPH_CONFIG)
+    except (DeadlineExceeded, CircuitOpen) as e:
+        logger.warning("Answering with the fallback message: %s", e)
+        REQUEST_FALLBACKS.labels(reason=_fallback_reason(e)).inc()
+        return FALLBACK_MESSAGE
+
+    agent_response = final_state.get("final_output")
+    if agent_response and cache:
+        cache.set(inputs["current_query"], cache_context, agent_response)
+    return agent_response or "Sorry, I encountered an issue."
+
+@api.post("/orchestrate", response_model=OrchestratorResponse)
+async def orchestrate(request: OrchestratorRequest, x_priority: Optional[str] = Header(None)):
+    """
+    Receives a user query and conversation history, runs it through the agent,
+    and returns the agent's response.
+    """
+    priority = _priority(request, x_priority)
+    inputs = _graph_inputs(request, await _resolve_session(request))
+    agent_response = await _run_graph(inputs, priority)
+    await _record_turn(request, agent_response)
+
+    return FastJSONResponse(_response_body(request, agent_response))
+
+@api.post("/orchestrate/stream")
+async def orchestrate_stream(request: OrchestratorRequest, x_priority: Optional[str] = Header(None)):
+    """
+    Same contract as /orchestrate, answered as server-sent events:
+    node_start / node_end while the graph runs, token events as the reply
+    is generated, then a "final" event with the OrchestratorResponse body.
+    """
+    priority = _priority(request, x_priority)
+    inputs = _graph_inputs(request, await _resolve_session(request))
+    cache = get_response_cache()
+    cache_context = _cache_context(inputs)
+
+    async def events():
+        start = time.perf_counter()
+        first_token = True
+        agent_response = cache.get(request.current_query, cache_context) if cache else None
+
+        if agent_response is not None:
+            time_to_first_token.add(time.perf_counter() - start)
+            yield sse("token", {"node": "cache", "text": agent_response})
+        else:
+            try:
+                async with admitted(inputs["user_profile"]["user_id"], _admission_class(inputs, priority)):
+                    with deadline_scope(get_settings().request_deadline):
+                        async for event, data in graph_events(app, inputs, config=GRAPH_CONFIG):
+                            if event == "result":
+                                agent_response = data["final_output"]
+                                continue
+                            if event == "token" and first_token:
+                                first_token = False
+                                time_to_first_token.add(time.perf_counter() - start)
+                            yield sse(event, data)
+            except (DeadlineExceeded, CircuitOpen) as e:
+                logger.warning("Answering with the fallback message: %s", e)
+                REQUEST_FALLBACKS.labels(reason=_fallback_reason(e)).inc()
+                agent_response = FALLBACK_MESSAGE
+                yield sse("token", {"node": "fallback", "text": agent_response})
+            except UpstreamOverloaded as e:
+                yield sse("error", {"detail": str(e), "upstream": e.upstream, "retry_after": e.retry_after})
+                return
+            except Exception as e:
+                logger.exception("Error while streaming the graph: %s", e)
+                yield sse("error", {"detail": str(e)})
+                return
+            if agent_response and agent_response != FALLBACK_MESSAGE and cache:
+                cache.set(request.current_query, cache_context, agent_response)
+            agent_response = agent_response or "Sorry, I encountered an issue."
+
+        await _record_turn(request, agent_response)
+        yield sse("final", _response_body(request, agent_response))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.post("/orchestrate/batch", response_model=BatchResponse)
+async def orchestrate_batch(batch: BatchRequest, x_priority: Optional[str] = Header(None)):
+    """
+    Runs every item through the graph concurrently, at most BATCH_CONCURRENCY
+    at a time. Items with the same query, chat history and profile share
+    one graph run. A failing item is reported in its result and does not fail
+    the batch. With stream=true, results arrive as "item" events in
+    completion order, followed by a "done" event. Items are admitted as
+    "batch" priority unless they or the X-Priority header say otherwise.
+    """
+    settings = get_settings()
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch holds at most {settings.batch_max_items} items, got {len(batch.items)}.",
+        )
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    runs: Dict[str, asyncio.Task] = {}
+
+    async def limited_run(inputs: dict, priority: str) -> str:
+        async with semaphore:
+            return await _run_graph(inputs, priority)
+
+    async def run_item(index: int, item: OrchestratorRequest) -> dict:
+        try:
+            priority = _priority(item, x_priority, default="batch")
+            inputs = _graph_inputs(item, await _resolve_session(item))
+            key = _graph_key(inputs)
+            if key not in runs:
+                runs[key] = asyncio.ensure_future(limited_run(inputs, priority))
+            agent_response = await runs[key]
+            await _record_turn(item, agent_response)
+            return {"index": index, "response": _response_body(item, agent_response), "error": None}
+        except HTTPException as e:
+            return {"index": index, "response": None, "error": str(e.detail)}
+        except Exception as e:
+            logger.exception("Batch item %d failed: %s", index, e)
+            return {"index": index, "response": None, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(run_item(i, item)) for i, item in enumerate(batch.items)]
+
+    def cancel_pending():
+        for task in [*tasks, *runs.values()]:
+            task.cancel()
+
+    if not batch.stream:
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            cancel_pending()
+        return FastJSONResponse({"results": results, "unique_runs": len(runs)})
+
+    async def events():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield sse("item", await finished)
+            yield sse("done", {"items": len(tasks), "unique_runs": len(runs)})
+        finally:
+            # The client went away mid-batch: stop the remaining graph runs.
+            cancel_pending()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
+def collect_stats() -> dict:
+    """Counters from the in-process optimizations, for /stats and the Prometheus collector."""
+    cache = get_response_cache()
+    node_cache = get_node_cache()
+    sessions = get_session_store()
+    scheduler = get_admission_scheduler()
+    return {
+        "prerouter": get_prerouter().stats.snapshot(),
+        "adaptation": get_adaptation_engine().stats(),
+        "llm_registry": registry.stats(),
+        "response_cache": cache.stats() if cache else None,
+        "node_cache": node_cache.stats() if node_cache else None,
+        "stream_time_to_first_token": time_to_first_token.summary(),
+        "formatter": formatter_stats.snapshot(),
+        "tool_responses": tool_response_stats.snapshot(),
+        "sessions": sessions.stats() if sessions else None,
+        "limiters": limiters.stats(),
+        "circuit_breakers": breakers.stats(),
+        "coalescing": flights.stats(),
+        "admission": scheduler.stats() if scheduler else None,
+        "speculation": speculator.stats.snapshot(),
+        "startup": readiness.report(),
+        "slow_requests": slow_requests.snapshot(),
+    }
+
+register_stats_collector(collect_stats)
+
+@api.get("/stats")
+async def stats():
+    """Counters from the in-process optimizations, for dashboards and tuning."""
+    return collect_stats()
+
+@api.get("/health")
+async def health():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+@api.get("/ready")
+async def ready():
+    """Readiness: 503 until startup warm-up has finished, with per-phase timings."""
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.report())
+
+@api.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (see monitoring/prometheus-config.yml)."""
+    return Response(latest_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(api, host="0.0.0.0", port=8000)
\ No newline at end of file
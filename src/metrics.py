@@ -0,0 +1,368 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Set by src.serve before the workers start: every worker then writes its
+# metric values to files in this directory and /metrics, whichever worker
+# answers the scrape, reports their sum.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Names and labels of the first three families match monitoring/dashboard.json.
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency.",
+    ["method", "handler"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by status code.",
+    ["method", "handler", "status"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served.",
+    multiprocess_mode="livesum",
+)
+# With several workers this is the sum of each worker's count, so a user
+# whose requests reached two workers in the window is counted twice.
+ACTIVE_USERS = Gauge(
+    "active_users",
+    "Distinct user_ids seen in the last ACTIVE_USER_WINDOW seconds.",
+    multiprocess_mode="livesum",
+)
+
+GRAPH_NODE_DURATION = Histogram(
+    "graph_node_duration_seconds",
+    "Duration of each LangGraph node.",
+    ["node"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+TOOL_REQUEST_DURATION = Histogram(
+    "tool_request_duration_seconds",
+    "Latency of tool HTTP calls made by execute_tool.",
+    ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+TOOL_REQUESTS = Counter(
+    "tool_requests_total",
+    "Tool HTTP calls by status code ('error' for transport failures).",
+    ["tool", "status"],
+)
+TOOL_RETRIES = Counter(
+    "tool_retries_total",
+    "Tool calls retried after a timeout, connection error or 429/5xx.",
+    ["tool"],
+)
+TOOL_HEDGES = Counter(
+    "tool_hedged_requests_total",
+    "Duplicate tool calls sent because the first was slower than the tool's p95.",
+    ["tool"],
+)
+REQUEST_FALLBACKS = Counter(
+    "request_fallbacks_total",
+    "Requests answered with the fallback message instead of a graph result.",
+    ["reason"],
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "admission_queue_seconds",
+    "Time requests waited in the admission queue for a graph execution slot.",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Requests shed by the admission queue ('queue_full', 'displaced' or 'timeout').",
+    ["priority", "reason"],
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Chat model calls per graph node.",
+    ["node", "model"],
+)
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "Chat model call latency per graph node.",
+    ["node"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the chat model, per graph node and direction.",
+    ["node", "type"],
+)
+
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Estimated prompt size per graph node, after chat-history windowing.",
+    ["node"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+ACTIVE_USER_WINDOW = 300.0
+
+
+class _ActiveUsers:
+    def __init__(self, window: float = ACTIVE_USER_WINDOW):
+        self.window = window
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def seen(self, user_id: str) -> None:
+        with self._lock:
+            self._last_seen[user_id] = time.monotonic()
+            if MULTIPROCESS:
+                # Function gauges are not shared between processes; the
+                # value expires stale users when /metrics next asks.
+                ACTIVE_USERS.set(len(self._last_seen))
+
+    def count(self) -> int:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            for user_id in [u for u, t in self._last_seen.items() if t < cutoff]:
+                del self._last_seen[user_id]
+            return len(self._last_seen)
+
+
+active_users = _ActiveUsers()
+if not MULTIPROCESS:
+    ACTIVE_USERS.set_function(active_users.count)
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node (sync or async) to record graph_node_duration_seconds."""
+    histogram = GRAPH_NODE_DURATION.labels(node=name)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(state, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(state, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return async_node
+
+    @functools.wraps(fn)
+    def sync_node(state, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(state, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return sync_node
+
+
+def observe_prompt_tokens(node: str, tokens: int) -> None:
+    LLM_PROMPT_TOKENS.labels(node=node).observe(tokens)
+
+
+def observe_tool_call(tool: str, status: str, seconds: float) -> None:
+    TOOL_REQUEST_DURATION.labels(tool=tool).observe(seconds)
+    TOOL_REQUESTS.labels(tool=tool, status=status).inc()
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Counts chat model calls, their latency and token usage per graph node.
+    Pass it in the graph's run config; LangChain propagates it to every
+    model call made inside a node, with the node name in the run metadata.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node", "unknown")
+        model = metadata.get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model", "unknown")
+        LLM_CALLS.labels(node=node, model=model).inc()
+        self._runs[run_id] = (node, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        node, start = self._runs.pop(run_id, ("unknown", None))
+        if start is not None:
+            LLM_CALL_DURATION.labels(node=node).observe(time.perf_counter() - start)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.labels(node=node, type="input").inc(usage.get("input_tokens", 0))
+                    LLM_TOKENS.labels(node=node, type="output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._runs.pop(run_id, None)
+
+
+llm_metrics_callback = LLMMetricsCallback()
+
+
+class StatsCollector:
+    """
+    Exports the in-process counters that /stats reports (cache hit rates,
+    pre-router fast path, upstream limiters) as Prometheus metrics at
+    scrape time. With several workers they are per worker, like /stats, and
+    carry a `worker` label (the pid) so each series stays one worker's.
+    """
+
+    def __init__(self, stats: Callable[[], dict], worker: Optional[str] = None):
+        self._stats = stats
+        self._worker = worker
+
+    def collect(self):
+        for family in self._collect():
+            if self._worker is not None:
+                family.samples = [
+                    sample._replace(labels=dict(sample.labels, worker=self._worker)) for sample in family.samples
+                ]
+            yield family
+
+    def _collect(self):
+        stats = self._stats()
+
+        cache_hits = CounterMetricFamily("cache_hits", "Cache hits.", labels=["cache"])
+        cache_misses = CounterMetricFamily("cache_misses", "Cache misses.", labels=["cache"])
+        cache_hit_ratio = GaugeMetricFamily("cache_hit_ratio", "Cache hit ratio since start.", labels=["cache"])
+        response_cache = stats.get("response_cache")
+        if response_cache:
+            cache_hits.add_metric(["response"], response_cache["hits"])
+            cache_misses.add_metric(["response"], response_cache["misses"])
+            cache_hit_ratio.add_metric(["response"], response_cache["hit_rate"])
+        for node, node_stats in (stats.get("node_cache") or {}).items():
+            cache_hits.add_metric([f"node:{node}"], node_stats["hits"])
+            cache_misses.add_metric([f"node:{node}"], node_stats["misses"])
+            cache_hit_ratio.add_metric([f"node:{node}"], node_stats["hit_rate"])
+        yield cache_hits
+        yield cache_misses
+        yield cache_hit_ratio
+
+        prerouter = stats.get("prerouter") or {}
+        routed = CounterMetricFamily("prerouter_decisions", "Routing decisions by path.", labels=["path"])
+        routed.add_metric(["fast_path"], prerouter.get("fast_path", 0))
+        routed.add_metric(["llm"], prerouter.get("llm_fallbacks", 0))
+        yield routed
+        yield GaugeMetricFamily(
+            "prerouter_llm_agreement_ratio",
+            "Share of compared decisions where the pre-router agreed with the LLM router.",
+            value=prerouter.get("agreement_rate", 0.0),
+        )
+
+        limit = GaugeMetricFamily("upstream_concurrency_limit", "Current adaptive concurrency limit.", labels=["upstream"])
+        in_flight = GaugeMetricFamily("upstream_in_flight", "Calls currently holding a limiter slot.", labels=["upstream"])
+        rejected = CounterMetricFamily("upstream_rejected", "Calls shed because the limit was reached.", labels=["upstream"])
+        overloads = CounterMetricFamily(
+            "upstream_overloads", "Overload signals (timeout, 429/5xx, slow call) that shrank the limit.", labels=["upstream"]
+        )
+        for upstream, limiter in (stats.get("limiters") or {}).items():
+            limit.add_metric([upstream], limiter["limit"])
+            in_flight.add_metric([upstream], limiter["in_flight"])
+            rejected.add_metric([upstream], limiter["rejected"])
+            overloads.add_metric([upstream], limiter["overloads"])
+        yield limit
+        yield in_flight
+        yield rejected
+        yield overloads
+
+        breaker_open = GaugeMetricFamily(
+            "circuit_breaker_open", "1 while the upstream's circuit breaker is open or half-open.", labels=["upstream"]
+        )
+        breaker_rejected = CounterMetricFamily(
+            "circuit_breaker_rejected", "Calls failed fast by an open breaker.", labels=["upstream"]
+        )
+        for upstream, breaker in (stats.get("circuit_breakers") or {}).items():
+            breaker_open.add_metric([upstream], 0 if breaker["state"] == "closed" else 1)
+            breaker_rejected.add_metric([upstream], breaker["rejected"])
+        yield breaker_open
+        yield breaker_rejected
+
+        coalesced = CounterMetricFamily(
+            "coalesced_calls",
+            "Calls that waited on an identical in-flight call instead of making their own.",
+            labels=["call"],
+        )
+        for call, flight in (stats.get("coalescing") or {}).items():
+            coalesced.add_metric([call], flight["coalesced"])
+        yield coalesced
+
+        invalid = CounterMetricFamily(
+            "tool_responses_invalid", "Tool responses that did not match the tool's response model.", labels=["tool"]
+        )
+        raw_tokens = CounterMetricFamily(
+            "formatter_tool_response_raw_tokens",
+            "Estimated tokens of the raw tool response bodies the formatter handled, before validation.",
+            labels=["tool"],
+        )
+        prompt_tokens = CounterMetricFamily(
+            "formatter_tool_response_prompt_tokens",
+            "Estimated tokens of the compacted tool responses sent to the formatter LLM.",
+            labels=["tool"],
+        )
+        for tool, counts in (stats.get("tool_responses") or {}).items():
+            invalid.add_metric([tool], counts["invalid"])
+            raw_tokens.add_metric([tool], counts["raw_tokens"])
+            prompt_tokens.add_metric([tool], counts["prompt_tokens"])
+        yield invalid
+        yield raw_tokens
+        yield prompt_tokens
+
+        admission = stats.get("admission")
+        if admission:
+            yield GaugeMetricFamily("admission_running", "Graph runs holding an admission slot.", value=admission["running"])
+            depth = GaugeMetricFamily("admission_queue_depth", "Requests waiting for an admission slot.", labels=["priority"])
+            for priority, queued in admission["queued"].items():
+                depth.add_metric([priority], queued)
+            yield depth
+
+        speculation = stats.get("speculation") or {}
+        runs = CounterMetricFamily("speculation_runs", "Speculative extractor runs by outcome.", labels=["outcome"])
+        runs.add_metric(["committed"], speculation.get("committed", 0))
+        runs.add_metric(["wasted"], speculation.get("wasted", 0))
+        yield runs
+        yield CounterMetricFamily(
+            "speculation_saved_seconds",
+            "Extractor time that overlapped routing in committed speculative runs.",
+            value=speculation.get("saved_ms_total", 0.0) / 1000,
+        )
+
+
+_stats_collector: Optional[StatsCollector] = None
+
+
+def register_stats_collector(stats: Callable[[], dict]) -> None:
+    global _stats_collector
+    if MULTIPROCESS:
+        _stats_collector = StatsCollector(stats, worker=str(os.getpid()))
+    else:
+        REGISTRY.register(StatsCollector(stats))
+
+
+def latest_metrics() -> bytes:
+    """
+    The /metrics body. With several workers, the prometheus_client metrics
+    are summed over every worker's files (live gauges over live workers
+    only), then this worker's /stats counters are appended.
+    """
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    ACTIVE_USERS.set(active_users.count())
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if _stats_collector is not None:
+        registry.register(_stats_collector)
+    return generate_latest(registry)
+
+
+def worker_exited() -> None:
+    """Drops this worker's live gauges (in-flight requests, active users) from the shared files."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,137 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.cache import LRUCache
+from src.coalescing import flights
+from src.config import get_settings
+
+
+class MemoryBackend:
+    """In-process LRU; the default backend."""
+
+    def __init__(self, max_entries: int = 4096):
+        self._cache = LRUCache(max_entries=max_entries)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+
+class SQLiteBackend:
+    """
+    On-disk backend, so memoized results survive restarts and can be shared
+    by processes on the same host. Bounded to `max_entries` rows, evicting
+    the least recently used ones.
+    """
+
+    def __init__(self, path: str, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS node_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS node_cache_accessed ON node_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM node_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE node_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO node_cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM node_cache WHERE key IN ("
+                "SELECT key FROM node_cache ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NodeCache:
+    """
+    Memoizes the result of a graph node's LLM call, keyed on a content hash
+    of the node name and its prompt inputs. Values are stored as JSON, so
+    every hit hands back a fresh copy the node is free to mutate.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @staticmethod
+    def key(node: str, inputs: Any) -> str:
+        payload = json.dumps([node, inputs], sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_compute(self, node: str, inputs: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the memoized result, or awaits `compute()` and stores it unless it is None."""
+        key = self.key(node, inputs)
+        cached = self.backend.get(key)
+        with self._lock:
+            self._stats[node]["hits" if cached is not None else "misses"] += 1
+        if cached is not None:
+            return json.loads(cached)
+
+        result = await compute()
+        if result is not None:
+            self.backend.set(key, json.dumps(result))
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                node: dict(counts, hit_rate=counts["hits"] / (counts["hits"] + counts["misses"]))
+                for node, counts in self._stats.items()
+            }
+
+
+@lru_cache(maxsize=None)
+def get_node_cache() -> Optional[NodeCache]:
+    """Returns the process-wide node cache, or None when NODE_CACHE_BACKEND is 'none'."""
+    settings = get_settings()
+    if settings.node_cache_backend == "none":
+        return None
+    if settings.node_cache_backend == "sqlite":
+        return NodeCache(SQLiteBackend(settings.node_cache_path, settings.node_cache_max_entries))
+    if settings.node_cache_backend == "memory":
+        return NodeCache(MemoryBackend(settings.node_cache_max_entries))
+    raise ValueError(f"Unknown NODE_CACHE_BACKEND '{settings.node_cache_backend}'.")
+
+
+async def memoize_node(node: str, inputs: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Runs `compute` through the node cache when one is configured. Identical
+    calls in flight at the same time share one lookup and computation, and
+    each gets its own copy of the result.
+    """
+    cache = get_node_cache()
+
+    async def lookup():
+        if cache is None:
+            return await compute()
+        return await cache.get_or_compute(node, inputs, compute)
+
+    return await flights.get(f"llm:{node}").do(NodeCache.key(node, inputs), lookup, copy=copy.deepcopy)
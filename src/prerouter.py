@@ -0,0 +1,169 @@
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from src.config import get_settings
+
+TOOL_NAMES = ("NoteMaker", "FlashcardGenerator", "ConceptExplainer", "clarify")
+
+DEFAULT_EXAMPLES_PATH = Path(__file__).parent / "data" / "router_examples.jsonl"
+
+# "What is/are/does ..." and "explain ..." only count as a concept question
+# when a topic follows: small talk ("what is up", "what is your name") and
+# follow-ups that need the conversation ("explain that again") do not match.
+_CONCEPT_QUESTION = (
+    r"^\s*(what is|what's|what are|what does|explain)\s+"
+    r"(?!(up|new|going on|happening|you|your|yours|my|me|i|this|that|it|the (time|date|weather))\b)[a-z0-9]"
+)
+
+# (pattern, tool, confidence). Rules only fire on unambiguous phrasing; when
+# rules for different tools match, the classifier decides instead.
+DEFAULT_RULES: Tuple[Tuple[str, str, float], ...] = (
+    (r"^\s*(hi|hello|hey|hey there|thanks|thank you|bye|good (morning|afternoon|evening))\W*$", "clarify", 0.99),
+    (r"\bflash\s?cards?\b|\bquiz me\b|\btest me\b|\bpractice (questions?|problems?|test)\b", "FlashcardGenerator", 0.95),
+    (r"\b(make|take|write|create|give me)\b.*\bnotes?\b|\bsummari[sz]e\b|\bstudy guide\b", "NoteMaker", 0.93),
+    (_CONCEPT_QUESTION + r"|\bi('m| am) confused about\b|\bi don'?t understand\b", "ConceptExplainer", 0.92),
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+@dataclass(frozen=True)
+class PreRouteResult:
+    tool_name: str
+    confidence: float
+    source: str  # "rule" or "classifier"
+
+
+def _features(text: str) -> List[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over word unigrams and bigrams."""
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self._log_priors: Dict[str, float] = {}
+        self._log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesRouter":
+        label_counts: Counter = Counter()
+        feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        vocabulary = set()
+        for query, label in examples:
+            label_counts[label] += 1
+            features = _features(query)
+            feature_counts[label].update(features)
+            vocabulary.update(features)
+
+        total = sum(label_counts.values())
+        for label, count in label_counts.items():
+            self._log_priors[label] = math.log(count / total)
+            denominator = sum(feature_counts[label].values()) + self.alpha * (len(vocabulary) + 1)
+            self._log_likelihoods[label] = {
+                feature: math.log((n + self.alpha) / denominator)
+                for feature, n in feature_counts[label].items()
+            }
+            self._log_unseen[label] = math.log(self.alpha / denominator)
+        return self
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        features = _features(query)
+        scores = {}
+        for label, log_prior in self._log_priors.items():
+            likelihoods = self._log_likelihoods[label]
+            unseen = self._log_unseen[label]
+            scores[label] = log_prior + sum(likelihoods.get(f, unseen) for f in features)
+        best = max(scores, key=scores.get)
+        # Naive Bayes posteriors are badly overconfident on a small training
+        # set; tempering the log-scores by sqrt(feature count) keeps the
+        # confidence usable as a fast-path threshold.
+        scale = math.sqrt(max(1, len(features)))
+        norm = sum(math.exp((score - scores[best]) / scale) for score in scores.values())
+        return best, 1.0 / norm
+
+
+class PreRouterStats:
+    """Counters for fast-path hit rate and agreement with the LLM router."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fast_path = 0
+        self.llm_fallbacks = 0
+        self.compared = 0
+        self.agreed = 0
+
+    def record(self, fast_path: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            if fast_path:
+                self.fast_path += 1
+            else:
+                self.llm_fallbacks += 1
+
+    def record_comparison(self, guess: str, llm_decision: str) -> None:
+        with self._lock:
+            self.compared += 1
+            if guess == llm_decision:
+                self.agreed += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "fast_path": self.fast_path,
+                "llm_fallbacks": self.llm_fallbacks,
+                "hit_rate": self.fast_path / self.requests if self.requests else 0.0,
+                "compared_with_llm": self.compared,
+                "agreement_rate": self.agreed / self.compared if self.compared else 0.0,
+            }
+
+
+class PreRouter:
+    """
+    Deterministic router that runs before the Gemini router. Regex rules catch
+    unambiguous phrasing; everything else goes through the classifier.
+    """
+
+    def __init__(self, classifier: NaiveBayesRouter, rules=DEFAULT_RULES):
+        self.classifier = classifier
+        self.rules = [(re.compile(pattern, re.IGNORECASE), tool, confidence) for pattern, tool, confidence in rules]
+        self.stats = PreRouterStats()
+
+    def route(self, query: str) -> PreRouteResult:
+        matches = {(tool, confidence) for pattern, tool, confidence in self.rules if pattern.search(query)}
+        if len({tool for tool, _ in matches}) == 1:
+            tool, confidence = max(matches, key=lambda match: match[1])
+            return PreRouteResult(tool, confidence, "rule")
+        tool, confidence = self.classifier.predict(query)
+        return PreRouteResult(tool, confidence, "classifier")
+
+
+def load_examples(path: Path) -> List[Tuple[str, str]]:
+    """Reads the labeled query file (JSON lines with 'query' and 'label')."""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record["label"] not in TOOL_NAMES:
+                    raise ValueError(f"Unknown router label '{record['label']}' in {path}.")
+                examples.append((record["query"], record["label"]))
+    return examples
+
+
+@lru_cache(maxsize=None)
+def get_prerouter() -> PreRouter:
+    """Returns the process-wide pre-router, trained once from the labeled query file."""
+    path = get_settings().prerouter_examples_path or DEFAULT_EXAMPLES_PATH
+    return PreRouter(NaiveBayesRouter().fit(load_examples(Path(path))))
@@ -0,0 +1,261 @@
+import asyncio
+import contextvars
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from src.config import get_settings
+from src.latency import LatencyWindow
+
+T = TypeVar("T")
+
+# Sent instead of an answer when the request ran out of time or its tool is down.
+FALLBACK_MESSAGE = (
+    "Sorry, I can't complete that right now because one of my learning tools is slow or unavailable. "
+    "Please try again in a moment."
+)
+
+
+class DeadlineExceeded(Exception):
+    """The request's end-to-end deadline passed before the work finished."""
+
+
+class CircuitOpen(Exception):
+    """The upstream's circuit breaker is open; the call was not attempted."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"Circuit breaker for '{upstream}' is open.")
+        self.upstream = upstream
+
+
+# Absolute time.monotonic() by which the current request must be answered.
+# Context variables are inherited by the tasks LangGraph runs nodes in, so
+# every node sees the budget left by the nodes before it.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Sets the deadline for the enclosed work; None or 0 means no deadline."""
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(what: str) -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {what}.")
+
+
+async def within_deadline(awaitable: Awaitable[T], what: str) -> T:
+    """Awaits `awaitable`, cancelling it and raising DeadlineExceeded when the deadline passes."""
+    check_deadline(what)
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded during {what}.") from None
+
+
+def guard_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node so it is not started once the request deadline has passed."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(state, **kwargs):
+            check_deadline(name)
+            return await fn(state, **kwargs)
+        return async_node
+
+    @functools.wraps(fn)
+    def sync_node(state, **kwargs):
+        check_deadline(name)
+        return fn(state, **kwargs)
+    return sync_node
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through, consecutive failures are counted. After
+    `failure_threshold` of them the breaker opens and calls fail at once with
+    CircuitOpen. After `reset_timeout` seconds one trial call is let through
+    (half-open); its success closes the breaker, its failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return
+            if self.state != self.CLOSED:
+                self.rejected += 1
+                raise CircuitOpen(self.name)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], is_failure: Callable[[BaseException], bool]) -> T:
+        """Runs `fn` through the breaker; exceptions for which `is_failure` holds count against it."""
+        self.allow()
+        try:
+            result = await fn()
+        except BaseException as e:
+            if is_failure(e):
+                self.record_failure()
+            elif self.state == self.HALF_OPEN:
+                # Cancelled or a caller error: let the next call be the trial.
+                with self._lock:
+                    self.state, self.opened_at = self.OPEN, self._clock() - self.reset_timeout
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per upstream name, created on first use."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(upstream)
+            if breaker is None:
+                settings = get_settings()
+                breaker = self._breakers[upstream] = CircuitBreaker(
+                    upstream,
+                    failure_threshold=settings.breaker_failure_threshold,
+                    reset_timeout=settings.breaker_reset_timeout,
+                )
+            return breaker
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+breakers = BreakerRegistry()
+
+
+async def retry(
+    fn: Callable[[], Awaitable[T]],
+    retryable: Callable[[BaseException], bool],
+    attempts: int = 3,
+    base_delay: float = 0.1,
+    max_delay: float = 1.0,
+    on_retry: Optional[Callable[[BaseException], None]] = None,
+) -> T:
+    """
+    Calls `fn` up to `attempts` times, sleeping a "full jitter" backoff
+    (uniform in [0, min(max_delay, base_delay * 2**n)]) between attempts.
+    Gives up early when the backoff would outlast the request deadline.
+    """
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            left = remaining()
+            if left is not None and delay >= left:
+                raise
+            if on_retry is not None:
+                on_retry(e)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def hedge_delay(window: LatencyWindow, quantile: float = 0.95, min_samples: int = 20) -> Optional[float]:
+    """The latency past which a duplicate request is worth sending, once enough samples exist."""
+    if window.count < min_samples:
+        return None
+    return window.percentile(quantile)
+
+
+async def hedge(
+    fn: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    Starts `fn`; if it has not finished after `delay` seconds, starts a
+    second copy and returns whichever completes first, cancelling the other.
+    A failure of one copy is only raised if the other fails too.
+    """
+    if delay is None:
+        return await fn()
+
+    # Whatever happens to the caller (a deadline, a client disconnect), no
+    # copy of the call outlives it.
+    pending = {asyncio.ensure_future(fn())}
+    error: Optional[BaseException] = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return done.pop().result()
+
+        if on_hedge is not None:
+            on_hedge()
+        pending.add(asyncio.ensure_future(fn()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
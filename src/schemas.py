@@ -1,6 +1,7 @@
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
+from typing_extensions import TypedDict
 
 
 class UserInfo(BaseModel):
@@ -17,9 +18,22 @@ class ChatMessage(BaseModel):
     content: str
 
 
-class NoteMakerInput(BaseModel):
-    user_info: UserInfo
-    chat_history: List[ChatMessage]
+class ChatTurn(TypedDict):
+    """
+    A chat message as plain data, the form it takes in graph state, sessions
+    and tool payloads. API requests validate chat history straight into
+    these, so it is never rebuilt as ChatMessage models and dumped back.
+    """
+
+    role: Literal["user", "assistant"]
+    content: str
+
+
+# The *Params models hold what the LLM extracts from the conversation; the
+# *Input models add the context the orchestrator attaches before calling the tool.
+
+
+class NoteMakerParams(BaseModel):
     topic: str
     subject: str
     note_taking_style: Literal["outline", "bullet_points", "narrative", "structured"]
@@ -27,8 +41,12 @@ class NoteMakerInput(BaseModel):
     include_analogies: bool = False
 
 
-class FlashcardGeneratorInput(BaseModel):
+class NoteMakerInput(NoteMakerParams):
     user_info: UserInfo
+    chat_history: List[ChatMessage]
+
+
+class FlashcardGeneratorParams(BaseModel):
     topic: str
     count: int = Field(..., ge=1, le=20)
     difficulty: Literal["easy", "medium", "hard"]
@@ -36,9 +54,64 @@ class FlashcardGeneratorInput(BaseModel):
     include_examples: bool = True
 
 
-class ConceptExplainerInput(BaseModel):
+class FlashcardGeneratorInput(FlashcardGeneratorParams):
     user_info: UserInfo
-    chat_history: List[ChatMessage]
+
+
+class ConceptExplainerParams(BaseModel):
     concept_to_explain: str
     current_topic: str
     desired_depth: Literal["basic", "intermediate", "advanced", "comprehensive"]
+
+
+class ConceptExplainerInput(ConceptExplainerParams):
+    user_info: UserInfo
+    chat_history: List[ChatMessage]
+
+
+# Tool responses, as the tools return them (see mock_tools). Only the fields
+# the formatter uses are kept; anything else in a payload is dropped.
+
+
+class NoteSection(BaseModel):
+    title: str = ""
+    content: str = ""
+    key_points: List[str] = Field(default_factory=list)
+    examples: List[str] = Field(default_factory=list)
+    analogies: List[str] = Field(default_factory=list)
+
+
+class NoteMakerResponse(BaseModel):
+    topic: Optional[str] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    note_sections: List[NoteSection]
+    key_concepts: List[str] = Field(default_factory=list)
+    connections_to_prior_learning: List[str] = Field(default_factory=list)
+    visual_elements: List[str] = Field(default_factory=list)
+    practice_suggestions: List[str] = Field(default_factory=list)
+    source_references: List[str] = Field(default_factory=list)
+    note_taking_style: Optional[str] = None
+
+
+class Flashcard(BaseModel):
+    title: Optional[str] = None
+    question: str
+    answer: str
+    example: Optional[str] = None
+
+
+class FlashcardGeneratorResponse(BaseModel):
+    flashcards: List[Flashcard]
+    topic: Optional[str] = None
+    adaptation_details: Optional[str] = None
+    difficulty: Optional[str] = None
+
+
+class ConceptExplainerResponse(BaseModel):
+    explanation: str
+    examples: List[str] = Field(default_factory=list)
+    related_concepts: List[str] = Field(default_factory=list)
+    visual_aids: List[str] = Field(default_factory=list)
+    practice_questions: List[str] = Field(default_factory=list)
+    source_references: List[str] = Field(default_factory=list)
@@ -0,0 +1,101 @@
+"""
+Multi-worker entry point, used by the Docker image:
+
+    WEB_CONCURRENCY=4 python -m src.serve
+
+Runs WEB_CONCURRENCY uvicorn worker processes on one listening socket,
+each with its own event loop, models and tool connection pool, so a pod
+uses as many cores as it has workers. uvicorn's supervisor restarts a
+worker that dies or stops answering its health check, and SIGHUP replaces
+the workers one at a time, each replacement serving before its
+predecessor drains. SERVER_MAX_REQUESTS recycles workers the same way.
+
+With more than one worker, the response cache, node cache and sessions
+default to their SQLite backends so every worker reads and fills the same
+stores; an explicit *_BACKEND setting still wins. Prometheus metrics run in
+prometheus_client's multiprocess mode, so whichever worker answers a
+scrape reports the sum over all workers. Rate limiters, circuit breakers
+and /stats (and its counters on /metrics) stay per worker.
+"""
+import inspect
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import uvicorn
+
+from src.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Settings whose per-process defaults would split state between workers.
+SHARED_BACKENDS = {
+    "RESPONSE_CACHE_BACKEND": "sqlite",
+    "NODE_CACHE_BACKEND": "sqlite",
+    "SESSION_BACKEND": "sqlite",
+}
+
+
+def share_state_between_workers() -> None:
+    """Workers are spawned and read their settings from the environment, so defaults go there."""
+    for name, backend in SHARED_BACKENDS.items():
+        os.environ.setdefault(name, backend)
+        if os.environ[name].lower() == "memory":
+            logger.warning("%s=memory: each worker keeps its own copy.", name)
+
+
+def share_metrics_between_workers() -> Optional[str]:
+    """
+    Gives the workers one PROMETHEUS_MULTIPROC_DIR. It has to be in the
+    environment before a worker imports prometheus_client, and must not hold
+    files from an earlier run. Returns the directory when it is a temporary
+    one created here, for removal on exit.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+        return path
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return None
+
+
+def uvicorn_options(settings: Settings) -> dict:
+    options = {
+        "host": settings.server_host,
+        "port": settings.server_port,
+        "workers": settings.server_workers,
+        "timeout_graceful_shutdown": settings.server_graceful_timeout,
+    }
+    # A single worker has no supervisor to replace it, so it is never recycled.
+    if settings.server_workers > 1 and settings.server_max_requests:
+        options["limit_max_requests"] = settings.server_max_requests
+        if settings.server_max_requests_jitter:
+            if "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+                options["limit_max_requests_jitter"] = settings.server_max_requests_jitter
+            else:
+                logger.warning("This uvicorn has no max-requests jitter; workers recycle after exactly %d requests.",
+                               settings.server_max_requests)
+    return options
+
+
+def main() -> None:
+    settings = get_settings()
+    logging.basicConfig(level=settings.log_level)
+    metrics_dir = None
+    if settings.server_workers > 1:
+        share_state_between_workers()
+        metrics_dir = share_metrics_between_workers()
+    try:
+        uvicorn.run("src.main:api", **uvicorn_options(settings))
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from src.cache import LRUCache
+from src.config import get_settings
+
+
+@dataclass
+class Session:
+    """A conversation kept server-side: the profile and the plain-dict chat history."""
+
+    session_id: str
+    user_profile: dict
+    chat_history: List[dict] = field(default_factory=list)
+
+
+class MemorySessionStore:
+    """
+    Per-process LRU of sessions. Every write refreshes the entry, so `ttl`
+    expires sessions that have been idle that long.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = 3600.0, clock: Callable[[], float] = time.monotonic):
+        # Sizes are not tracked: the entry count bounds the store, and
+        # measuring long histories on every append would cost O(length).
+        self._sessions = LRUCache(max_entries=max_entries, ttl=ttl, sizeof=lambda session: 0, clock=clock)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            return Session(session.session_id, dict(session.user_profile), list(session.chat_history))
+
+    def save(self, session_id: str, user_profile: dict, chat_history: Optional[List[dict]] = None) -> None:
+        """Creates the session, or replaces its profile (and history, when given)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, user_profile, list(chat_history or []))
+            else:
+                session.user_profile = user_profile
+                if chat_history is not None:
+                    session.chat_history = list(chat_history)
+            self._sessions.set(session_id, session)
+
+    def append(self, session_id: str, messages: List[dict]) -> bool:
+        """Appends messages to an existing session; False if it has expired."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            session.chat_history.extend(messages)
+            self._sessions.set(session_id, session)
+            return True
+
+    def stats(self) -> dict:
+        stats = self._sessions.stats()
+        stats.pop("size_bytes", None)
+        return stats
+
+
+class SQLiteSessionStore:
+    """
+    File-backed store, standing in for a shared one: every process on the
+    host sees the same sessions. Messages live in their own table so a turn
+    is an INSERT, not a rewrite of the whole transcript. Bounded to
+    `max_entries` sessions, evicting the least recently used ones.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = 3600.0, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, user_profile TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS session_messages_session ON session_messages (session_id, id)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_profile, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                if row is not None:
+                    self._delete(session_id)
+                self.misses += 1
+                return None
+            self.hits += 1
+            messages = self._conn.execute(
+                "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return Session(session_id, json.loads(row[0]), [{"role": role, "content": content} for role, content in messages])
+
+    def save(self, session_id: str, user_profile: dict, chat_history: Optional[List[dict]] = None) -> None:
+        """Creates the session, or replaces its profile (and history, when given)."""
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, user_profile, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(user_profile), self._clock()),
+            )
+            if chat_history is not None:
+                self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+                self._insert_messages(session_id, chat_history)
+            self._evict()
+
+    def append(self, session_id: str, messages: List[dict]) -> bool:
+        """Appends messages to an existing session; False if it has expired."""
+        with self._lock, self._transaction():
+            row = self._conn.execute("SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None or self._expired(row[0]):
+                return False
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (self._clock(), session_id))
+            self._insert_messages(session_id, messages)
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        BEGIN ... COMMIT, rolled back when anything in between (or the
+        COMMIT itself, e.g. "database is locked") fails, so the shared
+        connection is never left inside an open transaction.
+        """
+        self._conn.execute("BEGIN")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+
+    def _expired(self, updated_at: float) -> bool:
+        return self.ttl is not None and updated_at <= self._clock() - self.ttl
+
+    def _insert_messages(self, session_id: str, messages: List[dict]) -> None:
+        self._conn.executemany(
+            "INSERT INTO session_messages (session_id, role, content) VALUES (?, ?, ?)",
+            [(session_id, m["role"], m["content"]) for m in messages],
+        )
+
+    def _delete(self, session_id: str) -> None:
+        self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _evict(self) -> None:
+        """Drops expired sessions and those beyond max_entries, least recently used first."""
+        stale = [
+            row[0] for row in self._conn.execute(
+                "SELECT session_id FROM sessions WHERE updated_at <= ? "
+                "UNION SELECT session_id FROM ("
+                "SELECT session_id FROM sessions ORDER BY updated_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self._clock() - self.ttl if self.ttl is not None else float("-inf"), self.max_entries),
+            ).fetchall()
+        ]
+        for session_id in stale:
+            self._delete(session_id)
+
+
+@lru_cache(maxsize=None)
+def get_session_store():
+    """Returns the process-wide session store, or None when SESSION_BACKEND is 'none'."""
+    settings = get_settings()
+    if settings.session_backend == "none":
+        return None
+    if settings.session_backend == "sqlite":
+        return SQLiteSessionStore(settings.session_path, settings.session_max_entries, settings.session_ttl)
+    if settings.session_backend == "memory":
+        return MemorySessionStore(settings.session_max_entries, settings.session_ttl)
+    raise ValueError(f"Unknown SESSION_BACKEND '{settings.session_backend}'.")
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Dict, Optional
+
+# Speculations not claimed by then (the request failed or was cancelled
+# between routing and extraction) are dropped.
+STALE_AFTER = 60.0
+
+
+@dataclass
+class _Speculation:
+    tool_name: str
+    task: asyncio.Task
+    started_at: float
+    confidence: float
+    finished_at: Optional[float] = None
+
+
+class SpeculationStats:
+    """
+    How speculation pays off: committed runs save the part of the extractor
+    call that overlapped routing; wasted runs cost an LLM call for nothing.
+    Both are also broken down by pre-router confidence, to tune the threshold.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.committed = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+        self._by_confidence: Dict[str, Dict[str, int]] = defaultdict(lambda: {"committed": 0, "wasted": 0})
+
+    def record(self, confidence: float, committed: bool, saved_seconds: float = 0.0) -> None:
+        bucket = f"{min(int(confidence * 10), 9) / 10:.1f}"
+        with self._lock:
+            if committed:
+                self.committed += 1
+                self.saved_seconds += saved_seconds
+            else:
+                self.wasted += 1
+            self._by_confidence[bucket]["committed" if committed else "wasted"] += 1
+
+    def record_start(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            decided = self.committed + self.wasted
+            return {
+                "started": self.started,
+                "committed": self.committed,
+                "wasted": self.wasted,
+                "commit_rate": self.committed / decided if decided else 0.0,
+                "saved_ms_total": round(self.saved_seconds * 1000, 3),
+                "saved_ms_per_commit": round(self.saved_seconds * 1000 / self.committed, 3) if self.committed else None,
+                "by_confidence": {bucket: dict(counts) for bucket, counts in sorted(self._by_confidence.items())},
+            }
+
+
+class Speculator:
+    """
+    Runs an extractor call for the pre-router's guess while the LLM router is
+    still deciding. route_query commits the run when the router agrees (the
+    extractor node then claims its result) and cancels it otherwise.
+    """
+
+    def __init__(self):
+        self._runs: Dict[str, _Speculation] = {}
+        self.stats = SpeculationStats()
+
+    def start(self, tool_name: str, confidence: float, work: Awaitable) -> str:
+        self._drop_stale()
+        task = asyncio.ensure_future(work)
+        run = _Speculation(tool_name, task, time.perf_counter(), confidence)
+
+        def done(t: asyncio.Task) -> None:
+            run.finished_at = time.perf_counter()
+            # Retrieve the exception of runs nobody ends up awaiting.
+            t.cancelled() or t.exception()
+
+        task.add_done_callback(done)
+        speculation_id = uuid.uuid4().hex
+        self._runs[speculation_id] = run
+        self.stats.record_start()
+        return speculation_id
+
+    def resolve(self, speculation_id: str, routed_tool: str) -> bool:
+        """
+        Called once the router has decided. Keeps the run for the extractor
+        and returns True if it speculated on `routed_tool`; cancels it otherwise.
+        """
+        run = self._runs.get(speculation_id)
+        if run is None:
+            return False
+        if run.tool_name == routed_tool:
+            # The part of the extractor call that overlapped routing.
+            overlap = (run.finished_at or time.perf_counter()) - run.started_at
+            self.stats.record(run.confidence, committed=True, saved_seconds=overlap)
+            return True
+        del self._runs[speculation_id]
+        run.task.cancel()
+        self.stats.record(run.confidence, committed=False)
+        return False
+
+    def claim(self, speculation_id: Optional[str], tool_name: str) -> Optional[asyncio.Task]:
+        """The committed run for `tool_name`, handed over to its extractor node exactly once."""
+        if speculation_id is None:
+            return None
+        run = self._runs.get(speculation_id)
+        if run is None or run.tool_name != tool_name:
+            return None
+        del self._runs[speculation_id]
+        return run.task
+
+    def _drop_stale(self) -> None:
+        cutoff = time.perf_counter() - STALE_AFTER
+        for speculation_id, run in list(self._runs.items()):
+            if run.started_at < cutoff:
+                self._runs.pop(speculation_id, None)
+                run.task.cancel()
+
+
+speculator = Speculator()
@@ -0,0 +1,73 @@
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from src.serialization import dumps
+
+# Nodes whose LLM output is the reply itself, so their tokens are streamed.
+STREAMED_NODES = ("clarify", "request_missing_info_node", "formatter_node")
+
+GRAPH_NODES = (
+    "router",
+    "route_and_extract",
+    "NoteMaker",
+    "FlashcardGenerator",
+    "ConceptExplainer",
+    "clarify",
+    "request_missing_info_node",
+    "adaptation_node",
+    "tool_executor",
+    "formatter_node",
+)
+
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    """Encodes one server-sent event."""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+def _chunk_text(chunk) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    # Multi-part content: keep the text parts.
+    return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+async def graph_events(
+    app, inputs: dict, config: Optional[dict] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Runs the compiled graph with astream_events and yields (event, data)
+    pairs: node_start / node_end for every graph node, token for each chunk
+    the reply-producing nodes stream, and a closing "result" carrying the
+    final_output. A reply node that produced no chunks (memoized, or a
+    fallback message) is sent as a single token when it ends.
+    """
+    started: Dict[str, float] = {}
+    streamed = set()
+    final_output = None
+
+    async for event in app.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_start" and event["name"] in GRAPH_NODES and node == event["name"]:
+            started[node] = time.perf_counter()
+            yield "node_start", {"node": node}
+
+        elif kind == "on_chat_model_stream" and node in STREAMED_NODES:
+            text = _chunk_text(event["data"]["chunk"])
+            if text:
+                streamed.add(node)
+                yield "token", {"node": node, "text": text}
+
+        elif kind == "on_chain_end" and event["name"] in GRAPH_NODES and node == event["name"]:
+            output = event["data"].get("output")
+            if isinstance(output, dict) and output.get("final_output"):
+                final_output = output["final_output"]
+                if node not in streamed:
+                    yield "token", {"node": node, "text": final_output}
+            duration = time.perf_counter() - started.pop(node, time.perf_counter())
+            yield "node_end", {"node": node, "duration_ms": round(duration * 1000, 3)}
+
+    yield "result", {"final_output": final_output}
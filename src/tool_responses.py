@@ -0,0 +1,107 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from src.history import estimate_tokens
+from src.schemas import ConceptExplainerResponse, FlashcardGeneratorResponse, NoteMakerResponse
+from src.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+TOOL_RESPONSE_MODELS: Dict[str, Type[BaseModel]] = {
+    "NoteMaker": NoteMakerResponse,
+    "FlashcardGenerator": FlashcardGeneratorResponse,
+    "ConceptExplainer": ConceptExplainerResponse,
+}
+
+_TRUNCATED = "…"
+
+
+def parse_tool_response(tool_name: str, content: bytes) -> Any:
+    """
+    The tool's response body as plain data. Known tools are validated
+    against their response model straight from the bytes (no intermediate
+    json.loads), keeping only the fields the payload set; fields the model
+    does not know are dropped. A body that does not match is logged and
+    passed on as plain JSON, as is any unknown tool's.
+    """
+    model = TOOL_RESPONSE_MODELS.get(tool_name)
+    if model is not None:
+        try:
+            return model.model_validate_json(content).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            logger.warning("%s response does not match %s: %s", tool_name, model.__name__, e)
+            tool_response_stats.record_invalid(tool_name)
+    return json.loads(content)
+
+
+def compact(value: Any, max_items: Optional[int] = None, max_chars: Optional[int] = None) -> Any:
+    """
+    Drops None, empty strings, lists and mappings (at any depth), keeps the
+    first `max_items` of each list and cuts strings to `max_chars`.
+    """
+    if isinstance(value, dict):
+        compacted = {key: compact(item, max_items, max_chars) for key, item in value.items()}
+        return {key: item for key, item in compacted.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        items = [compact(item, max_items, max_chars) for item in value[:max_items]]
+        return [item for item in items if item not in (None, "", [], {})]
+    if isinstance(value, str) and max_chars is not None and len(value) > max_chars:
+        return value[:max_chars].rstrip() + _TRUNCATED
+    return value
+
+
+def formatter_payload(
+    tool_name: Optional[str],
+    api_response: Any,
+    max_items: int,
+    max_chars: int,
+    raw_tokens: Optional[int] = None,
+) -> str:
+    """
+    The tool response as it goes into the formatter prompt: compacted JSON.
+    Records how much smaller it is than the tool's raw response body, whose
+    estimated tokens execute_tool measured before validation (`raw_tokens`;
+    without it, the response as JSON).
+    """
+    payload = dumps(compact(api_response, max_items, max_chars)).decode()
+    if raw_tokens is None:
+        raw_tokens = estimate_tokens(json.dumps(api_response))
+    tool_response_stats.record(tool_name or "unknown", raw_tokens, estimate_tokens(payload))
+    return payload
+
+
+class ToolResponseStats:
+    """Per tool: responses that failed validation, and raw response tokens against formatter prompt tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"invalid": 0, "formatted": 0, "raw_tokens": 0, "prompt_tokens": 0}
+        )
+
+    def record_invalid(self, tool_name: str) -> None:
+        with self._lock:
+            self._tools[tool_name]["invalid"] += 1
+
+    def record(self, tool_name: str, raw_tokens: int, prompt_tokens: int) -> None:
+        with self._lock:
+            counts = self._tools[tool_name]
+            counts["formatted"] += 1
+            counts["raw_tokens"] += raw_tokens
+            counts["prompt_tokens"] += prompt_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tools = {tool: dict(counts) for tool, counts in self._tools.items()}
+        for counts in tools.values():
+            if counts["raw_tokens"]:
+                counts["prompt_token_reduction"] = round(1 - counts["prompt_tokens"] / counts["raw_tokens"], 3)
+        return tools
+
+
+tool_response_stats = ToolResponseStats()
@@ -0,0 +1,358 @@
+import functools
+import inspect
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config import get_settings
+from src.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "tutor-orchestrator"
+
+# OTLP span kinds and status codes.
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    """One timed operation within a request: the request itself, a graph node, an LLM or tool call."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int = KIND_INTERNAL, **attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes
+        self.status = STATUS_UNSET
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def fail(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status, **({"message": self.error} if self.error else {})},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stands in for a span outside a traced request, so callers need not check."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def fail(self, error: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """
+    The spans of one request. Spans are collected as they end; those ending
+    after the request has finished (background work) are dropped.
+    """
+
+    def __init__(self, name: str, request_id: Optional[str] = None, traceparent: Optional[str] = None):
+        match = _TRACEPARENT_RE.match(traceparent or "")
+        self.trace_id = match.group(1) if match else f"{random.getrandbits(128):032x}"
+        self.request_id = request_id or self.trace_id
+        self.spans: List[Span] = []
+        self.finished = False
+        self.root = Span(
+            self, name, match.group(2) if match else None, KIND_SERVER, **{"request.id": self.request_id}
+        )
+
+    def add(self, span: Span) -> None:
+        if not self.finished:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        self.root.end()
+        self.finished = True
+        _export(self)
+
+    def to_otlp(self) -> dict:
+        """The trace in the OTLP/JSON encoding (as read by the OpenTelemetry Collector's otlpjsonfile receiver)."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in self.spans]}],
+            }]
+        }
+
+    def tree(self) -> dict:
+        """The spans nested under the root, with durations, for the slow-request log."""
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        def node(span: Span) -> dict:
+            entry = {"name": span.name, "duration_ms": round(span.duration_ms, 3)}
+            if span.attributes:
+                entry["attributes"] = span.attributes
+            if span.error:
+                entry["error"] = span.error
+            nested = sorted(children.get(span.span_id, []), key=lambda s: s.start_ns)
+            if nested:
+                entry["children"] = [node(child) for child in nested]
+            return entry
+
+        return {"request_id": self.request_id, "trace_id": self.trace_id, **node(self.root)}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.request_id if current is not None and not current.trace.finished else None
+
+
+def start_trace(name: str, request_id: Optional[str] = None, traceparent: Optional[str] = None) -> Trace:
+    """
+    Starts a request's trace and makes its root span current for the calling
+    context (and the tasks it creates). The caller must call finish().
+    """
+    trace = Trace(name, request_id, traceparent)
+    _current_span.set(trace.root)
+    return trace
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    A child span of the current one for the duration of the block. Outside
+    a traced request this is a no-op.
+    """
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        yield _NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def trace_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node (sync or async) in a span named after it."""
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_node(state, **kwargs):
+            with span(f"node {name}", **{"graph.node": name}):
+                return await fn(state, **kwargs)
+        return async_node
+
+    @functools.wraps(fn)
+    def sync_node(state, **kwargs):
+        with span(f"node {name}", **{"graph.node": name}):
+            return fn(state, **kwargs)
+    return sync_node
+
+
+class TracingCallback(BaseCallbackHandler):
+    """
+    Adds a span per chat model call under the current node's span, with
+    prompt and response sizes. Pass it in the graph's run config next to
+    the metrics callback.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any):
+        parent = _current_span.get()
+        if parent is None or parent.trace.finished:
+            return
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model", "unknown")
+        prompt = [message for batch in messages for message in batch]
+        self._runs[run_id] = Span(
+            parent.trace,
+            "llm.chat",
+            parent.span_id,
+            KIND_CLIENT,
+            **{
+                "llm.model": model,
+                "llm.prompt.messages": len(prompt),
+                "llm.prompt.chars": sum(len(str(message.content)) for message in prompt),
+            },
+        )
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        chars = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                chars += len(generation.text or "")
+                if message is not None and message.tool_calls:
+                    chars += len(dumps([call["args"] for call in message.tool_calls]))
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    run.set("llm.usage.input_tokens", usage.get("input_tokens", 0))
+                    run.set("llm.usage.output_tokens", usage.get("output_tokens", 0))
+        run.set("llm.response.chars", chars)
+        run.end()
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            run.fail(error)
+            run.end()
+
+
+tracing_callback = TracingCallback()
+
+
+class FileSpanExporter:
+    """Appends each trace as one OTLP/JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, trace: Trace) -> None:
+        line = dumps(trace.to_otlp()).decode()
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+@lru_cache(maxsize=None)
+def get_trace_exporter() -> Optional[FileSpanExporter]:
+    """The process-wide exporter, or None when TRACE_FILE is unset."""
+    settings = get_settings()
+    return FileSpanExporter(settings.trace_file) if settings.trace_file else None
+
+
+class SlowRequestLog:
+    """
+    Logs the full span tree of (a sample of) the requests slower than
+    SLOW_REQUEST_THRESHOLD seconds, and keeps the most recent ones for /stats.
+    """
+
+    def __init__(self, keep: int = 20):
+        self._lock = threading.Lock()
+        self.logged = 0
+        self._recent = deque(maxlen=keep)
+
+    def record(self, trace: Trace) -> bool:
+        settings = get_settings()
+        duration_ms = trace.root.duration_ms
+        if duration_ms < settings.slow_request_threshold * 1000:
+            return False
+        if random.random() >= settings.slow_request_sample_rate:
+            return False
+        tree = trace.tree()
+        logger.warning("Slow request %s took %.0f ms: %s", trace.request_id, duration_ms, dumps(tree).decode())
+        with self._lock:
+            self.logged += 1
+            self._recent.append({"request_id": trace.request_id, "name": trace.root.name, "duration_ms": round(duration_ms, 3)})
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "threshold_ms": get_settings().slow_request_threshold * 1000,
+                "logged": self.logged,
+                "recent": list(self._recent),
+            }
+
+
+slow_requests = SlowRequestLog()
+
+
+def _export(trace: Trace) -> None:
+    slow_requests.record(trace)
+    exporter = get_trace_exporter()
+    if exporter is not None and random.random() < get_settings().trace_sample_rate:
+        try:
+            exporter.export(trace)
+        except OSError as e:
+            logger.warning("Could not export trace %s: %s", trace.trace_id, e)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request ID (or "-") to every log record as %(request_id)s."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+def configure_logging(level: str) -> None:
+    """Leveled logging for the orchestrator's modules, tagged with the request ID."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    package = logging.getLogger("src")
+    package.handlers = [handler]
+    package.setLevel(level.upper())
+    package.propagate = False
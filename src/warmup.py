@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+import inspect
+import logging
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from src.config import get_settings
+from src.http_client import get_tool_client
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Startup state behind /ready: not ready until warm-up has finished."""
+
+    def __init__(self):
+        self.ready = False
+        self.phases_ms: Dict[str, float] = {}
+        self.errors: List[str] = []
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases_ms[phase] = round(seconds * 1000, 3)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "phases_ms": dict(self.phases_ms),
+            "errors": list(self.errors),
+        }
+
+
+readiness = Readiness()
+
+
+async def _timed(phase: str, work) -> Optional[object]:
+    """
+    Runs one warm-up phase, recording its duration; failures are recorded,
+    not raised. Synchronous phases (imports, model and chain construction)
+    run in a worker thread so /health and /ready keep answering meanwhile.
+    """
+    start = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(work):
+            return await work()
+        return await asyncio.to_thread(work)
+    except Exception as e:
+        logger.warning("Warm-up phase '%s' failed: %s", phase, e)
+        readiness.errors.append(f"{phase}: {e}")
+        return None
+    finally:
+        readiness.record(phase, time.perf_counter() - start)
+
+
+async def _open_tool_connections() -> None:
+    """One request to each tool host, leaving a keep-alive connection in the pool."""
+    client = get_tool_client()
+    for tool, endpoint in get_settings().tool_endpoints.items():
+        origin = httpx.URL(endpoint.url).copy_with(path="/", query=None)
+        try:
+            await client.get(origin, timeout=endpoint.connect_timeout)
+        except httpx.HTTPError as e:
+            readiness.errors.append(f"tool_connections: {tool} unreachable ({e})")
+
+
+async def _synthetic_request() -> None:
+    from src.graph import app
+
+    await app.ainvoke({
+        "current_query": "hi",
+        "user_profile": {
+            "user_id": "warmup",
+            "name": "Warm-up",
+            "grade_level": "10",
+            "learning_style_summary": "",
+            "emotional_state_summary": "",
+            "mastery_level_summary": "",
+        },
+        "chat_history": [],
+        "formatter_mode": get_settings().formatter_mode,
+    })
+
+
+async def warm_up() -> dict:
+    """
+    Pays the cold-start costs before the pod reports ready: imports the
+    Gemini client library, builds every model and chain the nodes use, loads
+    the pre-router, compiles the adaptation rules, opens the caches and a
+    connection to each tool and, with WARMUP_SYNTHETIC_REQUEST, runs one
+    request through the compiled graph (which also opens the connection to
+    Gemini).
+    """
+    from src.adaptation import get_adaptation_engine
+    from src.cache import get_response_cache
+    from src.node_cache import get_node_cache
+    from src.nodes import build_all_chains
+    from src.prerouter import get_prerouter
+    from src.sessions import get_session_store
+
+    settings = get_settings()
+    start = time.perf_counter()
+    await _timed("imports", lambda: importlib.import_module("langchain_google_genai"))
+    await _timed("chains", build_all_chains)
+    await _timed("prerouter", get_prerouter)
+    await _timed("adaptation_rules", get_adaptation_engine)
+    await _timed("caches", lambda: (get_response_cache(), get_node_cache(), get_session_store()))
+    await _timed("tool_connections", _open_tool_connections)
+    if settings.warmup_synthetic_request:
+        await _timed("synthetic_request", _synthetic_request)
+
+    readiness.record("warm_up_total", time.perf_counter() - start)
+    readiness.ready = True
+    logger.info("Warm-up finished: %s", readiness.phases_ms)
+    return readiness.report()
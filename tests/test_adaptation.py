@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from src.adaptation import (
+    DEFAULT_RULES_PATH,
+    AdaptationEngine,
+    KeywordAutomaton,
+    load_rules,
+    parse_rules,
+)
+
+
+def test_automaton_finds_every_overlapping_keyword():
+    automaton = KeywordAutomaton(["he", "she", "his", "hers"])
+
+    assert automaton.find("ushers") == {"she", "he", "hers"}
+    assert automaton.find("this") == {"his"}
+    assert automaton.find("nothing") == set()
+
+
+@pytest.mark.parametrize("profile, expected", [
+    (
+        {"emotional_state_summary": "Anxious about exams", "learning_style_summary": "Visual learner",
+         "mastery_level_summary": "level 2"},
+        {"include_examples": True, "include_analogies": True, "note_taking_style": "structured"},
+    ),
+    # The mastery rule has always been case-sensitive.
+    ({"mastery_level_summary": "Level 2"}, {}),
+    ({"emotional_state_summary": "calm", "learning_style_summary": "auditory"}, {}),
+    ({}, {}),
+])
+def test_default_rules_match_the_original_adaptations(profile, expected):
+    engine = AdaptationEngine(load_rules(DEFAULT_RULES_PATH))
+
+    assert engine.evaluate(profile) == expected
+
+
+def test_later_rule_wins_and_directories_load_in_name_order(tmp_path):
+    (tmp_path / "a_district.yml").write_text(
+        "rules:\n"
+        "  - name: outline\n"
+        "    field: learning_style_summary\n"
+        "    contains_any: [reading]\n"
+        "    set: {note_taking_style: outline}\n"
+    )
+    (tmp_path / "b_school.json").write_text(json.dumps({"rules": [{
+        "name": "bullets", "field": "learning_style_summary", "contains_any": ["reading"],
+        "set": {"note_taking_style": "bullet_points", "include_examples": True},
+    }]}))
+    (tmp_path / "notes.txt").write_text("not a rule file")
+
+    engine = AdaptationEngine(load_rules(tmp_path))
+
+    assert [rule.name for rule in engine.rules] == ["outline", "bullets"]
+    assert engine.evaluate({"learning_style_summary": "Reading/writing"}) == {
+        "note_taking_style": "bullet_points", "include_examples": True,
+    }
+
+
+def test_profiles_are_evaluated_once_and_callers_get_a_copy():
+    engine = AdaptationEngine(load_rules(DEFAULT_RULES_PATH))
+    profile = {"user_id": "a", "learning_style_summary": "visual"}
+
+    first = engine.evaluate(profile)
+    first["include_analogies"] = False
+    second = engine.evaluate(dict(profile, user_id="b"))
+
+    assert second == {"include_analogies": True}
+    assert engine.stats()["cache"]["hits"] == 1 and engine.stats()["cache"]["misses"] == 1
+
+
+@pytest.mark.parametrize("rule", [
+    {"field": "learning_style_summary", "set": {"include_examples": True}},
+    {"field": "learning_style_summary", "contains_any": [], "set": {"include_examples": True}},
+    {"field": "learning_style_summary", "contains_any": ["visual"]},
+    {"contains_any": ["visual"], "set": {"include_examples": True}},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        parse_rules({"rules": [dict(rule, name="broken")]})
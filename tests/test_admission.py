@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionRejected, AdmissionScheduler
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Requests:
+    """Requests that note when they are admitted and hold their slot until the test lets them go."""
+
+    def __init__(self, scheduler: AdmissionScheduler):
+        self.scheduler = scheduler
+        self.order = []
+        self.tasks = []
+        self._done = {}
+
+    def start(self, name: str, user: str, priority: str = "interactive") -> None:
+        self.tasks.append(asyncio.ensure_future(self._run(name, user, priority)))
+
+    async def _run(self, name, user, priority):
+        async with self.scheduler.slot(user, priority):
+            self.order.append(name)
+            self._done[name] = asyncio.Event()
+            await self._done[name].wait()
+
+    async def finish_one_at_a_time(self) -> None:
+        await _settle()
+        while not all(task.done() for task in self.tasks):
+            self._done[self.order[-1]].set()
+            await _settle()
+
+
+@pytest.mark.asyncio
+async def test_interactive_goes_first_but_batch_is_not_starved():
+    requests = Requests(AdmissionScheduler(concurrency=1))
+    requests.start("running", "teacher", "batch")
+    await _settle()
+
+    for i in range(2):
+        requests.start(f"batch-{i}", "teacher", "batch")
+    for i in range(8):
+        requests.start(f"s{i}", f"student-{i}")
+    await requests.finish_one_at_a_time()
+
+    # One batch turn for every four interactive ones.
+    assert requests.order[1:] == ["s0", "s1", "s2", "s3", "s4", "batch-0", "s5", "s6", "s7", "batch-1"]
+
+
+@pytest.mark.asyncio
+async def test_users_take_turns_within_a_class():
+    requests = Requests(AdmissionScheduler(concurrency=1))
+    for i in range(4):
+        requests.start(f"a{i}", "a")
+    await _settle()
+    requests.start("b0", "b")
+
+    await requests.finish_one_at_a_time()
+
+    assert requests.order == ["a0", "a1", "b0", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_a_user_at_the_limit_waits_while_others_are_queued():
+    scheduler = AdmissionScheduler(concurrency=2, per_user_limit=1)
+    await scheduler.acquire("a", "interactive")
+    await scheduler.acquire("x", "interactive")
+    second_for_a = asyncio.ensure_future(scheduler.acquire("a", "interactive"))
+    first_for_b = asyncio.ensure_future(scheduler.acquire("b", "interactive"))
+    await _settle()
+
+    scheduler.release("x")
+    await _settle()
+
+    assert first_for_b.done() and not second_for_a.done()
+    scheduler.release("b")
+    await second_for_a
+
+
+@pytest.mark.asyncio
+async def test_a_full_queue_sheds_batch_work_before_interactive():
+    scheduler = AdmissionScheduler(concurrency=1, max_queue=1)
+    await scheduler.acquire("a", "interactive")
+    queued_batch = asyncio.ensure_future(scheduler.acquire("teacher", "batch"))
+    await _settle()
+
+    queued_interactive = asyncio.ensure_future(scheduler.acquire("b", "interactive"))
+    await _settle()
+
+    with pytest.raises(AdmissionRejected):
+        await queued_batch
+    with pytest.raises(AdmissionRejected):
+        await scheduler.acquire("c", "interactive")
+    scheduler.release("a")
+    await queued_interactive
+    assert scheduler.stats()["shed"] == {"batch": {"displaced": 1}, "interactive": {"queue_full": 1}}
+
+
+@pytest.mark.asyncio
+async def test_waiting_too_long_or_giving_up_leaves_the_queue():
+    scheduler = AdmissionScheduler(concurrency=1, max_wait=0.01)
+    await scheduler.acquire("a", "interactive")
+    abandoned = asyncio.ensure_future(scheduler.acquire("b", "interactive"))
+    await _settle()
+    abandoned.cancel()
+    await _settle()
+
+    with pytest.raises(AdmissionRejected):
+        await scheduler.acquire("c", "interactive")
+    scheduler.release("a")
+
+    stats = scheduler.stats()
+    assert stats["running"] == 0
+    assert stats["queued"] == {"short": 0, "interactive": 0, "batch": 0}
+    assert stats["shed"] == {"interactive": {"timeout": 1}}
@@ -0,0 +1,106 @@
+from src.cache import LRUCache, ResponseCache, SQLiteStore, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+
+    cache.set("a", 1)
+    clock.now = 11
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_cache_respects_memory_cap():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+
+    cache.set("a", "12345")
+    cache.set("b", "123456")
+
+    assert "a" not in cache
+    assert cache.size_bytes == 6
+
+
+def test_response_cache_normalizes_query_and_keys_on_adaptations():
+    cache = ResponseCache(LRUCache())
+    visual = {"include_analogies": True}
+
+    cache.set("Explain photosynthesis!", visual, "Plants make sugar.")
+
+    assert normalize_query("  Explain   PHOTOSYNTHESIS! ") == "explain photosynthesis"
+    assert cache.get("explain photosynthesis", visual) == "Plants make sugar."
+    assert cache.get("explain photosynthesis", {}) is None
+
+
+def test_response_cache_near_duplicate_lookup():
+    cache = ResponseCache(LRUCache(), near_duplicates=True, similarity=0.7)
+
+    cache.set("make flashcards on the water cycle", {}, "Here are your flashcards.")
+
+    assert cache.get("make flashcards on the water cycles", {}) == "Here are your flashcards."
+    assert cache.get("explain gravity", {}) is None
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_sqlite_store_is_shared_between_processes_and_evicts_lru(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = SQLiteStore(path, max_entries=2)
+    worker_b = SQLiteStore(path, max_entries=2)
+    evicted = []
+    worker_b.on_evict = evicted.append
+
+    worker_a.set(("a", "{}"), "1")
+    worker_b.set(("b", "{}"), "2")
+    worker_b.get(("a", "{}"))
+    worker_b.set(("c", "{}"), "3")
+
+    assert worker_a.get(("a", "{}")) == "1"
+    assert ("b", "{}") not in worker_a
+    assert evicted == [("b", "{}")]
+    assert worker_a.stats()["entries"] == 2
+
+
+def test_sqlite_store_expires_entries_and_respects_memory_cap(tmp_path):
+    clock = FakeClock()
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"), ttl=10, max_bytes=10, clock=clock)
+
+    store.set(("a",), "12345")
+    store.set(("b",), "123456")
+    store.set(("c",), "12345678901")
+    clock.now = 11
+
+    assert ("a",) not in store and ("c",) not in store
+    assert store.get(("b",)) is None
+    assert store.stats()["expirations"] == 1 and store.stats()["evictions"] == 1
+
+
+def test_response_cache_over_a_shared_sqlite_store(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = ResponseCache(SQLiteStore(path))
+    reader = ResponseCache(SQLiteStore(path))
+
+    writer.set("Explain photosynthesis!", {"include_analogies": True}, "Plants make sugar.")
+
+    assert reader.get("explain photosynthesis", {"include_analogies": True}) == "Plants make sugar."
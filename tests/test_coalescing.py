@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.coalescing import SingleFlight
+
+
+class Upstream:
+    def __init__(self, result=None, error=None, delay=0.05):
+        self.calls = 0
+        self.cancelled = False
+        self.result, self.error, self.delay = result, error, delay
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test")
+    upstream = Upstream(result={"topic": "photosynthesis"})
+
+    results = await asyncio.gather(*(flight.do("key", upstream, copy=dict) for _ in range(30)))
+
+    assert upstream.calls == 1
+    assert all(result == {"topic": "photosynthesis"} for result in results)
+    assert len({id(result) for result in results}) == 30
+    assert flight.stats() == {"calls": 1, "coalesced": 29, "abandoned": 0, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight("test")
+    failing = Upstream(error=RuntimeError("tool down"))
+
+    results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+    recovered = await flight.do("key", Upstream(result="ok"))
+
+    assert failing.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert recovered == "ok"
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_leaves_the_computation_to_the_others():
+    flight = SingleFlight("test")
+    upstream = Upstream(result="ok")
+    leader = asyncio.ensure_future(flight.do("key", upstream))
+    follower = asyncio.ensure_future(flight.do("key", upstream))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+
+    assert await follower == "ok"
+    assert leader.cancelled() and not upstream.cancelled
+
+
+@pytest.mark.asyncio
+async def test_the_computation_is_cancelled_when_every_caller_is():
+    flight = SingleFlight("test")
+    upstream = Upstream(result="ok", delay=1)
+    callers = [asyncio.ensure_future(flight.do("key", upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    for caller in callers:
+        caller.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert upstream.cancelled
+    assert flight.stats()["abandoned"] == 1 and flight.stats()["in_flight"] == 0
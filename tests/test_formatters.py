@@ -0,0 +1,61 @@
+
+import pytest
+from unittest.mock import patch
+
+from mock_tools.mock_flashcard_generator import create_flashcards
+from src.formatters import FormatterStats, render_concept_explanation, render_note_maker, render_template
+from src.nodes import format_final_response
+
+
+NOTES = {
+    "title": "Comprehensive Notes on the Water Cycle",
+    "summary": "An overview of the water cycle.",
+    "note_sections": [
+        {"title": "Evaporation", "content": "Water turns into vapor.", "key_points": ["Driven by the sun"],
+         "examples": [], "analogies": ["Like a kettle"]}
+    ],
+    "key_concepts": ["Evaporation", "Condensation"],
+    "connections_to_prior_learning": [],
+    "source_references": [],
+}
+
+
+def test_note_maker_template_renders_sections_and_skips_empty_lists():
+    rendered = render_note_maker(NOTES)
+
+    assert rendered.startswith("# Comprehensive Notes on the Water Cycle")
+    assert "## Evaporation" in rendered
+    assert "- Like a kettle" in rendered
+    assert "Sources" not in rendered
+    assert "Connections" not in rendered
+
+
+def test_unknown_payload_falls_back_to_llm():
+    assert render_template("ConceptExplainer", {"unexpected": True}) is None
+    assert render_template("UnknownTool", {"explanation": "x"}) is None
+    assert render_concept_explanation({"explanation": "Plants make sugar."}) == "Plants make sugar."
+
+
+@pytest.mark.asyncio
+async def test_template_mode_skips_llm_formatter():
+    # Arrange
+    api_response = await create_flashcards(None)
+    state = {"selected_tool": "FlashcardGenerator", "api_response": api_response, "formatter_mode": "template"}
+
+    # Act
+    with patch("src.nodes.get_text_chain") as mock_get_chain:
+        result = await format_final_response(state)
+
+    # Assert
+    mock_get_chain.assert_not_called()
+    assert "**Q:** What is the primary source of energy for photosynthesis?" in result["final_output"]
+    assert "*Example:* Plants on a sunny windowsill" in result["final_output"]
+
+
+def test_formatter_stats_report_latency_saved():
+    stats = FormatterStats()
+
+    stats.record("NoteMaker", "llm", 1.5)
+    stats.record("NoteMaker", "template", 0.001)
+
+    assert stats.snapshot()["NoteMaker"]["saved_ms_per_request"] == pytest.approx(1499.0)
@@ -0,0 +1,48 @@
+from src.history import SUMMARY_PREFIX, HistoryManager, estimate_tokens, history_tokens
+
+
+def _turns(count, words=10):
+    history = []
+    for i in range(count):
+        history.append({"role": "user", "content": f"question {i} " + "word " * words})
+        history.append({"role": "assistant", "content": f"answer {i} " + "word " * words})
+    return history
+
+
+def test_estimate_tokens_is_about_four_characters_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_short_history_is_returned_unchanged():
+    history = _turns(2)
+
+    assert HistoryManager(budget_tokens=1000, keep_last_turns=6).window(history) == history
+
+
+def test_older_turns_are_summarized_and_recent_turns_kept_verbatim():
+    history = _turns(10)
+
+    windowed = HistoryManager(budget_tokens=1000, keep_last_turns=3).window(history)
+
+    assert windowed[0]["content"].startswith(SUMMARY_PREFIX)
+    assert "question 0" in windowed[0]["content"]
+    assert windowed[1:] == history[-6:]
+
+
+def test_older_turns_can_be_dropped():
+    history = _turns(10)
+
+    windowed = HistoryManager(budget_tokens=1000, keep_last_turns=3, older_turns="drop").window(history)
+
+    assert windowed == history[-6:]
+
+
+def test_window_respects_the_token_budget():
+    history = _turns(10, words=200)
+
+    windowed = HistoryManager(budget_tokens=1000, keep_last_turns=6, summary_tokens=100).window(history)
+
+    assert history_tokens(windowed) <= 1000
+    assert windowed[-1] == history[-1]
@@ -0,0 +1,164 @@
+"""
+End-to-end tests: /orchestrate through the compiled graph, with the offline
+fake LLM backend and the mock_tools apps served in-process.
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from mock_tools.mock_concept_explainer import app as concept_explainer_app
+from mock_tools.mock_flashcard_generator import app as flashcard_generator_app
+from mock_tools.mock_note_maker import app as note_maker_app
+from src.coalescing import flights
+from src.config import Settings
+from src.llm import registry
+from src.main import api
+from src.tracing import get_trace_exporter
+
+PROFILE = {
+    "user_id": "integration",
+    "name": "Test",
+    "grade_level": "10",
+    "learning_style_summary": "visual",
+    "emotional_state_summary": "focused",
+    "mastery_level_summary": "Level 5",
+}
+
+
+@pytest.fixture
+def orchestrator():
+    """An HTTP client for the API, wired to the fake LLM and the mock tools."""
+    registry.clear()
+    tools = httpx.AsyncClient(mounts={
+        "http://127.0.0.1:8001": httpx.ASGITransport(app=note_maker_app),
+        "http://127.0.0.1:8002": httpx.ASGITransport(app=flashcard_generator_app),
+        "http://127.0.0.1:8003": httpx.ASGITransport(app=concept_explainer_app),
+    })
+    settings = Settings(llm_backend="fake", fake_llm_latency_ms=0)
+    with patch("src.llm.get_settings", return_value=settings), \
+            patch("src.nodes.get_tool_client", return_value=tools), \
+            patch("src.main.get_response_cache", return_value=None):
+        yield httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test")
+    registry.clear()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query, heading", [
+    ("Make me notes on the water cycle", "# Comprehensive Notes on the Water Cycle"),
+    ("Create flashcards on photosynthesis", "# Flashcards: Photosynthesis"),
+    ("Explain photosynthesis to me", "Photosynthesis is the process"),
+])
+async def test_tool_requests_reach_the_tool_and_are_formatted(orchestrator, query, heading):
+    # Arrange
+    body = {"current_query": query, "user_profile": PROFILE, "formatter_mode": "template"}
+
+    # Act
+    async with orchestrator as client:
+        response = await client.post("/orchestrate", json=body)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["agent_response"].startswith(heading)
+
+
+@pytest.mark.asyncio
+async def test_llm_formatter_and_chat_history(orchestrator):
+    # Arrange
+    history = [
+        {"role": "user", "content": "We are studying biology."},
+        {"role": "assistant", "content": "Great, what would you like?"},
+    ]
+    body = {"current_query": "Explain osmosis", "user_profile": PROFILE, "chat_history": history}
+
+    # Act
+    async with orchestrator as client:
+        response = await client.post("/orchestrate", json=body)
+
+    # Assert
+    data = response.json()
+    assert data["agent_response"].startswith("Here is what I found for you")
+    assert len(data["updated_chat_history"]) == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_delivers_fake_llm_tokens(orchestrator):
+    # Arrange
+    body = {"current_query": "Make me notes on the water cycle", "user_profile": PROFILE}
+
+    # Act
+    async with orchestrator as client:
+        response = await client.post("/orchestrate/stream", json=body)
+
+    # Assert
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+    nodes = [data["node"] for kind, data in events if kind == "node_end"]
+    assert nodes[:1] == ["router"] and "tool_executor" in nodes
+    tokens = "".join(data["text"] for kind, data in events if kind == "token")
+    assert events[-1][0] == "final"
+    assert events[-1][1]["agent_response"] == tokens
+
+
+@pytest.mark.asyncio
+async def test_request_trace_has_node_llm_and_tool_spans(orchestrator, tmp_path):
+    # Arrange
+    path = tmp_path / "traces.jsonl"
+    settings = Settings(trace_file=str(path))
+    # A query no other test sends, so the extractor is not served from the node cache.
+    body = {"current_query": "Make me notes on the nitrogen cycle", "user_profile": PROFILE}
+    get_trace_exporter.cache_clear()
+
+    # Act
+    with patch("src.tracing.get_settings", return_value=settings):
+        async with orchestrator as client:
+            response = await client.post("/orchestrate", json=body, headers={"X-Request-ID": "trace-me"})
+    get_trace_exporter.cache_clear()
+
+    # Assert
+    assert response.headers["X-Request-ID"] == "trace-me"
+    spans = json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_id = {span["spanId"]: span for span in spans}
+    parents = {span["name"]: by_id.get(span.get("parentSpanId"), {}).get("name") for span in spans}
+    assert parents["node router"] == "POST /orchestrate"
+    assert parents["tool.http"] == "node tool_executor"
+    assert parents["llm.chat"] in ("node NoteMaker", "node formatter_node")
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_graph_run(orchestrator):
+    # Arrange
+    body = {"current_query": "Explain the carbon cycle", "user_profile": PROFILE}
+    before = flights.get("graph").stats()
+
+    # Act
+    async with orchestrator as client:
+        responses = await asyncio.gather(*(client.post("/orchestrate", json=body) for _ in range(10)))
+
+    # Assert
+    after = flights.get("graph").stats()
+    assert {response.json()["agent_response"] for response in responses} == {responses[0].json()["agent_response"]}
+    assert after["calls"] - before["calls"] == 1
+    assert after["coalesced"] - before["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_same_text_from_different_conversations_runs_separately(orchestrator):
+    # Arrange
+    body = {"current_query": "Explain the nitrogen cycle", "user_profile": PROFILE}
+    follow_up = dict(body, chat_history=[{"role": "user", "content": "Explain the carbon cycle"}])
+    other_student = dict(body, user_profile=dict(PROFILE, user_id="other-student"))
+    before = flights.get("graph").stats()
+
+    # Act
+    async with orchestrator as client:
+        await asyncio.gather(*(client.post("/orchestrate", json=b) for b in (body, follow_up, other_student)))
+
+    # Assert
+    after = flights.get("graph").stats()
+    assert after["calls"] - before["calls"] == 3
+    assert after["coalesced"] - before["coalesced"] == 0
@@ -0,0 +1,68 @@
+import httpx
+import pytest
+
+from src.limits import AIMDLimiter, UpstreamOverloaded, is_overload
+
+
+def test_limit_grows_additively_on_success():
+    limiter = AIMDLimiter("tool:x", initial_limit=10)
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    assert limiter.stats()["limit"] == 10
+    assert 10.9 < limiter.limit < 11.0
+
+
+def test_limit_shrinks_multiplicatively_on_overload():
+    limiter = AIMDLimiter("tool:x", initial_limit=10, backoff=0.5)
+
+    limiter.acquire()
+    limiter.release(0.1, overloaded=True)
+
+    assert limiter.stats()["limit"] == 5
+    assert limiter.stats()["overloads"] == 1
+
+
+def test_slow_calls_count_as_overload():
+    limiter = AIMDLimiter("tool:x", initial_limit=10, backoff=0.5, latency_tolerance=3, min_samples=5)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    limiter.acquire()
+    limiter.release(1.0)
+
+    assert limiter.stats()["limit"] == 5
+
+
+def test_calls_over_the_limit_are_rejected_with_retry_after():
+    limiter = AIMDLimiter("llm:gemini", initial_limit=1)
+    limiter.latency.add(2.5)
+    limiter.acquire()
+
+    with pytest.raises(UpstreamOverloaded) as excinfo:
+        limiter.acquire()
+
+    assert excinfo.value.retry_after == 3
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slot_classifies_timeouts_as_overload():
+    limiter = AIMDLimiter("tool:x", initial_limit=10, backoff=0.5)
+
+    with pytest.raises(httpx.ReadTimeout):
+        async with limiter.slot():
+            raise httpx.ReadTimeout("slow")
+
+    assert limiter.stats() == {"limit": 5, "in_flight": 0, "rejected": 0, "overloads": 1}
+
+
+def test_is_overload_recognizes_status_codes():
+    request = httpx.Request("POST", "http://tool")
+
+    assert is_overload(httpx.HTTPStatusError("", request=request, response=httpx.Response(429)))
+    assert not is_overload(httpx.HTTPStatusError("", request=request, response=httpx.Response(400)))
+    assert not is_overload(ValueError("bad input"))
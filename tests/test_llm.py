@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock, patch
+
+from src.llm import LLMRegistry
+from src.nodes import RouterSchema
+
+
+@patch.object(LLMRegistry, "_build_model")
+def test_registry_builds_each_model_once(mock_build_model):
+    # Arrange
+    mock_build_model.side_effect = lambda model, temperature: MagicMock()
+    registry = LLMRegistry()
+
+    # Act
+    first = registry.get_model("models/test", 0)
+    second = registry.get_model("models/test", 0.0)
+    warmer = registry.get_model("models/test", 0.5)
+
+    # Assert
+    assert first is second
+    assert warmer is not first
+    assert mock_build_model.call_count == 2
+
+
+@patch.object(LLMRegistry, "_build_model")
+def test_registry_reuses_chain_for_same_prompt_and_schema(mock_build_model):
+    # Arrange
+    mock_build_model.side_effect = lambda model, temperature: MagicMock()
+    registry = LLMRegistry()
+    messages = (("system", "route"), ("human", "{query}"))
+
+    # Act
+    first = registry.get_chain(messages, schema=RouterSchema, bind="structured")
+    second = registry.get_chain(messages, schema=RouterSchema, bind="structured")
+    plain = registry.get_chain(messages)
+
+    # Assert
+    assert first is second
+    assert plain is not first
+    assert registry.stats()["builds"] == 2
+    assert registry.stats()["hits"] == 1
+    assert registry.stats()["models"] == 1
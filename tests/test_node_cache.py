@@ -0,0 +1,52 @@
+import pytest
+
+from src.node_cache import MemoryBackend, NodeCache, SQLiteBackend
+
+
+@pytest.mark.asyncio
+async def test_node_cache_memoizes_on_inputs_and_counts_hits():
+    cache = NodeCache(MemoryBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"topic": "mitosis"}
+
+    first = await cache.get_or_compute("NoteMaker", ["prompt", {"query": "notes on mitosis"}], compute)
+    first["user_info"] = {"user_id": "a"}
+    second = await cache.get_or_compute("NoteMaker", ["prompt", {"query": "notes on mitosis"}], compute)
+    await cache.get_or_compute("NoteMaker", ["prompt", {"query": "notes on meiosis"}], compute)
+
+    assert second == {"topic": "mitosis"}
+    assert len(calls) == 2
+    assert cache.stats()["NoteMaker"] == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+@pytest.mark.asyncio
+async def test_node_cache_does_not_store_failed_results():
+    cache = NodeCache(MemoryBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return None
+
+    await cache.get_or_compute("FlashcardGenerator", ["prompt"], compute)
+    await cache.get_or_compute("FlashcardGenerator", ["prompt"], compute)
+
+    assert len(calls) == 2
+
+
+def test_sqlite_backend_is_bounded_and_persistent(tmp_path):
+    path = str(tmp_path / "node_cache.sqlite3")
+    backend = SQLiteBackend(path, max_entries=2)
+
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.set("c", "3")
+    backend.close()
+    reopened = SQLiteBackend(path, max_entries=2)
+
+    assert reopened.get("a") is None
+    assert reopened.get("b") == "2"
+    assert reopened.get("c") == "3"
@@ -1,6 +1,26 @@
+import inspect
+from typing import Optional
+
+import httpx
 import pytest
-from unittest.mock import patch
-from src.nodes import contextual_adaptation, route_query, RouterSchema
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from unittest.mock import AsyncMock, patch
+from src.config import Settings, ToolEndpoint
+from src.graph import decide_after_route_and_extract
+from src.nodes import (
+    contextual_adaptation,
+    execute_tool,
+    extract_concept_explainer_parameters,
+    route_and_extract,
+    route_query,
+    RouteAndExtractSchema,
+    RouterSchema,
+    SPECULATIVE_NODE,
+)
+from src.metrics import instrument_node
+from src.resilience import CircuitOpen, breakers, guard_node
+from src.tracing import trace_node
 
 def test_adaptation_for_visual_learner():
     # Arrange
@@ -27,14 +47,16 @@ def test_adaptation_for_visual_learner():
     # Assert
     assert result["extracted_parameters"]["include_analogies"] is True
 
+@pytest.mark.asyncio
+@patch('src.nodes.get_settings', return_value=Settings(prerouter_enabled=False))
 @patch('src.nodes.get_router_chain')
-def test_router_selects_notemaker(mock_get_chain):
+async def test_router_selects_notemaker(mock_get_chain, mock_get_settings):
     # Arrange
     # Create a mock chain object
     mock_chain = mock_get_chain.return_value
 
     # Configure the chain to return our desired RouterSchema
-    mock_chain.invoke.return_value = RouterSchema(tool_name="NoteMaker")
+    mock_chain.ainvoke = AsyncMock(return_value=RouterSchema(tool_name="NoteMaker"))
 
     state = {
         "current_query": "make me notes",
@@ -42,9 +64,218 @@ def test_router_selects_notemaker(mock_get_chain):
         "chat_history": []
     }
 
+    config = {"callbacks": [], "metadata": {"langgraph_node": "router"}}
+
     # Act
-    result = route_query(state)
+    result = await route_query(state, config)
 
     # Assert
     assert result["selected_tool"] == "NoteMaker"
-    mock_chain.invoke.assert_called_once_with({"query": "make me notes"})
\ No newline at end of file
+    mock_chain.ainvoke.assert_awaited_once_with({"query": "make me notes"}, config=config)
+
+
+@pytest.mark.asyncio
+async def test_node_wrappers_pass_on_the_graph_config():
+    # Arrange
+    async def node(state, config: Optional[RunnableConfig] = None):
+        return {"config": config}
+
+    wrapped = instrument_node("node", trace_node("node", guard_node("node", node)))
+    config = {"callbacks": []}
+
+    # Act
+    result = await wrapped({}, config=config)
+
+    # Assert
+    assert "config" in inspect.signature(wrapped).parameters
+    assert result == {"config": config}
+
+@pytest.mark.asyncio
+async def test_execute_tool_posts_to_configured_endpoint():
+    # Arrange
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        return httpx.Response(200, json={"explanation": "Plants make sugar."})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    settings = Settings(
+        tool_endpoints={"ConceptExplainer": ToolEndpoint(url="http://explainer.svc/explain-concept")}
+    )
+    state = {
+        "selected_tool": "ConceptExplainer",
+        "extracted_parameters": {"concept_to_explain": "photosynthesis"},
+    }
+
+    # Act
+    with patch('src.nodes.get_tool_client', return_value=client), \
+            patch('src.nodes.get_settings', return_value=settings):
+        result = await execute_tool(state)
+
+    # Assert
+    assert seen["url"] == "http://explainer.svc/explain-concept"
+    assert result["api_response"] == {"explanation": "Plants make sugar."}
+
+
+def test_tool_endpoints_read_from_environment(monkeypatch):
+    # Arrange
+    monkeypatch.setenv("NOTE_MAKER_URL", "http://note-maker.tools.svc/create-notes")
+    monkeypatch.setenv("NOTE_MAKER_READ_TIMEOUT", "12")
+    monkeypatch.setenv("TOOL_CONNECT_TIMEOUT", "2")
+
+    # Act
+    endpoints = Settings.from_env().tool_endpoints
+
+    # Assert
+    assert endpoints["NoteMaker"] == ToolEndpoint(
+        url="http://note-maker.tools.svc/create-notes", connect_timeout=2.0, read_timeout=12.0
+    )
+    assert endpoints["ConceptExplainer"].read_timeout == 30.0
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_router_chain')
+async def test_router_fast_path_skips_llm(mock_get_chain):
+    # Arrange
+    state = {"current_query": "make me 10 flashcards on mitosis", "user_profile": {}, "chat_history": []}
+
+    # Act
+    result = await route_query(state)
+
+    # Assert
+    assert result["selected_tool"] == "FlashcardGenerator"
+    mock_get_chain.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_router_chain')
+async def test_router_falls_back_to_llm_below_threshold(mock_get_chain):
+    # Arrange
+    mock_get_chain.return_value.ainvoke = AsyncMock(return_value=RouterSchema(tool_name="ConceptExplainer"))
+    state = {"current_query": "tell me about cells", "user_profile": {}, "chat_history": []}
+
+    # Act
+    result = await route_query(state)
+
+    # Assert
+    assert result["selected_tool"] == "ConceptExplainer"
+    mock_get_chain.return_value.ainvoke.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_settings', return_value=Settings(node_cache_backend="none"))
+@patch('src.nodes.get_route_and_extract_chain')
+async def test_route_and_extract_returns_tool_and_arguments(mock_get_chain, mock_get_settings):
+    # Arrange
+    mock_get_chain.return_value.ainvoke = AsyncMock(return_value=RouteAndExtractSchema(decision={
+        "tool_name": "ConceptExplainer",
+        "arguments": {"concept_to_explain": "osmosis", "current_topic": "biology", "desired_depth": "basic"},
+    }))
+    state = {"current_query": "what does osmosis mean", "user_profile": {"user_id": "a"}, "chat_history": []}
+
+    # Act
+    result = await route_and_extract(state)
+
+    # Assert
+    assert result["selected_tool"] == "ConceptExplainer"
+    assert result["extracted_parameters"]["concept_to_explain"] == "osmosis"
+    assert result["extracted_parameters"]["user_info"] == {"user_id": "a"}
+    assert decide_after_route_and_extract({**state, **result}) == "adaptation_node"
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_route_and_extract_chain')
+async def test_route_and_extract_flags_missing_flashcard_topic(mock_get_chain):
+    # Arrange
+    mock_get_chain.return_value.ainvoke = AsyncMock(return_value=RouteAndExtractSchema(decision={
+        "tool_name": "FlashcardGenerator",
+        "arguments": {"topic": "", "count": 5, "difficulty": "medium", "subject": ""},
+    }))
+    state = {"current_query": "Can you make me some flashcards please?", "user_profile": {}, "chat_history": []}
+
+    # Act
+    result = await route_and_extract(state)
+
+    # Assert
+    assert result["extraction_status"] == "failure"
+    assert decide_after_route_and_extract({**state, **result}) == "request_missing_info_node"
+
+
+@pytest.mark.asyncio
+async def test_execute_tool_retries_overloaded_tool_then_opens_breaker():
+    # Arrange
+    statuses = iter([503, 200, 503, 503])
+
+    def handler(request):
+        return httpx.Response(next(statuses), json={"explanation": "Plants make sugar."})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    settings = Settings(
+        tool_endpoints={"ConceptExplainer": ToolEndpoint(url="http://explainer.svc/explain-concept")},
+        tool_retries=1,
+        tool_retry_base_delay=0,
+        breaker_failure_threshold=1,
+    )
+    state = {"selected_tool": "ConceptExplainer", "extracted_parameters": {}}
+    breakers.clear()
+
+    # Act / Assert
+    with patch('src.nodes.get_tool_client', return_value=client), \
+            patch('src.nodes.get_settings', return_value=settings), \
+            patch('src.resilience.get_settings', return_value=settings):
+        result = await execute_tool(state)
+        assert result["api_response"] == {"explanation": "Plants make sugar."}
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await execute_tool(state)
+        with pytest.raises(CircuitOpen):
+            await execute_tool(state)
+    breakers.clear()
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_extractor_chain')
+@patch('src.nodes.get_router_chain')
+async def test_speculative_extraction_is_reused_when_router_agrees(mock_router_chain, mock_extractor_chain):
+    # Arrange
+    mock_router_chain.return_value.ainvoke = AsyncMock(return_value=RouterSchema(tool_name="ConceptExplainer"))
+    tool_call = {"name": "ConceptExplainerInput", "args": {"concept_to_explain": "osmosis"}, "id": "1"}
+    mock_extractor_chain.return_value.ainvoke = AsyncMock(return_value=AIMessage(content="", tool_calls=[tool_call]))
+    settings = Settings(speculation_enabled=True, speculation_threshold=0.0, prerouter_threshold=1.01)
+    state = {"current_query": "explain osmosis to me speculatively", "user_profile": {}, "chat_history": []}
+
+    # Act
+    with patch('src.nodes.get_settings', return_value=settings):
+        routed = await route_query(state)
+        result = await extract_concept_explainer_parameters({**state, **routed})
+
+    # Assert
+    assert routed["selected_tool"] == "ConceptExplainer"
+    assert "speculation_id" in routed
+    assert result["extracted_parameters"]["concept_to_explain"] == "osmosis"
+    mock_extractor_chain.return_value.ainvoke.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch('src.nodes.get_extractor_chain')
+@patch('src.nodes.get_router_chain')
+async def test_speculative_extraction_is_labelled_apart_from_the_router(mock_router_chain, mock_extractor_chain):
+    # Arrange
+    mock_router_chain.return_value.ainvoke = AsyncMock(return_value=RouterSchema(tool_name="ConceptExplainer"))
+    tool_call = {"name": "ConceptExplainerInput", "args": {"concept_to_explain": "diffusion"}, "id": "1"}
+    mock_extractor_chain.return_value.ainvoke = AsyncMock(return_value=AIMessage(content="", tool_calls=[tool_call]))
+    settings = Settings(speculation_enabled=True, speculation_threshold=0.0, prerouter_threshold=1.01)
+    state = {"current_query": "explain diffusion to me speculatively", "user_profile": {}, "chat_history": []}
+    config = {"metadata": {"langgraph_node": "router"}}
+
+    # Act
+    with patch('src.nodes.get_settings', return_value=settings):
+        routed = await route_query(state, config=config)
+        await extract_concept_explainer_parameters({**state, **routed})
+
+    # Assert
+    router_config = mock_router_chain.return_value.ainvoke.call_args.kwargs["config"]
+    extractor_config = mock_extractor_chain.return_value.ainvoke.call_args.kwargs["config"]
+    assert router_config["metadata"]["langgraph_node"] == "router"
+    assert extractor_config["metadata"]["langgraph_node"] == SPECULATIVE_NODE
@@ -0,0 +1,46 @@
+from src.config import Settings
+from src.prerouter import DEFAULT_EXAMPLES_PATH, NaiveBayesRouter, PreRouter, load_examples
+
+
+def _prerouter():
+    return PreRouter(NaiveBayesRouter().fit(load_examples(DEFAULT_EXAMPLES_PATH)))
+
+
+def test_rules_route_unambiguous_queries():
+    prerouter = _prerouter()
+
+    assert prerouter.route("hi").tool_name == "clarify"
+    assert prerouter.route("make me 10 flashcards on mitosis").tool_name == "FlashcardGenerator"
+    assert prerouter.route("Can you summarize the water cycle?").tool_name == "NoteMaker"
+    assert prerouter.route("Explain photosynthesis").source == "rule"
+
+
+def test_small_talk_is_not_fast_pathed_as_a_concept_question():
+    prerouter = _prerouter()
+
+    for query in ("what is up", "what is your name", "what are you doing", "explain that again"):
+        result = prerouter.route(query)
+        assert result.source == "classifier"
+        assert result.confidence < Settings.prerouter_threshold
+    assert prerouter.route("what is the water cycle").source == "rule"
+
+
+def test_classifier_handles_queries_without_rule_match():
+    result = _prerouter().route("how do volcanoes erupt")
+
+    assert result.source == "classifier"
+    assert result.tool_name == "ConceptExplainer"
+    assert 0.0 < result.confidence <= 1.0
+
+
+def test_stats_report_hit_rate_and_agreement():
+    prerouter = _prerouter()
+
+    prerouter.stats.record(fast_path=True)
+    prerouter.stats.record(fast_path=False)
+    prerouter.stats.record_comparison("NoteMaker", "NoteMaker")
+    prerouter.stats.record_comparison("clarify", "ConceptExplainer")
+
+    snapshot = prerouter.stats.snapshot()
+    assert snapshot["hit_rate"] == 0.5
+    assert snapshot["agreement_rate"] == 0.5
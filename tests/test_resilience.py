@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.latency import LatencyWindow
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    deadline_scope,
+    hedge,
+    hedge_delay,
+    remaining,
+    retry,
+    within_deadline,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _fail():
+    raise ConnectionError("down")
+
+
+async def _ok():
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_threshold_and_recovers_after_reset_timeout():
+    clock = FakeClock()
+    breaker = CircuitBreaker("tool:x", failure_threshold=2, reset_timeout=30, clock=clock)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(_fail, lambda e: True)
+
+    with pytest.raises(CircuitOpen):
+        await breaker.call(_ok, lambda e: True)
+
+    clock.now = 31
+    assert await breaker.call(_ok, lambda e: True) == "ok"
+    assert breaker.stats() == {"state": "closed", "failures": 0, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_half_open_trial_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("tool:x", failure_threshold=1, reset_timeout=30, clock=clock)
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail, lambda e: True)
+
+    clock.now = 31
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail, lambda e: True)
+
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_retry_retries_retryable_errors_only():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("blip")
+        return "ok"
+
+    assert await retry(flaky, lambda e: isinstance(e, ConnectionError), attempts=3, base_delay=0) == "ok"
+    with pytest.raises(ValueError):
+        await retry(lambda: _raise(ValueError()), lambda e: isinstance(e, ConnectionError), base_delay=0)
+
+
+async def _raise(error):
+    raise error
+
+
+@pytest.mark.asyncio
+async def test_hedge_returns_the_faster_copy():
+    delays = iter([1.0, 0.0])
+
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await hedge(call, delay=0.01) == 0.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cancel_after", [0.01, 0.1])  # before and after the hedge starts
+async def test_cancelled_caller_cancels_every_copy(cancel_after):
+    cancelled = []
+
+    async def call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    caller = asyncio.ensure_future(hedge(call, delay=0.05))
+    await asyncio.sleep(cancel_after)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    await asyncio.sleep(0)
+
+    assert len(cancelled) == (1 if cancel_after < 0.05 else 2)
+
+
+def test_hedge_delay_waits_for_enough_samples():
+    window = LatencyWindow()
+    for i in range(19):
+        window.add(i / 100)
+    assert hedge_delay(window) is None
+
+    window.add(0.19)
+    assert hedge_delay(window) == 0.19
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_slow_work():
+    with deadline_scope(0.01):
+        assert remaining() <= 0.01
+        with pytest.raises(DeadlineExceeded):
+            await within_deadline(asyncio.sleep(1), "sleep")
+
+    assert remaining() is None
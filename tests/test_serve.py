@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from src.config import Settings
+from src.serve import SHARED_BACKENDS, share_metrics_between_workers, share_state_between_workers, uvicorn_options
+
+REQUEST_METRICS = """
+from src.metrics import HTTP_REQUESTS, HTTP_REQUESTS_IN_FLIGHT, worker_exited
+HTTP_REQUESTS.labels(method="POST", handler="/orchestrate", status="200").inc()
+HTTP_REQUESTS_IN_FLIGHT.inc()
+"""
+
+
+def test_workers_recycle_only_under_a_supervisor():
+    single = uvicorn_options(Settings(server_workers=1, server_max_requests=1000))
+    several = uvicorn_options(Settings(server_workers=4, server_max_requests=1000, server_max_requests_jitter=100))
+
+    assert "limit_max_requests" not in single
+    assert several["workers"] == 4
+    assert several["limit_max_requests"] == 1000
+    assert several["timeout_graceful_shutdown"] == Settings.server_graceful_timeout
+
+
+def test_workers_default_to_shared_backends_unless_configured(monkeypatch):
+    for name in SHARED_BACKENDS:
+        monkeypatch.setenv(name, "unset")  # so monkeypatch restores it afterwards
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("SESSION_BACKEND", "none")
+
+    share_state_between_workers()
+
+    assert Settings.from_env().response_cache_backend == "sqlite"
+    assert Settings.from_env().node_cache_backend == "sqlite"
+    assert Settings.from_env().session_backend == "none"
+
+
+def test_workers_share_a_fresh_metrics_directory(monkeypatch, tmp_path):
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    share_metrics_between_workers()
+
+    assert os.environ["PROMETHEUS_MULTIPROC_DIR"] == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_metrics_are_summed_over_workers(tmp_path):
+    # Arrange: two workers served a request each; the second has shut down.
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    subprocess.run([sys.executable, "-c", REQUEST_METRICS], env=env, check=True)
+    subprocess.run([sys.executable, "-c", REQUEST_METRICS + "worker_exited()"], env=env, check=True)
+
+    # Act: a third worker answers the scrape.
+    scrape = subprocess.run(
+        [sys.executable, "-c", (
+            "from src.metrics import latest_metrics, register_stats_collector\n"
+            "register_stats_collector(lambda: {})\n"
+            "print(latest_metrics().decode())"
+        )],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+
+    # Assert
+    assert 'http_requests_total{handler="/orchestrate",method="POST",status="200"} 2.0' in scrape
+    assert "http_requests_in_flight 1.0" in scrape
+    assert 'prerouter_decisions_total{path="llm",worker="' in scrape
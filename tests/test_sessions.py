@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from src.sessions import MemorySessionStore, SQLiteSessionStore
+
+PROFILE = {"user_id": "u1", "name": "Test"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemorySessionStore(**kwargs)
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), **kwargs)
+    return make
+
+
+def test_turns_are_appended_to_the_stored_history(make_store):
+    store = make_store()
+    store.save("s1", PROFILE, [{"role": "user", "content": "hi"}])
+
+    assert store.append("s1", [{"role": "assistant", "content": "hello"}])
+
+    session = store.get("s1")
+    assert session.user_profile == PROFILE
+    assert [m["content"] for m in session.chat_history] == ["hi", "hello"]
+
+
+def test_saving_a_profile_keeps_the_history(make_store):
+    store = make_store()
+    store.save("s1", PROFILE, [{"role": "user", "content": "hi"}])
+
+    store.save("s1", dict(PROFILE, name="Renamed"))
+
+    session = store.get("s1")
+    assert session.user_profile["name"] == "Renamed"
+    assert len(session.chat_history) == 1
+
+
+def test_idle_sessions_expire(make_store):
+    clock = FakeClock()
+    store = make_store(ttl=60, clock=clock)
+    store.save("s1", PROFILE)
+
+    clock.now += 61
+
+    assert store.get("s1") is None
+    assert not store.append("s1", [{"role": "user", "content": "hi"}])
+
+
+def test_least_recently_used_sessions_are_evicted(make_store):
+    clock = FakeClock()
+    store = make_store(max_entries=2, clock=clock)
+    for session_id in ("s1", "s2", "s3"):
+        clock.now += 1
+        store.save(session_id, PROFILE)
+
+    assert store.get("s1") is None
+    assert store.get("s3") is not None
+
+
+def test_failed_sqlite_write_is_rolled_back(tmp_path):
+    # Arrange
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    store.save("s1", PROFILE, [{"role": "user", "content": "hi"}])
+    insert_messages = store._insert_messages
+
+    def locked(session_id, messages):
+        raise sqlite3.OperationalError("database is locked")
+
+    # Act
+    store._insert_messages = locked
+    with pytest.raises(sqlite3.OperationalError):
+        store.append("s1", [{"role": "assistant", "content": "lost"}])
+    store._insert_messages = insert_messages
+    appended = store.append("s1", [{"role": "assistant", "content": "hello"}])
+
+    # Assert
+    assert appended
+    assert [m["content"] for m in store.get("s1").chat_history] == ["hi", "hello"]
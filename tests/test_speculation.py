@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from src.speculation import Speculator
+
+
+async def _extract(result, delay=0.0):
+    await asyncio.sleep(delay)
+    return result
+
+
+@pytest.mark.asyncio
+async def test_committed_run_is_claimed_once_by_its_extractor():
+    speculator = Speculator()
+    speculation_id = speculator.start("NoteMaker", 0.72, _extract({"topic": "cells"}))
+
+    assert speculator.resolve(speculation_id, "NoteMaker")
+    task = speculator.claim(speculation_id, "NoteMaker")
+
+    assert await task == {"topic": "cells"}
+    assert speculator.claim(speculation_id, "NoteMaker") is None
+    stats = speculator.stats.snapshot()
+    assert stats["committed"] == 1 and stats["wasted"] == 0
+    assert stats["by_confidence"] == {"0.7": {"committed": 1, "wasted": 0}}
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_when_the_router_disagrees():
+    speculator = Speculator()
+    speculation_id = speculator.start("NoteMaker", 0.55, _extract({}, delay=1))
+
+    assert not speculator.resolve(speculation_id, "ConceptExplainer")
+    await asyncio.sleep(0)
+
+    assert speculator.claim(speculation_id, "NoteMaker") is None
+    assert speculator.stats.snapshot()["wasted"] == 1
@@ -0,0 +1,114 @@
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from mock_tools.mock_concept_explainer import explain_concept
+from mock_tools.mock_flashcard_generator import create_flashcards
+from mock_tools.mock_note_maker import create_notes
+from src.config import Settings, ToolEndpoint
+from src.history import estimate_tokens
+from src.nodes import execute_tool, format_final_response
+from src.serialization import dumps
+from src.tool_responses import ToolResponseStats, compact, formatter_payload, parse_tool_response
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tool, endpoint", [
+    ("NoteMaker", create_notes),
+    ("FlashcardGenerator", create_flashcards),
+    ("ConceptExplainer", explain_concept),
+])
+async def test_mock_tool_payloads_validate_unchanged(tool, endpoint):
+    payload = await endpoint(None)
+
+    assert parse_tool_response(tool, dumps(payload)) == payload
+
+
+def test_fields_outside_the_model_are_dropped():
+    body = b'{"explanation": "Plants make sugar.", "debug": {"trace_id": "abc"}}'
+
+    assert parse_tool_response("ConceptExplainer", body) == {"explanation": "Plants make sugar."}
+
+
+def test_mismatched_response_falls_back_to_plain_json():
+    body = b'{"flashcards": "not a list"}'
+
+    with patch("src.tool_responses.tool_response_stats") as stats:
+        result = parse_tool_response("FlashcardGenerator", body)
+
+    assert result == {"flashcards": "not a list"}
+    stats.record_invalid.assert_called_once_with("FlashcardGenerator")
+
+
+def test_compact_prunes_empty_fields_and_caps_oversized_ones():
+    # Arrange
+    payload = {
+        "explanation": "x" * 50,
+        "examples": [f"example {i}" for i in range(10)],
+        "source_references": [],
+        "flashcards": [{"question": "Q", "answer": "A", "example": None}],
+        "topic": "",
+    }
+
+    # Act
+    result = compact(payload, max_items=3, max_chars=20)
+
+    # Assert
+    assert result == {
+        "explanation": "x" * 20 + "…",
+        "examples": ["example 0", "example 1", "example 2"],
+        "flashcards": [{"question": "Q", "answer": "A"}],
+    }
+
+
+def test_tool_response_stats_report_prompt_token_reduction():
+    stats = ToolResponseStats()
+
+    stats.record("NoteMaker", 400, 300)
+    stats.record_invalid("NoteMaker")
+
+    assert stats.snapshot()["NoteMaker"] == {
+        "invalid": 1, "formatted": 1, "raw_tokens": 400, "prompt_tokens": 300, "prompt_token_reduction": 0.25,
+    }
+
+
+@pytest.mark.asyncio
+async def test_llm_formatter_gets_compacted_tool_response():
+    # Arrange
+    api_response = await create_notes(None)
+    state = {"selected_tool": "NoteMaker", "api_response": api_response, "formatter_mode": "llm"}
+    chain = MagicMock()
+    chain.ainvoke = AsyncMock(return_value=MagicMock(content="Your notes"))
+
+    # Act
+    with patch("src.nodes.get_text_chain", return_value=chain), \
+            patch("src.nodes.memoize_node", new=lambda node, key, compute: compute()):
+        result = await format_final_response(state)
+
+    # Assert
+    assert result["final_output"] == "Your notes"
+    prompt = chain.ainvoke.await_args.args[0]["api_response"]
+    assert "Water Cycle" in prompt
+    assert "connections_to_prior_learning" not in prompt
+    assert "source_references" not in prompt
+
+
+@pytest.mark.asyncio
+async def test_reduction_is_measured_against_the_raw_tool_body():
+    # Arrange
+    body = dumps({"explanation": "Plants make sugar.", "source_references": [], "debug": {"trace_id": "x" * 400}})
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body)))
+    settings = Settings(tool_endpoints={"ConceptExplainer": ToolEndpoint(url="http://explainer.svc/explain-concept")})
+    state = {"selected_tool": "ConceptExplainer", "extracted_parameters": {}}
+
+    # Act
+    with patch("src.nodes.get_tool_client", return_value=client), patch("src.nodes.get_settings", return_value=settings):
+        result = await execute_tool(state)
+    with patch("src.tool_responses.tool_response_stats", ToolResponseStats()) as stats:
+        formatter_payload("ConceptExplainer", result["api_response"], 20, 2000, raw_tokens=result["api_response_tokens"])
+
+    # Assert
+    assert result["api_response_tokens"] == estimate_tokens(body.decode())
+    counts = stats.snapshot()["ConceptExplainer"]
+    assert counts["raw_tokens"] == result["api_response_tokens"]
+    assert counts["prompt_token_reduction"] > 0.9
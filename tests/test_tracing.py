@@ -0,0 +1,127 @@
+import json
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from src.config import Settings
+from src.tracing import (
+    FileSpanExporter,
+    RequestIdFilter,
+    SlowRequestLog,
+    Trace,
+    current_request_id,
+    span,
+    start_trace,
+    trace_node,
+)
+
+
+def _spans_by_name(trace: Trace) -> dict:
+    return {s.name: s for s in trace.spans}
+
+
+@pytest.mark.asyncio
+async def test_node_and_nested_spans_form_a_tree_under_the_request():
+    async def node(state):
+        with span("tool.http", **{"tool.name": "NoteMaker"}) as tool_span:
+            tool_span.set("http.status_code", 200)
+        return {}
+
+    with patch("src.tracing._export"):
+        trace = start_trace("POST /orchestrate", request_id="req-1")
+        await trace_node("tool_executor", node)({})
+        trace.finish()
+
+    spans = _spans_by_name(trace)
+    assert spans["node tool_executor"].parent_id == trace.root.span_id
+    assert spans["tool.http"].parent_id == spans["node tool_executor"].span_id
+    assert spans["tool.http"].attributes == {"tool.name": "NoteMaker", "http.status_code": 200}
+    tree = trace.tree()
+    assert tree["request_id"] == "req-1"
+    assert tree["children"][0]["children"][0]["name"] == "tool.http"
+
+
+def test_failed_span_records_the_error_and_spans_outside_a_request_are_noops():
+    with span("outside") as noop:
+        noop.set("ignored", True)
+
+    with patch("src.tracing._export"):
+        trace = start_trace("POST /orchestrate")
+        with pytest.raises(TimeoutError):
+            with span("tool.http"):
+                raise TimeoutError("read timeout")
+        trace.finish()
+
+    assert [s.name for s in trace.spans] == ["tool.http", "POST /orchestrate"]
+    assert trace.spans[0].error == "TimeoutError: read timeout"
+
+
+def test_otlp_encoding_continues_the_callers_traceparent():
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+    with patch("src.tracing._export"):
+        trace = start_trace("POST /orchestrate", traceparent=traceparent)
+        with span("node router", **{"graph.node": "router", "llm.calls": 1, "cached": False}):
+            pass
+        trace.finish()
+
+    otlp = trace.to_otlp()
+    spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = spans[-1]
+    assert root["traceId"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+    assert trace.request_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert spans[0]["attributes"] == [
+        {"key": "graph.node", "value": {"stringValue": "router"}},
+        {"key": "llm.calls", "value": {"intValue": "1"}},
+        {"key": "cached", "value": {"boolValue": False}},
+    ]
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+def test_file_exporter_writes_one_otlp_line_per_trace(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = FileSpanExporter(str(path))
+
+    for _ in range(2):
+        with patch("src.tracing._export"):
+            trace = start_trace("POST /orchestrate")
+            trace.finish()
+        exporter.export(trace)
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "POST /orchestrate"
+
+
+def test_slow_request_log_keeps_only_requests_over_the_threshold(caplog):
+    log = SlowRequestLog()
+    with patch("src.tracing._export"):
+        fast = start_trace("POST /orchestrate", request_id="fast")
+        fast.finish()
+        slow = start_trace("POST /orchestrate", request_id="slow")
+        slow.finish()
+    slow.root.start_ns -= 3_000_000_000
+
+    with patch("src.tracing.get_settings", return_value=Settings(slow_request_threshold=2.0)), \
+            caplog.at_level(logging.WARNING, logger="src.tracing"):
+        assert not log.record(fast)
+        assert log.record(slow)
+        snapshot = log.snapshot()
+
+    assert snapshot["logged"] == 1 and snapshot["recent"][0]["request_id"] == "slow"
+    assert '"request_id":"slow"' in caplog.text
+
+
+def test_log_records_carry_the_current_request_id():
+    record = logging.LogRecord("src.nodes", logging.INFO, __file__, 1, "Router decision", None, None)
+
+    with patch("src.tracing._export"):
+        trace = start_trace("POST /orchestrate", request_id="req-42")
+        RequestIdFilter().filter(record)
+        assert current_request_id() == "req-42"
+        trace.finish()
+
+    assert record.request_id == "req-42"
+    assert current_request_id() is None
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.config import Settings, ToolEndpoint
+from src.llm import LLMRegistry, registry
+from src.warmup import Readiness, _timed, warm_up
+
+
+@pytest.mark.asyncio
+async def test_warm_up_builds_chains_opens_tools_and_marks_ready():
+    # Arrange
+    registry.clear()
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    settings = Settings(tool_endpoints={"NoteMaker": ToolEndpoint(url="http://notes.svc/create-notes")})
+
+    # Act
+    with patch.object(LLMRegistry, "_build_chain", lambda self, *key: object()), \
+            patch("src.warmup.readiness", Readiness()) as readiness, \
+            patch("src.warmup.get_tool_client", return_value=client), \
+            patch("src.warmup.get_settings", return_value=settings):
+        report = await warm_up()
+
+    # Assert
+    assert report["errors"] == []
+    assert report["ready"] and readiness.ready
+    assert {"imports", "chains", "prerouter", "caches", "tool_connections", "warm_up_total"} <= set(report["phases_ms"])
+    assert hosts == ["notes.svc"]
+    assert registry.stats()["chains"] == 8
+    registry.clear()
+
+
+@pytest.mark.asyncio
+async def test_synchronous_phase_runs_off_the_event_loop():
+    # Arrange
+    ticks = 0
+
+    async def event_loop_ticks():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(event_loop_ticks())
+
+    # Act
+    with patch("src.warmup.readiness", Readiness()) as readiness:
+        await _timed("slow_import", lambda: time.sleep(0.2))
+    ticker.cancel()
+
+    # Assert
+    assert ticks >= 5
+    assert readiness.phases_ms["slow_import"] >= 200